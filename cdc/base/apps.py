@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cdc.base'
+
+    def ready(self):
+        from cdc.base import signals  # noqa: F401
@@ -0,0 +1,27 @@
+"""Medidas usadas pelos comandos de benchmark (benchmark_db_connections, benchmark_pages)."""
+
+import math
+import time
+
+from django.conf import settings
+from django.test import Client
+
+
+def percentile(timings, pct):
+    """Valor de `timings` no percentil `pct` (0-100), pelo método do posto mais próximo."""
+    ordered = sorted(timings)
+    # Posto ceil(n * p / 100), contado a partir de 1
+    return ordered[max(0, math.ceil(len(ordered) * pct / 100) - 1)]
+
+
+def timed(func, *args, **kwargs):
+    """Executa `func` e retorna (resultado, milissegundos)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def benchmark_client():
+    """Client de teste anônimo, com um host aceito pelo ALLOWED_HOSTS."""
+    host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+    return Client(HTTP_HOST=host)
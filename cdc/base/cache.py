@@ -0,0 +1,238 @@
+"""
+Cache da resposta inteira das páginas públicas para visitantes anônimos.
+
+A chave junta a página, o path com a query string e se a requisição veio do htmx, mais
+dois números de versão guardados no cache `versions`, que não descarta entradas:
+
+* a versão da página, trocada quando ela (ou algo que ela lista) é publicada;
+* a geração do site, trocada quando muda algo que aparece em todas as páginas, como o menu.
+
+Trocar a versão deixa as respostas antigas inacessíveis; elas expiram sozinhas depois.
+Usuários logados, previews e a wagtailuserbar (que só aparece para quem está logado)
+nunca passam pelo cache.
+
+As mesmas versões, somadas ao que cada tipo de página declara em `get_validators`, dão o
+ETag e o Last-Modified da resposta; cada versão guarda o instante em que foi criada. Um GET condicional
+(If-None-Match / If-Modified-Since) de uma página que não mudou recebe 304 antes do
+get_context e da renderização.
+
+Para a CDN, as respostas públicas saem com o Cache-Control do tipo de página (`cache_control`) e
+um Surrogate-Key com as chaves de `get_surrogate_keys`. Invalidar uma página aqui também purga as
+chaves dela na CDN (cdc/base/purge.py) e, com a exportação estática ligada, renderiza de novo os
+arquivos HTML dela (cdc/base/static_export.py).
+"""
+
+import hashlib
+import time
+import uuid
+from datetime import UTC, datetime
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.cache import add_never_cache_headers, get_conditional_response, patch_cache_control
+from django.utils.connection import ConnectionProxy
+from django.utils.http import http_date
+from django_tasks.backends.immediate import ImmediateBackend
+
+from cdc.base.tasks import export_static_pages, purge_surrogate_keys
+
+# Versões das páginas, das listagens e dos choosers: uma versão perdida faria um processo servir conteúdo
+# velho, então ficam fora do cache `default`, que descarta entradas quando enche
+version_cache = ConnectionProxy(caches, 'versions')
+
+GENERATION_KEY = 'pagecache:generation'
+# Surrogate-Key presente em todas as páginas, purgada quando o site inteiro sai do cache
+ALL_PAGES_KEY = 'pages'
+
+
+def version_key(page_pk):
+    return f'pagecache:version:{page_pk}'
+
+
+def new_version():
+    # Começa pelo instante da troca (ms, em hexa): toda troca de versão também move o Last-Modified
+    return f'{time.time_ns() // 1_000_000:x}-{uuid.uuid4().hex}'
+
+
+def version_time(version):
+    """Instante em que `version` foi criada; None para as versões antigas, só com o uuid."""
+    stamp, separator, _ = version.partition('-')
+    if not separator:
+        return None
+    return datetime.fromtimestamp(int(stamp, 16) / 1000, tz=UTC)
+
+
+def is_cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not getattr(request, 'is_preview', False)
+        and not getattr(request, 'in_preview_panel', False)
+        and not request.user.is_authenticated
+    )
+
+
+def page_versions(page):
+    """Geração do site e versão da página, criadas no cache se ainda não existirem."""
+    keys = [GENERATION_KEY, version_key(page.pk)]
+    versions = version_cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = version_cache.get_or_set(key, new_version, None)
+    return [versions[key] for key in keys]
+
+
+def request_variant(request):
+    variant = f'{request.get_full_path()}|htmx={bool(getattr(request, "htmx", False))}'
+    return hashlib.md5(variant.encode()).hexdigest()
+
+
+def page_cache_key(page, request, versions=None):
+    return ':'.join(['pagecache', str(page.pk), *(versions or page_versions(page)), request_variant(request)])
+
+
+def page_etag(request, versions, parts):
+    """ETag forte da resposta: versões do cache, estado da página e variante da URL."""
+    parts = [*versions, *map(str, parts), request_variant(request)]
+    return '"%s"' % hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def surrogate_key(kind, pk):
+    """Chave do Surrogate-Key: page-<id> (a página), index-<id> (as filhas), tag-<id> (receitas com a tag)."""
+    return f'{kind}-{pk}'
+
+
+def set_public_headers(response, cache_control, keys):
+    patch_cache_control(response, public=True, **cache_control)
+    response['Surrogate-Key'] = ' '.join(keys)
+    return response
+
+
+def purge_cdn(keys):
+    """Purga as chaves na CDN por uma task, se houver um backend em settings.CDN_PURGE."""
+    if keys and settings.CDN_PURGE.get('BACKEND'):
+        purge_surrogate_keys.enqueue(sorted(set(keys)))
+
+
+def export_static(page_ids=None, paths=()):
+    """
+    Renderiza de novo, por uma task, os arquivos estáticos das páginas `page_ids` e os endereços
+    `paths`; sem `page_ids`, o site inteiro. Não faz nada sem settings.STATIC_EXPORT_DIR.
+
+    Sem a fila, a task rodaria dentro da requisição que fez a mudança: o site inteiro não é
+    renderizado ali, a exportação só fica marcada como desatualizada até o próximo `export_static`.
+    """
+    if not settings.STATIC_EXPORT_DIR:
+        return
+    if page_ids is None and isinstance(export_static_pages.get_backend(), ImmediateBackend):
+        # Importado aqui: cdc.base.static_export depende deste módulo
+        from cdc.base.static_export import mark_stale
+
+        mark_stale(settings.STATIC_EXPORT_DIR)
+        return
+    export_static_pages.enqueue(sorted(set(page_ids)) if page_ids is not None else None, list(paths))
+
+
+def invalidate_pages(pages, surrogate_keys=None):
+    """
+    Descarta as respostas em cache das páginas informadas, aqui e na CDN, e renderiza de novo os
+    arquivos estáticos delas. `surrogate_keys` troca as chaves page-<id> do purge por outras que
+    cobrem as mesmas páginas (ex.: tag-<id>).
+    """
+    pages = list(pages)
+    version_cache.set_many({version_key(page.pk): new_version() for page in pages}, None)
+    purge_cdn(surrogate_keys if surrogate_keys is not None else [surrogate_key('page', page.pk) for page in pages])
+    export_static([page.pk for page in pages])
+
+
+def invalidate_all_pages():
+    """Descarta todas as respostas em cache, ex.: quando o menu muda."""
+    version_cache.set(GENERATION_KEY, new_version(), None)
+    purge_cdn([ALL_PAGES_KEY])
+    export_static()
+
+
+class CachedPageMixin:
+    """
+    Serve a página do cache para visitantes anônimos.
+
+    Subclasses podem sobrescrever `get_cache_dependents` para dizer quais outras páginas
+    mostram dados desta e precisam sair do cache quando ela é publicada.
+    """
+
+    # Cache-Control das respostas públicas (argumentos do patch_cache_control). Com o ETag, o
+    # stale-while-revalidate deixa a CDN servir a cópia antiga enquanto confirma com um 304.
+    cache_control = {'max_age': 60, 'stale_while_revalidate': 300}
+
+    def get_cache_dependents(self):
+        parent = self.get_parent()
+        return [parent] if parent else []
+
+    def get_validators(self, request):
+        """
+        (valores para o ETag, Last-Modified): o que muda quando o HTML da página muda e as versões
+        do cache não cobrem. Subclasses acrescentam, ex.: o estado das receitas de uma listagem.
+        """
+        return [self.last_published_at, self.latest_revision_id], self.last_published_at
+
+    def get_surrogate_keys(self, request, *args, **kwargs):
+        """
+        Chaves do Surrogate-Key da resposta. Só podem mudar junto com a versão da página (publicação,
+        movimentação), porque são guardadas no cache com ela. Recebe os argumentos da rota (RouteResult).
+        """
+        keys = [ALL_PAGES_KEY, surrogate_key('page', self.pk)]
+        parent = self.get_parent()
+        if parent:
+            keys.append(surrogate_key('index', parent.pk))
+        return keys
+
+    def get_static_paths(self):
+        """
+        Endereços, relativos ao site, que a exportação estática grava para esta página. Subclasses
+        acrescentam os que as rotas da página atendem sem query string (ex.: /tags/<tag>/).
+        """
+        url_parts = self.get_url_parts()
+        return [url_parts[2]] if url_parts else []
+
+    def serve(self, request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            # Usuários logados veem a wagtailuserbar; nada no caminho pode guardar a resposta
+            response = super().serve(request, *args, **kwargs)
+            add_never_cache_headers(response)
+            return response
+
+        versions = page_versions(self)
+        parts, last_modified = self.get_validators(request)
+        # Uma troca de versão sem nova publicação (ex.: ingrediente renomeado) também move o Last-Modified
+        last_modified = max(filter(None, [last_modified, *map(version_time, versions)]), default=None)
+        etag = page_etag(request, versions, parts)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(last_modified.timestamp()) if last_modified else None
+        )
+        key = page_cache_key(self, request, versions)
+        keys = cache.get_or_set(
+            f'{key}:keys', lambda: self.get_surrogate_keys(request, *args, **kwargs), settings.PAGE_CACHE_TIMEOUT
+        )
+        if response is not None:
+            return set_public_headers(set_validators(response, etag, last_modified), self.cache_control, keys)
+
+        response = cache.get(key)
+        if response is not None:
+            return set_public_headers(set_validators(response, etag, last_modified), self.cache_control, keys)
+
+        response = super().serve(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_public_headers(set_validators(response, etag, last_modified), self.cache_control, keys)
+        if response.status_code == 200 and not response.cookies:
+            timeout = settings.PAGE_CACHE_TIMEOUT
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.add_post_render_callback(lambda rendered: cache.set(key, rendered, timeout))
+            else:
+                cache.set(key, response, timeout)
+        return response
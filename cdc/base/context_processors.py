@@ -0,0 +1,12 @@
+from django.conf import settings
+
+
+def fragment_cache(request):
+    """
+    Validade dos blocos {% cache %} dos templates.
+
+    No preview a página tem o conteúdo da revisão em edição; os blocos incluem `request.is_preview`
+    na chave para não ler a versão publicada, e com validade zero nada do preview fica guardado.
+    """
+    timeout = 0 if getattr(request, 'is_preview', False) else settings.FRAGMENT_CACHE_TIMEOUT
+    return {'fragment_cache_timeout': timeout}
@@ -0,0 +1,76 @@
+import copy
+import statistics
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.utils import load_backend
+
+from cdc.base.benchmark import benchmark_client, percentile, timed
+
+# Configurações de conexão comparadas; as demais chaves de DATABASES['default'] são mantidas
+MODES = {
+    'nova conexão': {'CONN_MAX_AGE': 0, 'pool': False},
+    'persistente': {'CONN_MAX_AGE': 60, 'pool': False},
+    'pool': {'CONN_MAX_AGE': 0, 'pool': {'min_size': 1, 'max_size': 2}},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a latência de requisições anônimas abrindo uma conexão nova a cada request, com conexão '
+        'persistente e com o pool do psycopg.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help='URL requisitada.')
+        parser.add_argument('--requests', type=int, default=200, help='Requisições medidas por configuração.')
+        parser.add_argument('--warmup', type=int, default=10, help='Requisições descartadas antes de medir.')
+
+    def handle(self, *args, **options):
+        client = benchmark_client()
+        original = connections[DEFAULT_DB_ALIAS]
+        original.close()
+        original.close_pool()
+        results = {}
+        try:
+            for mode, overrides in MODES.items():
+                connection = self.connection_for(original.settings_dict, overrides)
+                connections[DEFAULT_DB_ALIAS] = connection
+                try:
+                    results[mode] = self.measure(client, options['path'], options['requests'], options['warmup'])
+                finally:
+                    connection.close()
+                    connection.close_pool()
+        finally:
+            connections[DEFAULT_DB_ALIAS] = original
+
+        baseline = statistics.mean(results['nova conexão'])
+        self.stdout.write(f'{"modo":<14}{"média":>10}{"p50":>10}{"p95":>10}{"ganho":>8}')
+        for mode, timings in results.items():
+            mean = statistics.mean(timings)
+            self.stdout.write(
+                f'{mode:<14}{mean:>8.2f}ms{percentile(timings, 50):>8.2f}ms{percentile(timings, 95):>8.2f}ms'
+                f'{(1 - mean / baseline):>8.0%}'
+            )
+
+    def connection_for(self, base_settings, overrides):
+        settings_dict = copy.deepcopy(base_settings)
+        settings_dict['CONN_MAX_AGE'] = overrides['CONN_MAX_AGE']
+        settings_dict['OPTIONS']['pool'] = overrides['pool']
+        return load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, DEFAULT_DB_ALIAS)
+
+    def request(self, client, path):
+        response = client.get(path)
+        # O Client de teste não fecha as conexões no fim do request como o handler do servidor faz
+        close_old_connections()
+        return response
+
+    def measure(self, client, path, requests, warmup):
+        timings = []
+        for i in range(warmup + requests):
+            response, elapsed = timed(self.request, client, path)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{path} respondeu {response.status_code}')
+            if i >= warmup:
+                timings.append(elapsed)
+        return timings
@@ -0,0 +1,55 @@
+import os
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cdc.base.static_export import export_pages, export_site
+
+
+class Command(BaseCommand):
+    help = (
+        'Renderiza as páginas públicas publicadas (home, índices, receitas e listagens por tag) como HTML '
+        'estático, servido pelo StaticPagesMiddleware. Sem --page exporta o site inteiro e apaga os arquivos '
+        'de páginas que não existem mais.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=settings.STATIC_EXPORT_DIR, help='Diretório. Padrão: STATIC_EXPORT_DIR.'
+        )
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(), help='Processos que renderizam as páginas.'
+        )
+        parser.add_argument(
+            '--page',
+            type=int,
+            action='append',
+            dest='page_ids',
+            help='Exporta de novo só esta página (id); pode repetir.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError('Defina STATIC_EXPORT_DIR ou passe --output.')
+        start = time.perf_counter()
+        removed = 0
+        if options['page_ids']:
+            results = export_pages(options['output'], options['page_ids'])
+        else:
+            results, removed = export_site(options['output'], options['processes'])
+        elapsed = time.perf_counter() - start
+
+        failed = [(path, status) for path, status in results if status is None or status >= 500]
+        for path, status in failed:
+            self.stderr.write(f'{path}: {status or "endereço inválido"}')
+        statuses = Counter(status for _, status in results)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{statuses[200]} páginas exportadas em {options["output"]} ({elapsed:.1f}s), '
+                f'{removed} arquivos antigos apagados, {len(results) - statuses[200] - len(failed)} fora da exportação.'
+            )
+        )
+        if failed:
+            raise CommandError(f'{len(failed)} páginas com erro.')
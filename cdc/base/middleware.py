@@ -0,0 +1,198 @@
+import logging
+import os
+import stat
+import time
+
+import sentry_sdk
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import add_never_cache_headers
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+from whitenoise.responders import MissingFileError
+
+from cdc.base.sqlprofile import profile_queries
+from cdc.base.static_export import STALE_FILE
+
+logger = logging.getLogger('cdc.sqlprofile')
+
+
+class AsyncCapableMixin:
+    """
+    Middleware que atende nos dois modos do Django (WSGI e SERVER_MODE=asgi).
+
+    Um middleware só síncrono na pilha faz o Django rodar as views assíncronas (o autocomplete) numa
+    thread. A subclasse não implementa `__call__`: `respond(request)` pode devolver uma resposta sem
+    chamar o resto da pilha e `process(request, response)` trata a resposta que veio dela.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def respond(self, request):
+        return None
+
+    def process(self, request, response):
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.respond(request)
+        if response is None:
+            response = self.process(request, self.get_response(request))
+        return response
+
+    async def __acall__(self, request):
+        response = self.respond(request)
+        if response is None:
+            response = self.process(request, await self.get_response(request))
+        return response
+
+
+class SQLProfileMiddleware:
+    """
+    Perfil de SQL de cada request, para desenvolvimento e staging (SQL_PROFILE=True).
+
+    Devolve o total de queries e o tempo de banco no cabeçalho Server-Timing (aparece na aba Network
+    do navegador), registra os totais num span do Sentry e grava no log rotativo `cdc.sqlprofile`
+    os requests mais lentos que SQL_PROFILE_SLOW_MS ou acima do `query_budget` da página.
+
+    O middleware é síncrono: sob ASGI o Django roda as views assíncronas numa thread por causa
+    dele, então não deve ficar ligado em produção.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_PROFILE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with sentry_sdk.start_span(op='db.profile', name=f'{request.method} {request.path}') as span:
+            with profile_queries() as profile:
+                response = self.get_response(request)
+            # Definido pelo hook before_serve_page (cdc/base/wagtail_hooks.py) nas páginas do Wagtail
+            budget = getattr(request, 'query_budget', None)
+            repeated = profile.repeated()
+            span.set_data('db.query_count', len(profile))
+            span.set_data('db.duration_ms', round(profile.duration_ms, 1))
+            span.set_data('db.repeated_statements', len(repeated))
+            if budget is not None:
+                span.set_data('db.query_budget', budget)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        response['Server-Timing'] = f'db;dur={profile.duration_ms:.1f};desc="{len(profile)} queries"'
+
+        over_budget = budget is not None and len(profile) > budget
+        if over_budget or elapsed_ms >= settings.SQL_PROFILE_SLOW_MS:
+            logger.warning(
+                '%s %s: %.0fms, %s repetidas, orçamento %s\n%s',
+                request.method,
+                request.get_full_path(),
+                elapsed_ms,
+                len(repeated),
+                budget if budget is not None else '-',
+                profile.report(),
+            )
+        return response
+
+
+class CacheControlMiddleware(AsyncCapableMixin):
+    """
+    Garante que nada entre o app e o navegador guarde respostas pessoais.
+
+    As páginas do Wagtail definem o próprio Cache-Control (cdc/base/cache.py). Aqui, os caminhos de
+    settings.NEVER_CACHE_PATHS (admin, contas) e qualquer resposta que grave um cookie saem com
+    `private, no-store`, mesmo que a view tenha dito outra coisa. Fica antes dos middlewares que
+    gravam cookies (sessão, CSRF), para ver as respostas depois deles.
+    """
+
+    def process(self, request, response):
+        if request.path.startswith(tuple(settings.NEVER_CACHE_PATHS)) or response.cookies:
+            del response['Cache-Control']
+            del response['Surrogate-Key']
+            add_never_cache_headers(response)
+        return response
+
+
+class WhiteNoiseMiddleware(AsyncCapableMixin, BaseWhiteNoiseMiddleware):
+    """O WhiteNoiseMiddleware, que é só síncrono, atendendo também sob ASGI."""
+
+    def __init__(self, get_response):
+        AsyncCapableMixin.__init__(self, get_response)
+        BaseWhiteNoiseMiddleware.__init__(self, get_response)
+
+    def respond(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        return self.serve(static_file, request) if static_file is not None else None
+
+
+class StaticPagesMiddleware(AsyncCapableMixin, WhiteNoise):
+    """
+    Serve as páginas exportadas por `manage.py export_static` (cdc/base/static_export.py) direto do
+    disco, pelo WhiteNoise, sem passar pelo Wagtail nem pelo banco.
+
+    Só atende GET e HEAD anônimos sem query string: com cookie de sessão (usuário logado, com a
+    wagtailuserbar), requisição do htmx, query string (?after=, ?tag=) ou vindo da própria
+    exportação, a requisição segue para o Django. Os arquivos são procurados a cada requisição, para
+    as páginas renderizadas de novo depois de uma publicação aparecerem sem reiniciar o servidor.
+
+    Arquivos mais velhos que settings.STATIC_EXPORT_FILE_MAX_AGE também ficam para o Django: sem
+    MEDIA_PUBLIC_DOMAIN as URLs assinadas das imagens no S3 expiram, e o HTML exportado com elas também,
+    até o próximo `export_static` periódico. Com a exportação marcada
+    como desatualizada (static_export.STALE_FILE), todas as requisições vão para o Django.
+    """
+
+    def __init__(self, get_response):
+        if not settings.STATIC_EXPORT_DIR:
+            raise MiddlewareNotUsed
+        AsyncCapableMixin.__init__(self, get_response)
+        WhiteNoise.__init__(
+            self,
+            application=None,
+            root=settings.STATIC_EXPORT_DIR,
+            autorefresh=True,
+            max_age=settings.STATIC_EXPORT_MAX_AGE,
+            allow_all_origins=False,
+            index_file=True,
+        )
+        self.file_max_age = settings.STATIC_EXPORT_FILE_MAX_AGE
+        self.stale_file = os.path.join(settings.STATIC_EXPORT_DIR, STALE_FILE)
+
+    def get_static_file(self, path, url, stat_cache=None):
+        if self.file_max_age:
+            try:
+                file_stat = os.stat(path)
+            except FileNotFoundError:
+                raise MissingFileError(path) from None
+            # Diretórios seguem para o redirect do WhiteNoise (/receitas → /receitas/)
+            if not stat.S_ISDIR(file_stat.st_mode) and time.time() - file_stat.st_mtime > self.file_max_age:
+                raise MissingFileError(path)
+        return super().get_static_file(path, url, stat_cache=stat_cache)
+
+    def is_static_request(self, request):
+        return (
+            request.method in ('GET', 'HEAD')
+            and not request.META.get('QUERY_STRING')
+            and not request.path_info.startswith(tuple(settings.NEVER_CACHE_PATHS))
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and 'HTTP_HX_REQUEST' not in request.META
+            and 'HTTP_X_STATIC_EXPORT' not in request.META
+        )
+
+    def respond(self, request):
+        if self.is_static_request(request) and not os.path.exists(self.stale_file):
+            static_file = self.find_file(request.path_info)
+            if static_file is not None:
+                return BaseWhiteNoiseMiddleware.serve(static_file, request)
+        return None
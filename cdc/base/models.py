@@ -3,10 +3,15 @@ from wagtail.admin.panels import FieldPanel, MultiFieldPanel
 from wagtail.fields import RichTextField
 from wagtail.models import Page
 
+from cdc.base.cache import CachedPageMixin
 
-class HomePage(Page):
+
+class HomePage(CachedPageMixin, Page):
     body = RichTextField(blank=True)
 
+    # Queries para renderizar a página sem cache (cdc/base/sqlprofile.py)
+    query_budget = 7
+
     content_panels = Page.content_panels + [
         FieldPanel('body'),
     ]
@@ -0,0 +1,53 @@
+"""
+Menu principal do site, montado uma vez e guardado no cache do Django por site.
+
+O cache é invalidado pelos sinais em cdc/base/signals.py sempre que uma página é publicada,
+despublicada, movida ou excluída, ou quando um site muda. A cópia expira depois de
+settings.NAVIGATION_CACHE_TIMEOUT, mesmo sem mudanças.
+"""
+
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from wagtail.models import Site
+
+
+class MenuItem(NamedTuple):
+    pk: int
+    title: str
+    url: str
+    path: str
+
+
+def cache_key(site_pk):
+    return f'navigation:{site_pk}'
+
+
+def build_navigation(site, request=None):
+    root = site.root_page
+    return {
+        'root': MenuItem(root.pk, root.title, root.get_url(request), root.path),
+        'items': [
+            MenuItem(page.pk, page.title, page.get_url(request), page.path)
+            for page in root.get_children().live().in_menu()
+        ],
+    }
+
+
+def get_navigation(request):
+    """Raiz e itens de menu do site da requisição, ou None se nenhum site atende o host."""
+    # Site.find_for_request guarda o site no request: nas páginas do Wagtail o roteamento já o resolveu,
+    # e nas outras views (busca, "o que cozinhar") a busca pelo host acontece uma vez só
+    site = Site.find_for_request(request)
+    if site is None:
+        return None
+    navigation = cache.get(cache_key(site.pk))
+    if navigation is None:
+        navigation = build_navigation(site, request)
+        cache.set(cache_key(site.pk), navigation, settings.NAVIGATION_CACHE_TIMEOUT)
+    return navigation
+
+
+def invalidate_navigation():
+    cache.delete_many([cache_key(site_pk) for site_pk in Site.objects.values_list('pk', flat=True)])
@@ -0,0 +1,63 @@
+"""
+Purge da CDN por Surrogate-Key.
+
+As páginas servidas para visitantes anônimos saem com um cabeçalho Surrogate-Key (cdc/base/cache.py)
+e, quando o cache local de uma página é invalidado, as mesmas chaves são purgadas na CDN pela task
+`purge_surrogate_keys` (cdc/base/tasks.py). O backend é escolhido em settings.CDN_PURGE; sem ele
+nada é purgado.
+
+`HTTPPurgeBackend` atende as CDNs com purge por chave via HTTP: Fastly
+(POST https://api.fastly.com/service/<id>/purge com o cabeçalho Fastly-Key) e Varnish com xkey
+(método PURGE e header `xkey`, conforme a VCL).
+"""
+
+import urllib.request
+from itertools import batched
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BasePurgeBackend:
+    def __init__(self, **options):
+        self.options = options
+
+    def purge(self, keys):
+        """Descarta da CDN as respostas marcadas com qualquer uma das chaves."""
+        raise NotImplementedError
+
+
+class HTTPPurgeBackend(BasePurgeBackend):
+    """
+    Uma requisição `method` para `url` com as chaves separadas por espaço no cabeçalho `header`.
+
+    Chaves demais vão em várias requisições de até `batch_size` (o limite da Fastly é 256). Uma
+    resposta de erro levanta HTTPError, e a task é tentada de novo pela fila.
+    """
+
+    def __init__(self, url, method='POST', header='Surrogate-Key', headers=None, batch_size=256, timeout=10):
+        super().__init__()
+        self.url = url
+        self.method = method
+        self.header = header
+        self.headers = headers or {}
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def purge(self, keys):
+        for batch in batched(sorted(set(keys)), self.batch_size):
+            request = urllib.request.Request(
+                self.url,
+                method=self.method,
+                headers={**self.headers, self.header: ' '.join(batch)},
+            )
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+
+
+def get_purge_backend():
+    """O backend de settings.CDN_PURGE, ou None se não houver CDN configurada."""
+    config = settings.CDN_PURGE
+    if not config.get('BACKEND'):
+        return None
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
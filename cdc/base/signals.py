@@ -0,0 +1,98 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.models import Page, Site
+from wagtail.signals import page_published, page_slug_changed, page_unpublished, post_page_move
+
+from cdc.base.cache import (
+    CachedPageMixin,
+    export_static,
+    invalidate_all_pages,
+    invalidate_pages,
+    purge_cdn,
+    surrogate_key,
+)
+from cdc.base.navigation import invalidate_navigation
+
+# Filhas da raiz do site (profundidade 2) aparecem no menu, que está em todas as páginas
+MENU_DEPTH = 3
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def invalidate_navigation_cache(sender, **kwargs):
+    # Depois do commit, para nenhuma requisição concorrente recolocar o menu antigo no cache
+    transaction.on_commit(invalidate_navigation)
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+@receiver(post_delete, sender=Page)
+def invalidate_page_cache(sender, instance, **kwargs):
+    try:
+        if isinstance(instance, CachedPageMixin):
+            pages = [instance, *instance.get_cache_dependents()]
+        else:
+            pages = [instance, *filter(None, [instance.get_parent()])]
+    except Page.DoesNotExist:
+        # Exclusão de uma subárvore: a mãe já foi apagada no mesmo DELETE e não há como achar quem listava a página
+        transaction.on_commit(invalidate_all_pages)
+        return
+    if kwargs.get('parent_page_before'):
+        pages.append(kwargs['parent_page_before'])
+    transaction.on_commit(partial(invalidate_pages, pages))
+    if kwargs.get('url_path_before') and instance.numchild:
+        # As filhas mudaram de URL; os endereços antigos saem da CDN pela chave index-<id>
+        transaction.on_commit(partial(purge_cdn, [surrogate_key('index', instance.pk)]))
+
+    if instance.depth <= MENU_DEPTH:
+        transaction.on_commit(invalidate_all_pages)
+
+
+def export_previous_path(page, url_path_before):
+    """
+    Renderiza o endereço antigo de uma página movida, renomeada ou apagada, para o 404 apagar o
+    arquivo estático; a invalidação só renderiza os endereços atuais. Se as filhas também mudaram
+    de endereço, exporta o site inteiro.
+    """
+    if not settings.STATIC_EXPORT_DIR:
+        return
+    url_parts = page.get_url_parts()
+    if not url_parts:
+        return
+    if page.numchild:
+        transaction.on_commit(export_static)
+        return
+    # url_path é o caminho a partir da raiz da árvore (/home/receitas/bolo/); o endereço, a partir da raiz do site
+    site_root_path = page.url_path[: len(page.url_path) - len(url_parts[2]) + 1]
+    transaction.on_commit(partial(export_static, [], ['/' + url_path_before.removeprefix(site_root_path)]))
+
+
+@receiver(post_page_move)
+def export_moved_page(sender, instance, url_path_before, **kwargs):
+    if url_path_before != instance.url_path:
+        export_previous_path(instance, url_path_before)
+
+
+@receiver(page_slug_changed)
+def export_renamed_page(sender, instance, instance_before, **kwargs):
+    export_previous_path(instance, instance_before.url_path)
+
+
+@receiver(post_delete, sender=Page)
+def export_deleted_page(sender, instance, **kwargs):
+    export_previous_path(instance, instance.url_path)
+
+
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def invalidate_site_page_cache(sender, **kwargs):
+    transaction.on_commit(invalidate_all_pages)
@@ -0,0 +1,102 @@
+"""
+Perfil das queries SQL de um request ou de um trecho de código.
+
+`profile_queries()` registra cada query executada na conexão, com o tempo gasto, e agrupa pelo
+comando normalizado (sem parâmetros e com as listas do IN colapsadas). Um mesmo comando repetido
+várias vezes no request costuma ser um N+1, como um `.specific` ou um FK acessado dentro de um loop
+do template.
+
+As páginas declaram quantas queries podem custar em `query_budget`, ao lado do modelo. O
+SQLProfileMiddleware (cdc/base/middleware.py) confere o orçamento em desenvolvimento e staging e a
+fixture `query_budget` (conftest.py) faz o mesmo nos testes.
+"""
+
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PLACEHOLDER_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+class ExecutedQuery(NamedTuple):
+    sql: str
+    duration_ms: float
+
+
+class Statement(NamedTuple):
+    sql: str
+    count: int
+    duration_ms: float
+
+
+def normalize_sql(sql):
+    """Comando sem valores, para juntar as execuções da mesma query com parâmetros diferentes."""
+    sql = STRING_RE.sub('%s', sql)
+    sql = NUMBER_RE.sub('%s', sql)
+    sql = PLACEHOLDER_LIST_RE.sub('(...)', sql)
+    return ' '.join(sql.split())
+
+
+class QueryProfile:
+    """Queries executadas enquanto o perfil estava instalado na conexão (ver `profile_queries`)."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(ExecutedQuery(sql, (time.perf_counter() - start) * 1000))
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def duration_ms(self):
+        return sum(query.duration_ms for query in self.queries)
+
+    def statements(self):
+        """Comandos normalizados, do que mais tomou tempo para o que menos tomou."""
+        grouped = defaultdict(list)
+        for query in self.queries:
+            grouped[normalize_sql(query.sql)].append(query.duration_ms)
+        statements = [Statement(sql, len(durations), sum(durations)) for sql, durations in grouped.items()]
+        return sorted(statements, key=lambda statement: statement.duration_ms, reverse=True)
+
+    def repeated(self):
+        """Comandos executados mais de uma vez: candidatos a N+1."""
+        return [statement for statement in self.statements() if statement.count > 1]
+
+    def report(self, limit=10):
+        """Resumo legível, para logs e mensagens de falha dos testes."""
+        lines = [f'{len(self)} queries em {self.duration_ms:.1f}ms']
+        for statement in self.statements()[:limit]:
+            lines.append(f'  {statement.count}x {statement.duration_ms:.1f}ms  {statement.sql[:300]}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def profile_queries(using=DEFAULT_DB_ALIAS):
+    """Registra as queries feitas na conexão `using` da thread atual dentro do bloco."""
+    profile = QueryProfile()
+    with connections[using].execute_wrapper(profile):
+        yield profile
+
+
+def get_query_budget(page):
+    """Orçamento de queries da página (atributo `query_budget` do modelo), ou None."""
+    return getattr(page.specific_class, 'query_budget', None)
+
+
+def check_query_budget(profile, budget, label='request'):
+    """Levanta AssertionError com o perfil das queries se `profile` passar do orçamento."""
+    if budget is not None and len(profile) > budget:
+        raise AssertionError(f'{label}: {len(profile)} queries, orçamento de {budget}\n{profile.report()}')
@@ -0,0 +1,209 @@
+"""
+Exportação das páginas públicas para HTML estático.
+
+Cada endereço de `get_static_paths` das páginas publicadas (cdc/base/cache.py) é renderizado
+como um visitante anônimo e gravado em `<STATIC_EXPORT_DIR>/<endereço>/index.html`, com uma cópia
+.gz ao lado. O StaticPagesMiddleware (cdc/base/middleware.py) serve esses arquivos pelo WhiteNoise,
+sem Wagtail nem banco, para os GETs anônimos sem query string; o resto (admin, busca, paginação
+por cursor, filtros com várias tags) continua no Django.
+
+`manage.py export_static` exporta o site inteiro com um pool de processos e apaga os arquivos de
+páginas que não existem mais. Depois disso, cada invalidação do cache de páginas renderiza de novo
+só as páginas invalidadas, pela task `export_static_pages` (cdc/base/tasks.py): uma publicação
+refaz a receita, o índice dela e as listagens por tag. Uma resposta 404 (página despublicada,
+tag sem receitas) apaga o arquivo.
+
+Uma mudança em todas as páginas (o menu) sem a fila de tarefas não renderiza o site na requisição:
+ela cria o arquivo `STALE_FILE` no diretório, e o middleware deixa de servir a exportação até a
+próxima exportação completa.
+
+As imagens entram no HTML com a URL da storage. Com MEDIA_PUBLIC_DOMAIN ela é pública e o arquivo
+vale até a próxima publicação; sem ele a URL assinada expira, e o StaticPagesMiddleware deixa de
+servir os arquivos mais velhos que STATIC_EXPORT_FILE_MAX_AGE até a próxima exportação completa.
+
+Só o site padrão é exportado.
+"""
+
+import gzip
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from pathlib import Path
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.db import connections
+from django.http.request import validate_host
+from django.test import Client
+from wagtail.models import Page, Site
+
+from cdc.base.cache import CachedPageMixin
+
+INDEX_FILE = 'index.html'
+# Cabeçalho das requisições da exportação; o StaticPagesMiddleware deixa passar para o Django
+EXPORT_HEADER = 'X-Static-Export'
+# Marca de exportação desatualizada (`mark_stale`); só uma exportação completa a remove
+STALE_FILE = '.stale'
+# Status que tiram o endereço da exportação: a página não existe, não é pública ou virou um redirect
+REMOVED_STATUSES = {301, 302, 303, 307, 308, 401, 403, 404, 410}
+
+
+def output_file(root, path):
+    """Arquivo do endereço `path` em `root`; ValueError se o endereço sair do diretório."""
+    root = Path(root).resolve()
+    target = (root / unquote(path).strip('/') / INDEX_FILE).resolve()
+    if not target.is_relative_to(root):
+        raise ValueError(f'Endereço fora do diretório de exportação: {path}')
+    return target
+
+
+def write_atomic(target, content):
+    # Um request concorrente nunca vê o arquivo pela metade
+    with tempfile.NamedTemporaryFile(dir=target.parent, prefix='.export-', delete=False) as tmp:
+        tmp.write(content)
+    os.chmod(tmp.name, 0o644)
+    os.replace(tmp.name, target)
+
+
+def write_page(target, content):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(target, content)
+    compressed = gzip.compress(content, mtime=0)
+    gz_target = target.with_name(target.name + '.gz')
+    if len(compressed) < len(content):
+        write_atomic(gz_target, compressed)
+    else:
+        gz_target.unlink(missing_ok=True)
+
+
+def remove_page(target):
+    for file in [target, target.with_name(target.name + '.gz')]:
+        file.unlink(missing_ok=True)
+
+
+def mark_stale(root):
+    Path(root).mkdir(parents=True, exist_ok=True)
+    (Path(root) / STALE_FILE).touch()
+
+
+def stale_mark(root):
+    """Instante da marca de desatualizada, ou None sem ela."""
+    try:
+        return (Path(root) / STALE_FILE).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def export_host():
+    """Hostname do site padrão; o primeiro de ALLOWED_HOSTS se ele não for aceito pelo Django."""
+    hostname = Site.objects.get(is_default_site=True).hostname
+    if validate_host(hostname, settings.ALLOWED_HOSTS):
+        return hostname
+    return next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), hostname)
+
+
+def export_client():
+    """Client anônimo do site padrão, que passa pelo StaticPagesMiddleware até o Wagtail."""
+    return Client(
+        HTTP_HOST=export_host(),
+        raise_request_exception=False,
+        **{'HTTP_' + EXPORT_HEADER.upper().replace('-', '_'): '1'},
+    )
+
+
+def render_paths(root, paths):
+    """
+    Renderiza e grava os endereços; devolve (endereço, status) de cada um. É a função executada em
+    cada processo do pool.
+    """
+    client = export_client()
+    results = []
+    for path in paths:
+        try:
+            target = output_file(root, path)
+        except ValueError:
+            # Ex.: uma tag chamada '..'; a listagem dela continua no Django
+            results.append((path, None))
+            continue
+        response = client.get(path)
+        if response.status_code == 200 and not response.cookies and 'text/html' in response.get('Content-Type', ''):
+            write_page(target, response.content)
+        elif response.status_code == 200 or response.status_code in REMOVED_STATUSES:
+            # Respostas que gravam cookie são pessoais; essas e as que não são HTML ficam no Django
+            remove_page(target)
+        results.append((path, response.status_code))
+    return results
+
+
+def page_paths(pages):
+    return list(dict.fromkeys(chain.from_iterable(page.get_static_paths() for page in pages)))
+
+
+def site_pages():
+    """Páginas publicadas e públicas do site padrão que passam pelo cache de páginas."""
+    site = Site.objects.get(is_default_site=True)
+    pages = Page.objects.live().public().descendant_of(site.root_page, inclusive=True)
+    pages = pages.specific().iterator(chunk_size=1000)
+    return [page for page in pages if isinstance(page, CachedPageMixin)]
+
+
+def close_connections():
+    """Fecha as conexões e o pool do psycopg: os processos do pool abrem os seus depois do fork."""
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+
+
+def export(root, paths, processes=1):
+    """Renderiza os endereços, em `processes` processos; devolve (endereço, status) de cada um."""
+    Path(root).mkdir(parents=True, exist_ok=True)
+    if processes <= 1 or len(paths) <= 1:
+        return render_paths(root, paths)
+    # Lotes pequenos para os processos terminarem juntos, mesmo com páginas de custos diferentes
+    chunk_size = max(1, len(paths) // (processes * 8))
+    chunks = [paths[start : start + chunk_size] for start in range(0, len(paths), chunk_size)]
+    close_connections()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('fork')) as pool:
+        return list(chain.from_iterable(pool.map(render_paths, [root] * len(chunks), chunks)))
+
+
+def prune(root, paths):
+    """Apaga os arquivos exportados que não correspondem a nenhum dos endereços; devolve quantos."""
+    root = Path(root)
+    keep = set()
+    for path in paths:
+        try:
+            keep.add(output_file(root, path))
+        except ValueError:
+            pass
+    removed = 0
+    for target in root.rglob(INDEX_FILE):
+        if target.resolve() not in keep:
+            remove_page(target)
+            removed += 1
+    for directory in sorted((path for path in root.rglob('*') if path.is_dir()), reverse=True):
+        if not any(directory.iterdir()):
+            directory.rmdir()
+    return removed
+
+
+def export_site(root, processes=1):
+    """Exporta todas as páginas e apaga o que sobrou de páginas que não existem mais."""
+    stale_at = stale_mark(root)
+    paths = page_paths(site_pages())
+    results = export(root, paths, processes)
+    removed = prune(root, paths)
+    # Uma marca feita durante a exportação fica: a mudança pode ter chegado depois da página renderizada
+    if stale_at is not None and stale_mark(root) == stale_at:
+        (Path(root) / STALE_FILE).unlink(missing_ok=True)
+    return results, removed
+
+
+def export_pages(root, page_ids, paths=()):
+    """Exporta de novo só as páginas informadas e os endereços `paths`."""
+    pages = Page.objects.filter(pk__in=page_ids).specific()
+    pages = [page for page in pages if isinstance(page, CachedPageMixin)]
+    return export(root, list(dict.fromkeys([*page_paths(pages), *paths])))
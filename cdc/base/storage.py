@@ -0,0 +1,39 @@
+"""
+Storage de mídia em produção: o S3Storage do django-storages com um span do Sentry em cada operação.
+
+A integração do Sentry com o boto3 só vê as chamadas HTTP. Assinar a URL de cada imagem (`url()`)
+não sai do processo, mas acontece para todo card da listagem e também precisa aparecer no trace.
+"""
+
+import sentry_sdk
+from storages.backends.s3 import S3Storage
+
+
+class TracedStorageMixin:
+    def _open(self, name, mode='rb'):
+        with sentry_sdk.start_span(op='storage.open', name=name):
+            return super()._open(name, mode)
+
+    def _save(self, name, content):
+        with sentry_sdk.start_span(op='storage.save', name=name):
+            return super()._save(name, content)
+
+    def delete(self, name):
+        with sentry_sdk.start_span(op='storage.delete', name=name):
+            return super().delete(name)
+
+    def exists(self, name):
+        with sentry_sdk.start_span(op='storage.exists', name=name):
+            return super().exists(name)
+
+    def size(self, name):
+        with sentry_sdk.start_span(op='storage.size', name=name):
+            return super().size(name)
+
+    def url(self, name, *args, **kwargs):
+        with sentry_sdk.start_span(op='storage.url', name=name):
+            return super().url(name, *args, **kwargs)
+
+
+class TracedS3Storage(TracedStorageMixin, S3Storage):
+    pass
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django_tasks import task
+
+from cdc.base.purge import get_purge_backend
+
+
+@task()
+def purge_surrogate_keys(keys):
+    """Purga da CDN as respostas marcadas com as chaves informadas (cdc/base/purge.py)."""
+    backend = get_purge_backend()
+    if backend is not None:
+        backend.purge(keys)
+
+
+@task()
+def export_static_pages(page_ids=None, paths=()):
+    """
+    Renderiza de novo os arquivos estáticos das páginas e dos endereços informados; sem `page_ids`,
+    o site inteiro (cdc/base/static_export.py).
+    """
+    # Importado aqui: cdc.base.static_export depende de cdc.base.cache, que importa este módulo
+    from cdc.base.static_export import export_pages, export_site
+
+    if not settings.STATIC_EXPORT_DIR:
+        return
+    if page_ids is None:
+        export_site(settings.STATIC_EXPORT_DIR)
+    else:
+        export_pages(settings.STATIC_EXPORT_DIR, page_ids, paths)
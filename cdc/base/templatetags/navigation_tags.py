@@ -1,12 +1,15 @@
 from django import template
-from wagtail.models import Page, Site
+from wagtail.models import Page
+
+from cdc.base import navigation
 
 register = template.Library()
 
 
 @register.simple_tag(takes_context=True)
-def get_site_root(context):
-    return Site.find_for_request(context['request']).root_page
+def get_navigation(context):
+    """Raiz e itens do menu principal, do cache (ver cdc/base/navigation.py)."""
+    return navigation.get_navigation(context['request'])
 
 
 @register.simple_tag(takes_context=True)
@@ -17,5 +20,6 @@ def is_active_menuitem(context, menuitem):
     """
     page = context.get('page')
     if isinstance(page, Page):
-        return page.pk == menuitem.pk or page.is_descendant_of(menuitem)
+        # O path do treebeard de uma descendente sempre começa com o path do ancestral
+        return page.path.startswith(menuitem.path)
     return False
@@ -0,0 +1,18 @@
+from django.test import SimpleTestCase
+
+from cdc.base.benchmark import percentile
+
+
+class TestPercentile(SimpleTestCase):
+    def test_nearest_rank(self):
+        """Test percentile picks the value at rank ceil(n * p / 100)"""
+        timings = list(range(30, 0, -1))
+        self.assertEqual(percentile(timings, 50), 15)
+        self.assertEqual(percentile(timings, 95), 29)
+        self.assertEqual(percentile(timings, 100), 30)
+        self.assertEqual(percentile(timings, 0), 1)
+
+    def test_single_sample(self):
+        """Test every percentile of a single sample is that sample"""
+        self.assertEqual(percentile([7.5], 50), 7.5)
+        self.assertEqual(percentile([7.5], 99), 7.5)
@@ -0,0 +1,297 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import parse_http_date
+from taggit.models import Tag
+from wagtail.models import Page
+from wagtail.test.utils import WagtailPageTestCase
+
+from cdc.base.cache import version_cache, version_key
+from cdc.base.models import HomePage
+from cdc.recipes.models import (
+    Ingredient,
+    RecipeIndexPage,
+    RecipeIngredient,
+    RecipePage,
+    RecipeTagCount,
+    RecipeTagIndexPage,
+)
+from cdc.recipes.tasks import generate_recipe_renditions
+from cdc.recipes.tests.utils import RecipeTestCase
+
+
+class TestPageCache(WagtailPageTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.root_page = Page.objects.get(slug='home')
+        self.page = HomePage(title='Sobre', slug='sobre', body='<p>Versão original</p>')
+        self.root_page.add_child(instance=self.page)
+
+    def change_body_without_signals(self):
+        HomePage.objects.filter(pk=self.page.pk).update(body='<p>Versão nova</p>')
+
+    def test_anonymous_response_is_cached(self):
+        """Test a second anonymous request gets the cached response"""
+        self.client.get('/sobre/')
+        self.change_body_without_signals()
+        self.assertContains(self.client.get('/sobre/'), 'Versão original')
+
+    def test_query_string_is_part_of_the_key(self):
+        """Test different query strings are cached separately"""
+        self.client.get('/sobre/')
+        self.change_body_without_signals()
+        self.assertContains(self.client.get('/sobre/?utm=1'), 'Versão nova')
+
+    def test_logged_in_users_bypass_cache(self):
+        """Test logged-in requests are always rendered"""
+        self.client.get('/sobre/')
+        self.change_body_without_signals()
+        self.login()
+        self.assertContains(self.client.get('/sobre/'), 'Versão nova')
+
+    def test_logged_in_responses_are_not_cached(self):
+        """Test a page rendered for a logged-in user isn't served to anonymous readers"""
+        self.login()
+        self.client.get('/sobre/')
+        self.client.logout()
+        self.change_body_without_signals()
+        self.assertContains(self.client.get('/sobre/'), 'Versão nova')
+
+    def test_publish_invalidates_page(self):
+        """Test publishing a page discards its cached responses"""
+        self.client.get('/sobre/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.page.body = '<p>Versão publicada</p>'
+            self.page.save_revision().publish()
+        self.assertContains(self.client.get('/sobre/'), 'Versão publicada')
+
+    def test_publish_invalidates_parent_listing(self):
+        """Test publishing a child discards the parent's cached responses"""
+        index_page = RecipeIndexPage(title='Receitas', slug='receitas', intro='Intro original')
+        self.root_page.add_child(instance=index_page)
+        self.client.get('/receitas/')
+        RecipeIndexPage.objects.filter(pk=index_page.pk).update(intro='Intro nova')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.page.save_revision().publish()
+        # /sobre/ é filha da raiz do site e aparece no menu, então tudo sai do cache
+        self.assertContains(self.client.get('/receitas/'), 'Intro nova')
+
+    def test_htmx_requests_are_cached_separately(self):
+        """Test the htmx partial and the full page don't share a cache entry"""
+        index_page = RecipeIndexPage(title='Receitas', slug='receitas')
+        self.root_page.add_child(instance=index_page)
+        self.client.get('/receitas/', headers={'HX-Request': 'true'})
+        response = self.client.get('/receitas/')
+        self.assertContains(response, '<html')
+
+
+class TestRecipePageCacheInvalidation(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tag_page = RecipeTagIndexPage(title='Tags', slug='tags')
+        self.root_page.add_child(instance=self.tag_page)
+        self.about = HomePage(title='Sobre', slug='sobre', body='<p>Versão original</p>')
+        self.root_page.add_child(instance=self.about)
+        self.recipe = self.add_recipe('bolo', ['doce'], title='Bolo')
+
+    def test_recipe_publish_invalidates_listings_only(self):
+        """Test publishing a recipe discards its listings but keeps unrelated pages cached"""
+        for url in ['/receitas/', '/tags/?tag=doce', '/sobre/']:
+            self.client.get(url)
+        HomePage.objects.filter(pk=self.about.pk).update(body='<p>Versão nova</p>')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.title = 'Bolo de cenoura'
+            self.recipe.save_revision().publish()
+
+        self.assertContains(self.client.get('/receitas/'), 'Bolo De Cenoura')
+        self.assertContains(self.client.get('/tags/?tag=doce'), 'Bolo De Cenoura')
+        self.assertContains(self.client.get('/sobre/'), 'Versão original')
+
+    def test_deleting_listing_with_recipes(self):
+        """Test deleting an index deletes its recipes and clears the cached pages"""
+        self.client.get('/sobre/')
+        HomePage.objects.filter(pk=self.about.pk).update(body='<p>Versão nova</p>')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.index_page.delete()
+
+        self.assertFalse(RecipePage.objects.exists())
+        self.assertContains(self.client.get('/sobre/'), 'Versão nova')
+
+
+class TestConditionalGet(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tag_page = RecipeTagIndexPage(title='Tags', slug='tags')
+        self.root_page.add_child(instance=self.tag_page)
+        self.recipe = self.add_recipe('bolo')
+
+    def add_recipe(self, slug):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = super().add_recipe(slug, ['doce'])
+            recipe.save_revision().publish()
+        return recipe
+
+    def etag(self, url):
+        return self.client.get(url)['ETag']
+
+    def test_validators_are_sent(self):
+        """Test anonymous page responses carry a strong ETag and Last-Modified"""
+        response = self.client.get('/receitas/bolo/')
+        self.assertRegex(response['ETag'], r'^"[0-9a-f]{32}"$')
+        self.assertIn('Last-Modified', response)
+
+    def test_unchanged_page_is_not_rendered(self):
+        """Test a matching If-None-Match gets a 304 without building the context"""
+        etag = self.etag('/receitas/bolo/')
+        with mock.patch.object(RecipePage, 'get_context') as get_context:
+            response = self.client.get('/receitas/bolo/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        get_context.assert_not_called()
+
+    def test_if_modified_since(self):
+        """Test If-Modified-Since with the Last-Modified date gets a 304"""
+        last_modified = self.client.get('/receitas/').headers['Last-Modified']
+        response = self.client.get('/receitas/', headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 304)
+
+    def test_publish_changes_etag(self):
+        """Test publishing a new revision of the recipe changes its ETag"""
+        etag = self.etag('/receitas/bolo/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save_revision().publish()
+        response = self.client.get('/receitas/bolo/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_versions_outlive_the_page_cache(self):
+        """Test dropping every entry of the default cache keeps the versions and the ETags"""
+        etag = self.etag('/receitas/bolo/')
+        cache.clear()
+        response = self.client.get('/receitas/bolo/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertIsNotNone(version_cache.get(version_key(self.recipe.pk)))
+
+    def test_renditions_change_etag(self):
+        """Test renditions generated after publishing change the recipe's ETag"""
+        etag = self.etag('/receitas/bolo/')
+        self.image.renditions.all().delete()
+        generate_recipe_renditions.call(self.image.pk)
+        self.assertNotEqual(self.etag('/receitas/bolo/'), etag)
+
+    def test_recipe_validators_skip_renditions_table(self):
+        """Test a conditional GET on a recipe is answered without querying the renditions"""
+        etag = self.etag('/receitas/bolo/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/receitas/bolo/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in queries if 'wagtailimages_rendition' in query['sql']])
+
+    def test_listing_etags_follow_recipes(self):
+        """Test a new recipe or a tag count change gives the listings a new ETag"""
+        index_etag, tag_etag = self.etag('/receitas/'), self.etag('/tags/')
+        self.add_recipe('torta')
+        self.assertNotEqual(self.etag('/receitas/'), index_etag)
+        self.assertNotEqual(self.etag('/tags/'), tag_etag)
+        tag_etag = self.etag('/tags/')
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeTagCount.objects.touch()
+        self.assertNotEqual(self.etag('/tags/'), tag_etag)
+
+    def test_catalog_rename_changes_validators(self):
+        """Test renaming an ingredient changes the ETag and Last-Modified of the recipes using it"""
+        ingredient = Ingredient.objects.create(name='Farinha')
+        self.recipe.ingredients.add(RecipeIngredient(ingredient=ingredient, metric=self.metric, quantity=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save_revision().publish()
+        first = self.client.get('/receitas/bolo/')
+        ingredient.name = 'Farinha de trigo'
+        # Um minuto depois: o Last-Modified tem resolução de segundos
+        with mock.patch('time.time_ns', return_value=time.time_ns() + 60 * 10**9):
+            with self.captureOnCommitCallbacks(execute=True):
+                ingredient.save()
+        response = self.client.get(
+            '/receitas/bolo/',
+            headers={'If-None-Match': first['ETag'], 'If-Modified-Since': first['Last-Modified']},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Farinha de trigo')
+        self.assertGreater(parse_http_date(response['Last-Modified']), parse_http_date(first['Last-Modified']))
+
+    def test_listing_validators_skip_summary_table(self):
+        """Test a cached listing is validated from the cache, without querying the summaries"""
+        for url in ['/receitas/', '/tags/']:
+            etag = self.etag(url)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertFalse([query for query in queries if 'recipes_recipesummary' in query['sql']], url)
+
+    def test_query_string_has_its_own_etag(self):
+        """Test each filter of the tag page is validated separately"""
+        self.assertNotEqual(self.etag('/tags/?tag=doce'), self.etag('/tags/'))
+
+    def test_logged_in_users_get_no_validators(self):
+        """Test logged-in responses, which include the userbar, are not validated"""
+        self.login()
+        response = self.client.get('/receitas/bolo/')
+        self.assertNotIn('ETag', response)
+
+
+class TestCacheHeaders(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tag_page = RecipeTagIndexPage(title='Tags', slug='tags')
+        self.root_page.add_child(instance=self.tag_page)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = self.add_recipe('bolo', ['doce'], title='Bolo')
+            # Publicar gera as renditions, que entram no ETag
+            self.recipe.save_revision().publish()
+        self.tag = Tag.objects.get(name='doce')
+
+    def test_cache_control_per_page_type(self):
+        """Test recipes are cached longer than the listings"""
+        recipe = self.client.get('/receitas/bolo/')['Cache-Control']
+        index = self.client.get('/receitas/')['Cache-Control']
+        self.assertIn('public', recipe)
+        self.assertIn('max-age=600', recipe)
+        self.assertIn('stale-while-revalidate=86400', recipe)
+        self.assertIn('max-age=60', index)
+
+    def test_cached_and_not_modified_responses_keep_headers(self):
+        """Test the page cache hit and the 304 carry the same caching headers as the render"""
+        first = self.client.get('/receitas/bolo/')
+        second = self.client.get('/receitas/bolo/')
+        not_modified = self.client.get('/receitas/bolo/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        for response in [second, not_modified]:
+            self.assertEqual(response['Cache-Control'], first['Cache-Control'])
+            self.assertEqual(response['Surrogate-Key'], first['Surrogate-Key'])
+
+    def test_surrogate_keys(self):
+        """Test responses are tagged with the page, its index and the tags shown on it"""
+        keys = self.client.get('/receitas/bolo/')['Surrogate-Key'].split()
+        self.assertCountEqual(
+            keys, ['pages', f'page-{self.recipe.pk}', f'index-{self.index_page.pk}', f'tag-{self.tag.pk}']
+        )
+        self.assertIn(f'tag-{self.tag.pk}', self.client.get('/tags/?tag=doce')['Surrogate-Key'].split())
+        self.assertNotIn(f'tag-{self.tag.pk}', self.client.get('/tags/')['Surrogate-Key'].split())
+
+    def test_logged_in_responses_are_private(self):
+        """Test pages rendered for a logged-in user can't be stored by a CDN"""
+        self.login()
+        response = self.client.get('/receitas/bolo/')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertNotIn('Surrogate-Key', response)
+
+    def test_admin_and_accounts_are_never_cached(self):
+        """Test the admin and account pages are never stored"""
+        for url in ['/cms/login/', '/accounts/login/']:
+            with self.subTest(url=url):
+                self.assertIn('no-store', self.client.get(url)['Cache-Control'])
@@ -0,0 +1,49 @@
+import os
+from io import StringIO
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase, TransactionTestCase
+
+from cdc.settings import connection_config
+
+
+class TestConnectionConfig(SimpleTestCase):
+    def config(self, **environ):
+        with mock.patch.dict(os.environ, environ):
+            for var in {'DB_POOL', 'DB_CONN_MAX_AGE'} - environ.keys():
+                os.environ.pop(var, None)
+            return connection_config()
+
+    def test_persistent_by_default(self):
+        """Test each process keeps its connection for DB_CONN_MAX_AGE seconds, without a pool"""
+        self.assertEqual(self.config(), (60, False))
+        self.assertEqual(self.config(DB_CONN_MAX_AGE='30'), (30, False))
+
+    def test_pool(self):
+        """Test DB_POOL turns on psycopg's pool and turns off the persistent connection"""
+        conn_max_age, pool = self.config(DB_POOL='True', DB_POOL_MAX_SIZE='4')
+        self.assertEqual(conn_max_age, 0)
+        self.assertEqual(pool['max_size'], 4)
+        self.assertEqual(self.config(DB_POOL='True', DB_CONN_MAX_AGE='')[0], 0)
+
+    def test_pool_excludes_conn_max_age(self):
+        """Test the pool and a persistent connection can't be configured together"""
+        with self.assertRaises(ImproperlyConfigured):
+            self.config(DB_POOL='True', DB_CONN_MAX_AGE='60')
+
+
+class TestBenchmarkDbConnections(TransactionTestCase):
+    # A página inicial do Wagtail vem da migração e precisa voltar depois do flush
+    serialized_rollback = True
+
+    def test_reports_every_mode(self):
+        """Test each connection mode is measured and the default connection is restored"""
+        default = connections[DEFAULT_DB_ALIAS]
+        stdout = StringIO()
+        call_command('benchmark_db_connections', requests=3, warmup=1, stdout=stdout)
+        for mode in ['nova conexão', 'persistente', 'pool']:
+            self.assertIn(mode, stdout.getvalue())
+        self.assertIs(connections[DEFAULT_DB_ALIAS], default)
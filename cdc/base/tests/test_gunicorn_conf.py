@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+from django.utils.module_loading import import_string
+
+from cdc.gunicorn_conf import server_settings
+
+
+class TestServerSettings(SimpleTestCase):
+    def test_wsgi_by_default(self):
+        """Test the WSGI app runs on sync workers, 2 * CPUs + 1"""
+        settings = server_settings({}, cpus=4)
+        self.assertEqual(settings['wsgi_app'], 'cdc.wsgi:application')
+        self.assertEqual(settings['worker_class'], 'sync')
+        self.assertEqual(settings['workers'], 9)
+
+    def test_asgi(self):
+        """Test SERVER_MODE=asgi runs uvicorn workers without dropping below the sync process count"""
+        settings = server_settings({'SERVER_MODE': 'asgi'}, cpus=4)
+        self.assertEqual(settings['wsgi_app'], 'cdc.asgi:application')
+        self.assertEqual(settings['worker_class'], 'cdc.gunicorn_conf.UvicornWorker')
+        self.assertEqual(settings['workers'], 9)
+
+    def test_uvicorn_worker_is_loaded_on_demand(self):
+        """Test the uvicorn worker class gunicorn imports in asgi mode runs without lifespan"""
+        worker_class = import_string(server_settings({'SERVER_MODE': 'asgi'}, cpus=1)['worker_class'])
+        self.assertEqual(worker_class.CONFIG_KWARGS['lifespan'], 'off')
+
+    def test_web_concurrency_overrides_cpu_count(self):
+        """Test WEB_CONCURRENCY sets the number of workers"""
+        self.assertEqual(server_settings({'WEB_CONCURRENCY': '3'}, cpus=8)['workers'], 3)
+
+    def test_unknown_server(self):
+        """Test an unknown SERVER_MODE fails at startup"""
+        with self.assertRaises(ValueError):
+            server_settings({'SERVER_MODE': 'uwsgi'}, cpus=2)
+
+    def test_local_memory_cache_needs_one_worker(self):
+        """Test a per-process cache is refused when there is more than one worker"""
+        with self.assertRaises(ValueError):
+            server_settings({'CACHE_URL': 'locmemcache://'}, cpus=2)
+        with self.assertRaises(ValueError):
+            server_settings({'VERSIONS_CACHE_URL': 'locmemcache://'}, cpus=2)
+        self.assertEqual(server_settings({'CACHE_URL': 'locmemcache://', 'WEB_CONCURRENCY': '1'}, cpus=2)['workers'], 1)
@@ -0,0 +1,81 @@
+from django.core.cache import cache
+from django.test import RequestFactory, override_settings
+from wagtail.models import Page, Site
+from wagtail.test.utils import WagtailPageTestCase
+
+from cdc.base.models import HomePage
+from cdc.base.navigation import get_navigation
+from cdc.base.templatetags.navigation_tags import is_active_menuitem
+
+
+class TestNavigation(WagtailPageTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.root_page = Page.objects.get(slug='home')
+        self.about = HomePage(title='Sobre', slug='sobre', show_in_menus=True)
+        self.root_page.add_child(instance=self.about)
+        self.root_page.add_child(instance=HomePage(title='Escondida', slug='escondida'))
+
+    def get_request(self):
+        request = RequestFactory().get('/')
+        # Como no roteamento do Wagtail, o site já vem resolvido no request
+        Site.find_for_request(request)
+        return request
+
+    def test_menu_items(self):
+        """Test the navigation holds the site root and the live in-menu children"""
+        navigation = get_navigation(self.get_request())
+        self.assertEqual(navigation['root'].pk, self.root_page.pk)
+        self.assertEqual([item.title for item in navigation['items']], ['Sobre'])
+        self.assertEqual(navigation['items'][0].url, '/sobre/')
+
+    def test_warm_cache_costs_no_queries(self):
+        """Test the navigation is read from the cache once built"""
+        get_navigation(self.get_request())
+        request = self.get_request()
+        with self.assertNumQueries(0):
+            get_navigation(request)
+
+    def test_site_is_looked_up_once_per_request(self):
+        """Test a request not routed by Wagtail finds its site once and reuses it"""
+        get_navigation(self.get_request())
+        request = RequestFactory().get('/')
+        get_navigation(request)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_navigation(request)['root'].pk, self.root_page.pk)
+
+    def test_publish_invalidates_cache(self):
+        """Test publishing a page rebuilds the menu"""
+        get_navigation(self.get_request())
+        with self.captureOnCommitCallbacks(execute=True):
+            contact = HomePage(title='Contato', slug='contato', show_in_menus=True, live=False)
+            self.root_page.add_child(instance=contact)
+            contact.save_revision().publish()
+        navigation = get_navigation(self.get_request())
+        self.assertEqual([item.title for item in navigation['items']], ['Sobre', 'Contato'])
+
+    def test_unpublish_invalidates_cache(self):
+        """Test unpublishing a menu page removes it from the menu"""
+        get_navigation(self.get_request())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.about.unpublish()
+        self.assertEqual(get_navigation(self.get_request())['items'], [])
+
+    def test_cache_expires(self):
+        """Test the menu is built again after NAVIGATION_CACHE_TIMEOUT, even without an invalidation"""
+        with override_settings(NAVIGATION_CACHE_TIMEOUT=0):
+            get_navigation(self.get_request())
+            # Um UPDATE não dispara os sinais, como uma mudança vista por outro processo
+            Page.objects.filter(pk=self.about.pk).update(title='Quem somos')
+            self.assertEqual([item.title for item in get_navigation(self.get_request())['items']], ['Quem somos'])
+
+    def test_is_active_menuitem(self):
+        """Test a menu item is active for itself and its descendants only"""
+        child = HomePage(title='Equipe', slug='equipe')
+        self.about.add_child(instance=child)
+        item = get_navigation(self.get_request())['items'][0]
+        self.assertTrue(is_active_menuitem({'page': self.about}, item))
+        self.assertTrue(is_active_menuitem({'page': child}, item))
+        self.assertFalse(is_active_menuitem({'page': self.root_page}, item))
+        self.assertFalse(is_active_menuitem({}, item))
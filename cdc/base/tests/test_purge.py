@@ -0,0 +1,103 @@
+import threading
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import TestCase, override_settings
+from taggit.models import Tag
+
+from cdc.base.purge import HTTPPurgeBackend
+from cdc.recipes.tests.utils import RecipeTestCase
+
+
+class FakePurgeServer:
+    """Endpoint HTTP local que registra os pedidos de purge e responde `status`."""
+
+    def __init__(self, status=200):
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def handle_purge(self):
+                server.requests.append((self.command, self.path, self.headers))
+                self.send_response(server.status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            do_POST = do_PURGE = handle_purge
+
+            def log_message(self, *args):
+                pass
+
+        self.status = status
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/purge'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def purged_keys(self):
+        return {key for _, _, headers in self.requests for key in headers['Surrogate-Key'].split()}
+
+
+class TestHTTPPurgeBackend(TestCase):
+    def setUp(self):
+        self.server = FakePurgeServer()
+        self.addCleanup(self.server.close)
+
+    def test_keys_are_sent_in_batches(self):
+        """Test the keys go in the header, split in requests of at most batch_size keys"""
+        backend = HTTPPurgeBackend(self.server.url, headers={'Fastly-Key': 'token'}, batch_size=2)
+        backend.purge(['page-1', 'page-2', 'page-3', 'page-1'])
+        self.assertEqual(len(self.server.requests), 2)
+        method, path, headers = self.server.requests[0]
+        self.assertEqual((method, path), ('POST', '/purge'))
+        self.assertEqual(headers['Fastly-Key'], 'token')
+        self.assertEqual(self.server.purged_keys(), {'page-1', 'page-2', 'page-3'})
+
+    def test_method_and_header_are_configurable(self):
+        """Test a Varnish-style PURGE with an xkey header"""
+        HTTPPurgeBackend(self.server.url, method='PURGE', header='xkey').purge(['pages'])
+        method, _, headers = self.server.requests[0]
+        self.assertEqual(method, 'PURGE')
+        self.assertEqual(headers['xkey'], 'pages')
+
+    def test_error_response_raises(self):
+        """Test a failed purge raises, so the task is retried"""
+        self.server.status = 503
+        with self.assertRaises(urllib.error.HTTPError):
+            HTTPPurgeBackend(self.server.url).purge(['pages'])
+
+
+class TestPurgeOnPublish(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = FakePurgeServer()
+        self.addCleanup(self.server.close)
+        self.recipe = self.add_recipe('bolo', ['doce'], title='Bolo')
+
+    def cdn_settings(self):
+        return override_settings(
+            CDN_PURGE={'BACKEND': 'cdc.base.purge.HTTPPurgeBackend', 'OPTIONS': {'url': self.server.url}}
+        )
+
+    def test_publish_purges_page_and_listing(self):
+        """Test publishing a recipe purges it and its index from the CDN"""
+        with self.cdn_settings(), self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save_revision().publish()
+        self.assertTrue({f'page-{self.recipe.pk}', f'page-{self.index_page.pk}'} <= self.server.purged_keys())
+
+    def test_tag_rename_purges_tag_key(self):
+        """Test renaming a tag purges every response tagged with it"""
+        tag = Tag.objects.get(name='doce')
+        with self.cdn_settings(), self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Doces'
+            tag.save()
+        self.assertIn(f'tag-{tag.pk}', self.server.purged_keys())
+
+    def test_nothing_is_purged_without_backend(self):
+        """Test no request is made when CDN_PURGE has no backend"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save_revision().publish()
+        self.assertEqual(self.server.requests, [])
@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from wagtail.models import Page
+
+from cdc.base.middleware import SQLProfileMiddleware
+from cdc.base.models import HomePage
+from cdc.base.sqlprofile import normalize_sql, profile_queries
+
+
+class TestNormalizeSql(TestCase):
+    def test_values_and_in_lists_are_collapsed(self):
+        """Test statements that differ only in their values normalize to the same text"""
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE id IN (%s, %s,%s) AND name = 'a'\n  LIMIT 21"),
+            'SELECT * FROM t WHERE id IN (...) AND name = %s LIMIT %s',
+        )
+
+
+class TestQueryProfile(TestCase):
+    def test_groups_repeated_statements(self):
+        """Test the same query run in a loop is reported once, as repeated"""
+        with profile_queries() as profile:
+            for pk in range(3):
+                list(Group.objects.filter(pk=pk))
+            Group.objects.count()
+        self.assertEqual(len(profile), 4)
+        self.assertEqual([statement.count for statement in profile.repeated()], [3])
+        self.assertIn('3x', profile.report())
+
+
+class TestSQLProfileMiddleware(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/receitas/')
+
+    def view(self, request):
+        list(Group.objects.all())
+        list(Group.objects.all())
+        return HttpResponse()
+
+    @override_settings(SQL_PROFILE=False)
+    def test_disabled_by_default(self):
+        """Test the middleware leaves the stack unless SQL_PROFILE is on"""
+        with self.assertRaises(MiddlewareNotUsed):
+            SQLProfileMiddleware(self.view)
+
+    @override_settings(SQL_PROFILE=True, SQL_PROFILE_SLOW_MS=10_000)
+    def test_server_timing_header(self):
+        """Test the query count and DB time are sent in Server-Timing"""
+        response = SQLProfileMiddleware(self.view)(self.request)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="2 queries"$')
+
+    @override_settings(SQL_PROFILE=True, SQL_PROFILE_SLOW_MS=0)
+    def test_slow_request_is_logged(self):
+        """Test requests slower than SQL_PROFILE_SLOW_MS go to the sqlprofile log"""
+        with self.assertLogs('cdc.sqlprofile', 'WARNING') as logs:
+            SQLProfileMiddleware(self.view)(self.request)
+        self.assertIn('GET /receitas/', logs.output[0])
+        self.assertIn('1 repetidas', logs.output[0])
+
+    @override_settings(SQL_PROFILE=True, SQL_PROFILE_SLOW_MS=10_000)
+    def test_fast_request_within_budget_is_not_logged(self):
+        """Test fast requests within the budget stay out of the log"""
+        self.request.query_budget = 5
+        with self.assertNoLogs('cdc.sqlprofile'):
+            SQLProfileMiddleware(self.view)(self.request)
+
+    @override_settings(SQL_PROFILE=True, SQL_PROFILE_SLOW_MS=10_000)
+    def test_sentry_span(self):
+        """Test the request totals are recorded on a Sentry span"""
+        with mock.patch('cdc.base.middleware.sentry_sdk') as sentry_sdk:
+            SQLProfileMiddleware(self.view)(self.request)
+        start_span = sentry_sdk.start_span
+        start_span.assert_called_once_with(op='db.profile', name='GET /receitas/')
+        span = start_span.return_value.__enter__.return_value
+        span.set_data.assert_any_call('db.query_count', 2)
+
+    @override_settings(SQL_PROFILE=True, SQL_PROFILE_SLOW_MS=10_000, PAGE_CACHE_TIMEOUT=0)
+    def test_page_over_budget_is_logged(self):
+        """Test a Wagtail page rendering more queries than its query_budget is logged"""
+        Page.objects.get(slug='home').add_child(instance=HomePage(title='Sobre', slug='sobre'))
+        with mock.patch.object(HomePage, 'query_budget', 1), self.assertLogs('cdc.sqlprofile', 'WARNING') as logs:
+            Client().get('/sobre/')
+        self.assertIn('orçamento 1', logs.output[0])
@@ -0,0 +1,149 @@
+import gzip
+import os
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, override_settings
+
+from cdc.base.cache import invalidate_all_pages
+from cdc.base.static_export import export_client, output_file
+from cdc.recipes.models import RecipeTagCount, RecipeTagIndexPage
+from cdc.recipes.tests.utils import RecipeTestCase
+
+
+class TestStaticExport(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.output = Path(tempfile.mkdtemp())
+        self.root_page.add_child(instance=RecipeTagIndexPage(title='Tags', slug='tags'))
+        self.recipe = self.add_recipe('bolo', ['doce', 'pão', 'de forno'], title='Bolo')
+        RecipeTagCount.objects.rebuild()
+
+    def exported(self, path):
+        target = self.output / path.strip('/') / 'index.html'
+        return target.read_text() if target.exists() else None
+
+    def export_settings(self):
+        return override_settings(STATIC_EXPORT_DIR=str(self.output), STATIC_EXPORT_FILE_MAX_AGE=0)
+
+    def test_command_exports_public_pages(self):
+        """Test export_static writes the listings, tag pages and recipes with a gzipped copy"""
+        call_command('export_static', '--output', str(self.output), '--processes', '1', stdout=StringIO())
+        for path in ['/receitas/', '/tags/', '/tags/doce/', '/tags/pão/']:
+            self.assertIsNotNone(self.exported(path), path)
+        self.assertIn('Bolo', self.exported('/receitas/bolo/'))
+        self.assertIn('href="/tags/p%C3%A3o/"', self.exported('/receitas/bolo/'))
+        # Nomes que não cabem num segmento de URL continuam na listagem dinâmica
+        self.assertIn('href="/tags/?tag=de+forno"', self.exported('/receitas/bolo/'))
+        gzipped = self.output / 'receitas' / 'bolo' / 'index.html.gz'
+        self.assertEqual(gzip.decompress(gzipped.read_bytes()).decode(), self.exported('/receitas/bolo/'))
+
+    @override_settings(ALLOWED_HOSTS=['receitas.example.com', 'localhost'])
+    def test_export_client_uses_default_site_host(self):
+        """Test the export client requests the default site's hostname, falling back to ALLOWED_HOSTS"""
+        self.assertEqual(export_client().defaults['HTTP_HOST'], 'localhost')
+        with override_settings(ALLOWED_HOSTS=['.example.com']):
+            self.assertEqual(export_client().defaults['HTTP_HOST'], 'example.com')
+
+    def test_full_export_prunes_removed_pages(self):
+        """Test a full export deletes the files of pages that are no longer published"""
+        stale = self.output / 'antiga' / 'index.html'
+        stale.parent.mkdir(parents=True)
+        stale.write_text('antiga')
+        call_command('export_static', '--output', str(self.output), '--processes', '1', stdout=StringIO())
+        self.assertFalse((self.output / 'antiga').exists())
+
+    def test_publish_rerenders_affected_pages(self):
+        """Test publishing a recipe re-renders it and its listings, and unpublishing deletes its file"""
+        with self.export_settings():
+            call_command('export_static', '--processes', '1', stdout=StringIO())
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipe.title = 'Bolo de fubá'
+                self.recipe.save_revision().publish()
+            for path in ['/receitas/bolo/', '/receitas/', '/tags/doce/']:
+                self.assertIn('bolo de fubá', self.exported(path).lower(), path)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipe.unpublish()
+            self.assertIsNone(self.exported('/receitas/bolo/'))
+            self.assertNotIn('bolo de fubá', self.exported('/receitas/').lower())
+
+    def test_slug_change_removes_old_file(self):
+        """Test changing a recipe slug moves its file to the new address"""
+        with self.export_settings():
+            call_command('export_static', '--processes', '1', stdout=StringIO())
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipe.slug = 'bolo-simples'
+                self.recipe.save_revision().publish()
+            self.assertIsNone(self.exported('/receitas/bolo/'))
+            self.assertIn('Bolo', self.exported('/receitas/bolo-simples/'))
+
+    def test_site_wide_change_marks_export_stale(self):
+        """Test a menu change without the task queue marks the export stale instead of rendering the site"""
+        with self.export_settings():
+            call_command('export_static', '--processes', '1', stdout=StringIO())
+            with mock.patch('cdc.base.static_export.export_site') as export_site:
+                with self.captureOnCommitCallbacks(execute=True):
+                    invalidate_all_pages()
+            export_site.assert_not_called()
+            self.assertTrue((self.output / '.stale').exists())
+            call_command('export_static', '--processes', '1', stdout=StringIO())
+            self.assertFalse((self.output / '.stale').exists())
+
+    def test_site_wide_change_is_queued(self):
+        """Test a menu change re-exports the whole site when the tasks go to a queue"""
+        with self.export_settings(), mock.patch('cdc.base.cache.export_static_pages') as task:
+            task.get_backend.return_value = object()
+            invalidate_all_pages()
+        task.enqueue.assert_called_once_with(None, [])
+        self.assertFalse((self.output / '.stale').exists())
+
+    def test_paths_outside_output_are_rejected(self):
+        """Test an address can't write outside the export directory"""
+        with self.assertRaises(ValueError):
+            output_file(self.output, '/tags/%2E%2E/%2E%2E/')
+
+
+class TestStaticPagesMiddleware(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.output = Path(tempfile.mkdtemp())
+        target = self.output / 'receitas' / 'index.html'
+        target.parent.mkdir(parents=True)
+        target.write_text('<p>Exportada</p>')
+        settings = override_settings(STATIC_EXPORT_DIR=str(self.output), STATIC_EXPORT_FILE_MAX_AGE=600)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = Client()
+
+    def test_anonymous_get_is_served_from_disk(self):
+        """Test an anonymous GET gets the exported file without touching the database"""
+        with self.assertNumQueries(0):
+            response = self.client.get('/receitas/')
+        self.assertEqual(b''.join(response.streaming_content), b'<p>Exportada</p>')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertEqual(response['Cache-Control'], 'max-age=60, public')
+
+    def test_dynamic_requests_reach_django(self):
+        """Test query strings, htmx requests, sessions and the exporter itself bypass the files"""
+        for path, headers in [
+            ('/receitas/?after=abc', {}),
+            ('/receitas/', {'HX-Request': 'true'}),
+            ('/receitas/', {'X-Static-Export': '1'}),
+        ]:
+            self.assertNotContains(self.client.get(path, headers=headers), 'Exportada')
+        self.login()
+        self.assertNotContains(self.client.get('/receitas/'), 'Exportada')
+
+    def test_stale_export_is_not_served(self):
+        """Test every request goes to Django while the export is marked stale"""
+        (self.output / '.stale').touch()
+        self.assertNotContains(self.client.get('/receitas/'), 'Exportada')
+
+    def test_old_files_are_not_served(self):
+        """Test a file older than STATIC_EXPORT_FILE_MAX_AGE falls back to Django"""
+        os.utime(self.output / 'receitas' / 'index.html', (0, 0))
+        self.assertNotContains(self.client.get('/receitas/'), 'Exportada')
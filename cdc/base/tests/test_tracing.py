@@ -0,0 +1,98 @@
+"""
+Spans do Sentry nas partes lentas de um request: contexto das listagens, template, renditions e
+storage. O Sentry é iniciado com o CapturingTransport (conftest.py) e nada sai do processo.
+"""
+
+import tempfile
+
+import pytest
+import sentry_sdk
+from django.test import override_settings
+from django_tasks import task
+from wagtail.images.models import Image
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Page
+
+from cdc.base.storage import TracedS3Storage
+from cdc.recipes.models import RecipeIndexPage, RecipePage, RecipeTagIndexPage
+from cdc.recipes.tasks import generate_recipe_renditions
+from cdc.tasks.tests.test_queue import QUEUE_SETTINGS
+from cdc.tasks.worker import Worker
+
+
+def span_ops(transaction):
+    return [span['op'] for span in transaction['spans']]
+
+
+@task()
+def noop():
+    return None
+
+
+@pytest.fixture
+def recipe(db, settings):
+    settings.MEDIA_ROOT = tempfile.mkdtemp()
+    settings.PAGE_CACHE_TIMEOUT = 0
+    settings.FRAGMENT_CACHE_TIMEOUT = 0
+    root = Page.objects.get(slug='home')
+    index = root.add_child(instance=RecipeIndexPage(title='Receitas', slug='receitas'))
+    root.add_child(instance=RecipeTagIndexPage(title='Tags', slug='tags'))
+    image = Image.objects.create(title='Bolo', file=get_test_image_file())
+    recipe = RecipePage(
+        title='Bolo', slug='bolo', description='Teste', directions='<p>Asse.</p>', font='Teste', image=image
+    )
+    index.add_child(instance=recipe)
+    recipe.tags.add('doce')
+    recipe.save_revision().publish()
+    return recipe
+
+
+def test_sampling_is_off_by_default():
+    """Test the settings keep tracing and profiling off unless the environment turns them on"""
+    options = sentry_sdk.get_client().options
+    assert options['traces_sample_rate'] == 0.0
+    assert options['profiles_sample_rate'] == 0.0
+
+
+@pytest.mark.parametrize('path', ['/receitas/', '/tags/?tag=doce'])
+def test_listing_context_and_template_spans(client, recipe, sentry_transport, path):
+    """Test a listing request records its get_context, the template render and the card pictures"""
+    # O Client de teste não passa pelo WSGIHandler, onde a integração do Django abre a transação
+    with sentry_sdk.start_transaction(op='http.server', name=path):
+        response = client.get(path)
+    assert response.status_code == 200
+    [transaction] = sentry_transport.transactions()
+    ops = span_ops(transaction)
+    assert 'page.context' in ops
+    assert 'template.render' in ops
+    assert 'image.picture' in ops
+
+
+def test_rendition_task_span(recipe, sentry_transport):
+    """Test rendition generation is a span of the surrounding transaction"""
+    with sentry_sdk.start_transaction(op='test', name='renditions'):
+        generate_recipe_renditions.call(recipe.image_id)
+    [transaction] = sentry_transport.transactions()
+    assert 'image.renditions' in span_ops(transaction)
+
+
+def test_storage_spans(sentry_transport):
+    """Test S3 storage calls are traced, including URL signing that makes no HTTP request"""
+    storage = TracedS3Storage(bucket_name='cdc', access_key='key', secret_key='secret', region_name='us-east-1')
+    with sentry_sdk.start_transaction(op='test', name='storage'):
+        url = storage.url('original_images/bolo.jpg')
+    assert 'Signature=' in url
+    [transaction] = sentry_transport.transactions()
+    [span] = [span for span in transaction['spans'] if span['op'] == 'storage.url']
+    assert span['description'] == 'original_images/bolo.jpg'
+
+
+@override_settings(TASKS=QUEUE_SETTINGS)
+def test_worker_task_transaction(db, django_capture_on_commit_callbacks, sentry_transport):
+    """Test each task run by the worker is its own transaction, named after the task"""
+    with django_capture_on_commit_callbacks(execute=True):
+        noop.enqueue()
+    Worker().run(burst=True)
+    [transaction] = sentry_transport.transactions()
+    assert transaction['transaction'] == noop.module_path
+    assert transaction['contexts']['trace']['op'] == 'queue.task'
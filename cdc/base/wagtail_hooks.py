@@ -0,0 +1,9 @@
+from wagtail import hooks
+
+from cdc.base.sqlprofile import get_query_budget
+
+
+@hooks.register('before_serve_page')
+def set_query_budget(page, request, serve_args, serve_kwargs):
+    # Lido pelo SQLProfileMiddleware para comparar com as queries do request
+    request.query_budget = get_query_budget(page)
@@ -0,0 +1,85 @@
+"""
+Configuração do Gunicorn em produção (docker/prod/start.xsh: `gunicorn -c python:cdc.gunicorn_conf`).
+
+Por padrão o site roda em WSGI, com workers síncronos: as páginas do Wagtail são síncronas e cada
+processo renderiza uma por vez, então a concorrência vem da quantidade de processos.
+
+`SERVER_MODE=asgi` troca para os workers do uvicorn. Ganham com isso só as views assíncronas, como o
+autocomplete, que rodam direto no event loop. As páginas continuam síncronas: o handler ASGI do
+Django as executa em threads (sync_to_async), que disputam o GIL do processo, e renderizar HTML não
+fica mais paralelo que em WSGI. Por isso a quantidade padrão de processos é a mesma nos dois modos.
+
+Variáveis de ambiente:
+
+* SERVER_MODE: `wsgi` (padrão) ou `asgi`;
+* WEB_CONCURRENCY: quantidade de processos. Sem ela, 2 * CPUs disponíveis + 1;
+* WEB_TIMEOUT: segundos até o Gunicorn reiniciar um worker travado (padrão 30);
+* PORT: porta HTTP (padrão 8000).
+
+Com mais de um worker o CACHE_URL e o VERSIONS_CACHE_URL não podem ser o LocMem, que é de um processo só
+(cdc/settings.py).
+"""
+
+import functools
+import os
+
+SERVER_MODES = {
+    'asgi': ('cdc.asgi:application', 'cdc.gunicorn_conf.UvicornWorker'),
+    'wsgi': ('cdc.wsgi:application', 'sync'),
+}
+
+
+@functools.cache
+def uvicorn_worker_class():
+    # Importado só quando o gunicorn carrega o worker do SERVER_MODE=asgi: em WSGI o uvicorn (e o
+    # uvicorn.workers, que ele marca como obsoleto) não entra no processo
+    from uvicorn.workers import UvicornWorker as BaseUvicornWorker
+
+    class UvicornWorker(BaseUvicornWorker):
+        # O Django não implementa o protocolo lifespan do ASGI
+        CONFIG_KWARGS = {**BaseUvicornWorker.CONFIG_KWARGS, 'lifespan': 'off'}
+
+    return UvicornWorker
+
+
+def __getattr__(name):
+    # cdc.gunicorn_conf.UvicornWorker, o worker_class do modo asgi
+    if name == 'UvicornWorker':
+        return uvicorn_worker_class()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def default_workers(cpus):
+    return 2 * cpus + 1
+
+
+def server_settings(environ, cpus):
+    """Aplicação, classe e quantidade de workers para o ambiente e as CPUs informados."""
+    mode = environ.get('SERVER_MODE', 'wsgi').lower()
+    if mode not in SERVER_MODES:
+        raise ValueError(f'SERVER_MODE deve ser um de {", ".join(SERVER_MODES)}, não {mode!r}')
+    app, worker_class = SERVER_MODES[mode]
+    workers = int(environ.get('WEB_CONCURRENCY') or default_workers(cpus))
+    for var in ('CACHE_URL', 'VERSIONS_CACHE_URL'):
+        if workers > 1 and environ.get(var, '').startswith('locmemcache://'):
+            # Cada worker teria o seu cache: uma publicação só invalidaria as páginas de um deles
+            raise ValueError(f'{var}=locmemcache:// não é compartilhado entre os workers; use filecache ou redis')
+    return {'wsgi_app': app, 'worker_class': worker_class, 'workers': workers}
+
+
+# os.process_cpu_count respeita a afinidade de CPU do container
+_settings = server_settings(os.environ, os.process_cpu_count() or 1)
+wsgi_app = _settings['wsgi_app']
+worker_class = _settings['worker_class']
+workers = _settings['workers']
+bind = f':{os.environ.get("PORT", "8000")}'
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+capture_output = True
+
+
+def post_worker_init(worker):
+    # Com a aplicação já carregada: o worker começa a montar o índice de ingredientes numa thread,
+    # em vez de deixar isso para a primeira consulta (cdc/recipes/pantry.py)
+    from cdc.recipes.pantry import pantry
+
+    pantry.warm()
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cdc.recipes'
+
+    def ready(self):
+        from cdc.recipes import signals  # noqa: F401
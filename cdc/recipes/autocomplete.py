@@ -0,0 +1,92 @@
+"""
+Sugestões de busca enquanto o usuário digita.
+
+Títulos de receitas vêm do índice de autocomplete do backend de busca (tsvector com índice GIN)
+e ingredientes de um índice de prefixo em LOWER(name). Como cada tecla vira uma requisição,
+as respostas ficam num cache em memória do processo, com validade curta, indexado pelo
+prefixo normalizado.
+
+A view é assíncrona: os ingredientes vêm pelo ORM assíncrono do Django e só a busca de títulos,
+que o backend de busca do Wagtail não oferece em versão assíncrona, roda numa thread.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.db.models.functions import Lower
+
+from cdc.recipes.models import Ingredient, RecipePage
+
+MIN_PREFIX_LENGTH = 2
+MAX_RESULTS = 8
+CACHE_TTL = 30
+CACHE_MAX_ENTRIES = 2048
+
+
+class TTLCache:
+    """Cache LRU em memória, com expiração por entrada e seguro entre threads."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL)
+
+
+def normalize_prefix(prefix):
+    return ' '.join((prefix or '').casefold().split())
+
+
+def recipe_suggestions(prefix, limit):
+    return [
+        {'title': recipe.title, 'url': recipe.url} for recipe in RecipePage.objects.live().autocomplete(prefix)[:limit]
+    ]
+
+
+async def asuggest(prefix, limit=MAX_RESULTS):
+    """Retorna {'recipes': [{'title', 'url'}], 'ingredients': [{'id', 'name'}]} para o prefixo."""
+    prefix = normalize_prefix(prefix)
+    if len(prefix) < MIN_PREFIX_LENGTH:
+        return {'recipes': [], 'ingredients': []}
+
+    suggestions = cache.get(prefix)
+    if suggestions is None:
+        suggestions = {
+            'recipes': await sync_to_async(recipe_suggestions)(prefix, limit),
+            'ingredients': [
+                {'id': ingredient.pk, 'name': ingredient.name}
+                async for ingredient in Ingredient.objects.annotate(name_lower=Lower('name'))
+                .filter(name_lower__startswith=prefix)
+                .order_by('name_lower')[:limit]
+            ],
+        }
+        cache.set(prefix, suggestions)
+    return suggestions
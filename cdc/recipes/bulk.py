@@ -0,0 +1,131 @@
+"""
+Inserção de receitas em massa, sem passar pelo `add_child` e pelo `save` de cada objeto.
+
+Usado pelos comandos `seed_recipes` e `import_recipes`: as páginas entram na árvore do Wagtail em
+lote, os nomes do catálogo (ingredientes, métricas, qualificadores, tags) viram ids com uma query
+por lote e o índice de busca é atualizado no fim, também em lotes.
+"""
+
+from collections import Counter
+from itertools import batched
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F, Prefetch
+from django.utils import timezone
+from django.utils.text import slugify
+from wagtail.models import Page
+from wagtail.search.backends import get_search_backend
+
+from cdc.recipes.models import RecipeIngredient, RecipePage
+
+
+class LookupCache:
+    """
+    Valor de um campo (ex.: nome do ingrediente) → pk, para um modelo de catálogo.
+
+    `resolve` busca de uma vez os valores que ainda não estão no cache e cria em lote os que não
+    existem no banco. O cache dura o comando inteiro, então cada nome custa no máximo uma busca.
+    """
+
+    def __init__(self, model, field='name', build=None):
+        self.model = model
+        self.field = field
+        self.build = build or (lambda value: model(**{field: value}))
+        self.ids = {}
+
+    def __getitem__(self, value):
+        return self.ids[value]
+
+    def lookup(self, values):
+        # order_by('-pk'): com valores repetidos no banco (métricas e qualificadores não são únicos) fica o mais antigo
+        queryset = self.model._base_manager.filter(**{f'{self.field}__in': values}).order_by('-pk')
+        self.ids.update(queryset.values_list(self.field, 'pk'))
+
+    def resolve(self, values):
+        missing = set(values) - self.ids.keys()
+        if not missing:
+            return
+        self.lookup(missing)
+        missing -= self.ids.keys()
+        if not missing:
+            return
+        self.model._base_manager.bulk_create([self.build(value) for value in missing], ignore_conflicts=True)
+        self.lookup(missing)
+        # Conflito em outro campo único (ex.: o slug da tag) descarta a linha; o save resolve um a um
+        for value in missing - self.ids.keys():
+            instance = self.build(value)
+            instance.save()
+            self.ids[value] = instance.pk
+
+
+def insert_recipe_pages(parent, recipes):
+    """
+    Insere as receitas (instâncias de RecipePage ainda não salvas) publicadas como filhas de `parent`.
+
+    Grava o caminho do treebeard, o url_path e a linha de Page ligada à de RecipePage. bulk_create
+    não aceita herança multi-tabela, então a tabela filha é inserida à parte. Receitas sem slug
+    recebem o título com o número do passo na árvore, único entre as filhas do índice.
+
+    Levanta ValueError se um slug não for válido (o que `slugify` mudaria) ou já for de outra filha de
+    `parent`, ou se repetir na lista: sem o `full_clean` do `add_child`, nada mais confere isso.
+    """
+    parent = Page.objects.get(pk=parent.pk)
+    last_child = parent.get_last_child()
+    last_step = Page._str2int(last_child.path[-Page.steplen :]) if last_child else 0
+    content_type = ContentType.objects.get_for_model(RecipePage)
+    now = timezone.now()
+    slugs = [recipe.slug or slugify(f'{recipe.title}-{step}') for step, recipe in enumerate(recipes, last_step + 1)]
+    check_slugs(parent, slugs)
+    pages = []
+    for step, (recipe, slug) in enumerate(zip(recipes, slugs), start=last_step + 1):
+        published_at = recipe.first_published_at or now
+        pages.append(
+            Page(
+                title=recipe.title,
+                draft_title=recipe.title,
+                slug=slug,
+                content_type=content_type,
+                locale_id=parent.locale_id,
+                path=Page._get_path(parent.path, parent.depth + 1, step),
+                depth=parent.depth + 1,
+                numchild=0,
+                url_path=f'{parent.url_path}{slug}/',
+                live=True,
+                first_published_at=published_at,
+                last_published_at=published_at,
+            )
+        )
+    Page.objects.bulk_create(pages)
+    Page.objects.filter(pk=parent.pk).update(numchild=F('numchild') + len(pages))
+
+    for recipe, page in zip(recipes, pages):
+        for field in Page._meta.concrete_fields:
+            setattr(recipe, field.attname, getattr(page, field.attname))
+        recipe.page_ptr_id = page.pk
+    # bulk_create levanta ValueError para qualquer modelo com herança multi-tabela, mesmo com as linhas
+    # de Page já gravadas. _insert é o INSERT que o próprio bulk_create faz por lote, aqui só na tabela
+    # de RecipePage; a alternativa pública seria um save_base(raw=True) (uma query) por receita.
+    RecipePage._base_manager._insert(recipes, fields=RecipePage._meta.local_concrete_fields)
+    return recipes
+
+
+def check_slugs(parent, slugs):
+    """Levanta ValueError para slugs inválidos, repetidos ou já usados pelas filhas de `parent`."""
+    invalid = [slug for slug in slugs if slug != slugify(slug, allow_unicode=True)]
+    if invalid:
+        raise ValueError(f'Slugs inválidos: {", ".join(invalid)}')
+    repeated = {slug for slug, count in Counter(slugs).items() if count > 1}
+    repeated |= set(parent.get_children().filter(slug__in=slugs).values_list('slug', flat=True))
+    if repeated:
+        raise ValueError(f'Slugs já usados em {parent.title}: {", ".join(sorted(repeated))}')
+
+
+def index_recipes(recipe_ids, batch_size):
+    """Adiciona as receitas ao índice de busca, `batch_size` por vez."""
+    backend = get_search_backend()
+    # Os nomes dos ingredientes entram no índice; sem o prefetch seria uma query por ingrediente
+    recipes = RecipePage.objects.prefetch_related(
+        Prefetch('ingredients', queryset=RecipeIngredient.objects.select_related('ingredient'))
+    )
+    for ids in batched(recipe_ids, batch_size):
+        backend.add_bulk(RecipePage, list(recipes.filter(pk__in=ids)))
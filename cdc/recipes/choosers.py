@@ -0,0 +1,159 @@
+"""
+Choosers do admin para os snippets do catálogo (ingredientes, métricas e qualificadores).
+
+O formulário de uma receita tem um chooser por ingrediente, métrica e qualificador; o widget padrão
+do Wagtail busca no banco o objeto escolhido de cada um para mostrar o nome, e uma receita com 30
+ingredientes custava mais de cem queries só nisso. `CatalogChooser` pega os nomes de um mapa
+id → rótulo em memória (`CatalogLabels`), carregado uma vez por processo e recarregado quando
+algum item do catálogo muda (sinais em cdc/recipes/signals.py).
+
+A busca do modal de escolha é por prefixo do nome, atendida pelo índice em LOWER(name) do
+Ingredient, em vez da listagem inteira paginada.
+"""
+
+import threading
+import time
+
+from django import forms
+from django.contrib.admin.utils import quote
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.urls import reverse
+from django.utils.functional import cached_property
+from wagtail.admin.forms.choosers import BaseFilterForm
+from wagtail.snippets.views.chooser import ChooseResultsView, ChooseView, SnippetChooserViewSet
+from wagtail.snippets.widgets import AdminSnippetChooser
+
+from cdc.base.cache import new_version, version_cache
+
+# Intervalo entre as conferências da versão no cache compartilhado; dentro dele o mapa é usado como está
+VERSION_CHECK_INTERVAL = 2
+
+
+class CatalogLabels:
+    """
+    id → rótulo (`str(obj)`) de todos os objetos de um modelo do catálogo, em memória no processo.
+
+    A versão guardada no cache `versions` é compartilhada entre os processos: `invalidate` a troca e
+    cada processo recarrega o mapa na próxima consulta. Um id que ainda não está no mapa (criado em
+    outro processo há pouco) é buscado sozinho.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = f'catalog-labels:{model._meta.label_lower}'
+        self._labels = {}
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def _revalidate(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return
+        version = version_cache.get_or_set(self.version_key, new_version, None)
+        if version != self._version:
+            self._labels = {obj.pk: str(obj) for obj in self.model._base_manager.iterator(chunk_size=5000)}
+            self._version = version
+        self._checked_at = now
+
+    def get(self, pk):
+        with self._lock:
+            self._revalidate()
+            label = self._labels.get(pk)
+            if label is None:
+                obj = self.model._base_manager.filter(pk=pk).first()
+                if obj is not None:
+                    label = self._labels[obj.pk] = str(obj)
+            return label
+
+    def invalidate(self):
+        version_cache.set(self.version_key, new_version(), None)
+        # Este processo recarrega já na próxima consulta; os outros, no próximo VERSION_CHECK_INTERVAL
+        with self._lock:
+            self._version = None
+
+
+_labels = {}
+
+
+def catalog_labels(model):
+    """O CatalogLabels do modelo, um por processo."""
+    if model not in _labels:
+        _labels[model] = CatalogLabels(model)
+    return _labels[model]
+
+
+class CatalogChooser(AdminSnippetChooser):
+    """Chooser de snippet que mostra o item escolhido sem consultar o banco."""
+
+    def __init__(self, model=None, **kwargs):
+        # As subclasses de CatalogChooserViewSet.widget_class já trazem o modelo
+        super().__init__(model or self.model, **kwargs)
+
+    def get_value_data(self, value):
+        if value in (None, '') or isinstance(value, self.model):
+            return super().get_value_data(value or None)
+        try:
+            pk = int(value)
+        except (TypeError, ValueError):
+            return None
+        label = catalog_labels(self.model).get(pk)
+        if label is None:
+            return None
+        return {
+            'id': pk,
+            'edit_url': reverse(self.model.snippet_viewset.get_url_name('edit'), args=[quote(pk)]),
+            self.display_title_key: label,
+        }
+
+
+class CatalogSearchForm(BaseFilterForm):
+    """Busca do modal de escolha: prefixo de qualquer um dos `search_fields`, sem diferenciar maiúsculas."""
+
+    q = forms.CharField(
+        label='Buscar',
+        widget=forms.TextInput(attrs={'placeholder': 'Buscar'}),
+        required=False,
+    )
+
+    def __init__(self, *args, search_fields, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.search_fields = search_fields
+
+    def filter(self, objects):
+        query = ' '.join(self.cleaned_data.get('q', '').casefold().split())
+        if not query:
+            return objects
+        condition = Q()
+        for field in self.search_fields:
+            objects = objects.annotate(**{f'{field}_lower': Lower(field)})
+            condition |= Q(**{f'{field}_lower__startswith': query})
+        self.is_searching = True
+        self.search_query = query
+        return objects.filter(condition)
+
+
+class CatalogChooseViewMixin:
+    def get_filter_form(self):
+        # Os mesmos campos da busca na listagem do snippet
+        return CatalogSearchForm(self.request.GET, search_fields=self.model_class.snippet_viewset.search_fields)
+
+
+class CatalogChooseView(CatalogChooseViewMixin, ChooseView):
+    pass
+
+
+class CatalogChooseResultsView(CatalogChooseViewMixin, ChooseResultsView):
+    pass
+
+
+class CatalogChooserViewSet(SnippetChooserViewSet):
+    choose_view_class = CatalogChooseView
+    choose_results_view_class = CatalogChooseResultsView
+
+    @cached_property
+    def widget_class(self):
+        # Uma classe, como a do ChooserViewSet: o Wagtail a instancia para os ForeignKey para o modelo em
+        # qualquer formulário do admin e para o bloco de get_block_class
+        return type(f'{self.model.__name__}CatalogChooser', (CatalogChooser,), {'model': self.model, 'icon': self.icon})
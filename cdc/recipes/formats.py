@@ -0,0 +1,166 @@
+"""
+Formatos de arquivo do `import_recipes` e do `export_recipes`.
+
+JSON lines: uma receita por linha, com os ingredientes aninhados::
+
+    {"slug": "bolo-de-fuba", "title": "Bolo de fubá", "description": "...", "directions": "<p>...</p>",
+     "font": "...", "image": "fotos/bolo.jpg", "tags": ["doce"], "published_at": "2024-05-01T12:00:00+00:00",
+     "ingredients": [{"ingredient": "fubá", "quantity": "2", "metric": "xíc.", "qualifiers": ["peneirado"]}]}
+
+CSV: uma linha por ingrediente, com os campos da receita repetidos; as linhas seguidas com o mesmo
+slug são a mesma receita. Tags e qualificadores são separados por `|`.
+
+Os dois formatos são lidos e escritos uma receita por vez, para o arquivo não precisar caber na memória.
+"""
+
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+
+FORMATS = ['jsonl', 'csv']
+RECIPE_CSV_FIELDS = ['slug', 'title', 'description', 'directions', 'font', 'image', 'tags', 'published_at']
+INGREDIENT_CSV_FIELDS = ['ingredient', 'quantity', 'metric', 'qualifiers']
+CSV_FIELDS = RECIPE_CSV_FIELDS + INGREDIENT_CSV_FIELDS
+LIST_SEPARATOR = '|'
+REQUIRED_FIELDS = ['title', 'description', 'font', 'image']
+
+
+class RecipeFormatError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f'linha {line}: {message}')
+        self.line = line
+
+
+def guess_format(path):
+    return 'csv' if str(path).lower().endswith('.csv') else 'jsonl'
+
+
+def read_recipes(file, fmt):
+    """
+    Gera (número da linha, receita) de um arquivo aberto em modo texto. Uma receita inválida vem
+    como RecipeFormatError no lugar do dicionário, para o import seguir com as próximas.
+    """
+    records = read_csv(file) if fmt == 'csv' else read_jsonl(file)
+    for line, record in records:
+        if not isinstance(record, RecipeFormatError):
+            try:
+                record = clean_recipe(line, record)
+            except RecipeFormatError as e:
+                record = e
+        yield line, record
+
+
+def read_jsonl(file):
+    for line, text in enumerate(file, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except json.JSONDecodeError as e:
+            record = RecipeFormatError(line, f'JSON inválido ({e.msg})')
+        yield line, record
+
+
+def read_csv(file):
+    rows = enumerate(csv.DictReader(file), start=2)
+    # Linha sem slug é uma receita sozinha
+    for _, group in groupby(rows, key=lambda numbered: numbered[1].get('slug') or numbered[0]):
+        group = list(group)
+        line, first = group[0]
+        record = {field: first.get(field) for field in RECIPE_CSV_FIELDS}
+        record['tags'] = split_list(first.get('tags'))
+        record['ingredients'] = [
+            {
+                'ingredient': row.get('ingredient'),
+                'quantity': row.get('quantity'),
+                'metric': row.get('metric'),
+                'qualifiers': split_list(row.get('qualifiers')),
+            }
+            for _, row in group
+            if row.get('ingredient')
+        ]
+        yield line, record
+
+
+def split_list(value):
+    return [item.strip() for item in (value or '').split(LIST_SEPARATOR) if item.strip()]
+
+
+def clean_recipe(line, record):
+    """Confere os campos obrigatórios e converte quantidades e datas. Levanta RecipeFormatError."""
+    if not isinstance(record, dict):
+        raise RecipeFormatError(line, 'a receita deve ser um objeto')
+    missing = [field for field in REQUIRED_FIELDS if not record.get(field)]
+    if missing:
+        raise RecipeFormatError(line, f'faltam os campos {", ".join(missing)}')
+    slug = record.get('slug') or ''
+    if slug != slugify(slug, allow_unicode=True):
+        # O slug vai para o url_path da página: barras, espaços ou maiúsculas quebrariam a URL
+        raise RecipeFormatError(line, f'slug inválido: {slug!r} (use {slugify(slug, allow_unicode=True)!r})')
+    published_at = record.get('published_at') or None
+    if published_at and parse_datetime(published_at) is None:
+        raise RecipeFormatError(line, f'data inválida em published_at: {published_at!r}')
+    ingredients = []
+    for ingredient in record.get('ingredients') or []:
+        if not isinstance(ingredient, dict) or not ingredient.get('ingredient') or not ingredient.get('metric'):
+            raise RecipeFormatError(line, 'ingrediente sem nome ou sem métrica')
+        try:
+            quantity = Decimal(str(ingredient.get('quantity')))
+        except InvalidOperation:
+            quantity = None
+        # RecipeIngredient.quantity tem 6 dígitos, 2 deles decimais
+        if quantity is None or not quantity.is_finite() or abs(quantity) >= 10_000:
+            raise RecipeFormatError(line, f'quantidade inválida: {ingredient.get("quantity")!r}')
+        ingredients.append(
+            {
+                'ingredient': ingredient['ingredient'].strip(),
+                'quantity': quantity,
+                'metric': ingredient['metric'].strip(),
+                'qualifiers': [qualifier.strip() for qualifier in ingredient.get('qualifiers') or []],
+            }
+        )
+    return {
+        'slug': slug,
+        'title': record['title'],
+        'description': record['description'],
+        'directions': record.get('directions') or '',
+        'font': record['font'],
+        'image': record['image'],
+        'tags': [tag.strip() for tag in record.get('tags') or [] if tag.strip()],
+        'published_at': parse_datetime(published_at) if published_at else None,
+        'ingredients': ingredients,
+    }
+
+
+class RecipeWriter:
+    """Escreve receitas (dicionários no formato de `clean_recipe`) em JSON lines ou CSV."""
+
+    def __init__(self, file, fmt):
+        self.file = file
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(file, CSV_FIELDS)
+            self.csv.writeheader()
+
+    def write(self, recipe):
+        recipe = {**recipe, 'published_at': recipe['published_at'].isoformat() if recipe['published_at'] else None}
+        if self.fmt != 'csv':
+            ingredients = [{**item, 'quantity': str(item['quantity'])} for item in recipe['ingredients']]
+            self.file.write(json.dumps({**recipe, 'ingredients': ingredients}, ensure_ascii=False) + '\n')
+            return
+        row = {field: recipe[field] for field in RECIPE_CSV_FIELDS}
+        row['tags'] = LIST_SEPARATOR.join(recipe['tags'])
+        # Receita sem ingredientes ainda ocupa uma linha
+        for ingredient in recipe['ingredients'] or [None]:
+            if ingredient:
+                row.update(
+                    ingredient=ingredient['ingredient'],
+                    quantity=ingredient['quantity'],
+                    metric=ingredient['metric'],
+                    qualifiers=LIST_SEPARATOR.join(ingredient['qualifiers']),
+                )
+            self.csv.writerow(row)
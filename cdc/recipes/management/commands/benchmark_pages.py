@@ -0,0 +1,111 @@
+import json
+import statistics
+import subprocess
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from wagtail.models import Site
+
+from cdc.base.benchmark import benchmark_client, percentile, timed
+from cdc.recipes.models import Ingredient, RecipeIndexPage, RecipePage, RecipeTagCount, RecipeTagIndexPage
+
+
+def git_commit():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def benchmark_paths():
+    """URL medida de cada página pública; as que não existirem no banco ficam de fora."""
+    site = Site.objects.get(is_default_site=True)
+    index_page = RecipeIndexPage.objects.live().first()
+    tag_page = RecipeTagIndexPage.objects.live().first()
+    recipe = RecipePage.objects.live().order_by('-first_published_at', '-pk').first()
+    top_tag = RecipeTagCount.objects.filter(num_recipes__gt=0).order_by('-num_recipes', 'name').first()
+    paths = {
+        'home': site.root_page.url,
+        'index': index_page.url if index_page else None,
+        'tag': f'{tag_page.url}?{urlencode({"tag": top_tag.name})}' if tag_page and top_tag else None,
+        'recipe': recipe.url if recipe else None,
+        'search': f'{reverse("search")}?{urlencode({"query": recipe.title.split()[0]})}' if recipe else None,
+    }
+    return {name: path for name, path in paths.items() if path}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede queries por request, tempo de resposta (p50/p95) e bytes das páginas públicas e gera um '
+        'relatório JSON para comparar entre commits. Use com os dados do seed_recipes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=30, help='Requisições medidas por página.')
+        parser.add_argument('--warmup', type=int, default=3, help='Requisições descartadas antes de medir.')
+        parser.add_argument(
+            '--warm-cache',
+            action='store_true',
+            help='Mantém o cache entre as requisições. Sem ele cada requisição renderiza a página do zero.',
+        )
+        parser.add_argument('--output', help='Arquivo do relatório. Padrão: saída padrão.')
+
+    def handle(self, *args, **options):
+        client = benchmark_client()
+        pages = {
+            name: self.measure(client, path, options['requests'], options['warmup'], options['warm_cache'])
+            for name, path in benchmark_paths().items()
+        }
+        report = {
+            'commit': git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'options': {'requests': options['requests'], 'warm_cache': options['warm_cache']},
+            'data': {
+                'recipes': RecipePage.objects.live().count(),
+                'ingredients': Ingredient.objects.count(),
+                'tags': RecipeTagCount.objects.count(),
+            },
+            'pages': pages,
+        }
+        output = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+        if not options['output']:
+            self.stdout.write(output)
+            return
+        with open(options['output'], 'w') as report_file:
+            report_file.write(output + '\n')
+        for name, page in pages.items():
+            self.stdout.write(
+                f'{name:<8}{page["queries"]:>5} queries{page["p50_ms"]:>9.1f}ms p50{page["p95_ms"]:>9.1f}ms p95'
+                f'{page["bytes"]:>10} bytes'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Relatório em {options["output"]}.'))
+
+    def measure(self, client, path, requests, warmup, warm_cache):
+        timings = []
+        queries = []
+        for i in range(warmup + requests):
+            if not warm_cache:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                response, elapsed = timed(client.get, path)
+            if i >= warmup:
+                timings.append(elapsed)
+                queries.append(len(captured))
+        return {
+            'path': path,
+            'status': response.status_code,
+            'queries': max(queries),
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'bytes': len(response.content),
+        }
@@ -0,0 +1,83 @@
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from wagtail.models import Page
+
+from cdc.recipes.formats import FORMATS, RecipeWriter, guess_format
+from cdc.recipes.models import RecipeIngredient, RecipeIngredientQualifier, RecipePage
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta as receitas publicadas em JSON lines ou CSV, no formato do import_recipes. As receitas são '
+        'lidas do banco em lotes com um cursor no servidor, então a memória não cresce com o número de receitas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Arquivo gerado. Padrão: saída padrão.')
+        parser.add_argument('--format', choices=FORMATS, help='Padrão: csv para arquivos .csv, senão jsonl.')
+        parser.add_argument('--parent', type=int, help='ID do índice de receitas. Padrão: todos.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or guess_format(output or '')
+        target = open(output, 'w', newline='', encoding='utf-8') if output else nullcontext(self.stdout)
+        exported = 0
+        with target as file:
+            writer = RecipeWriter(file, fmt)
+            for recipe in self.get_queryset(options['parent']).iterator(chunk_size=options['batch_size']):
+                writer.write(self.serialize(recipe))
+                exported += 1
+        if output:
+            self.stdout.write(self.style.SUCCESS(f'{exported} receitas exportadas em {output}.'))
+
+    def get_queryset(self, parent_id=None):
+        recipes = RecipePage.objects.live()
+        if parent_id:
+            parent = Page.objects.filter(pk=parent_id).first()
+            if parent is None:
+                raise CommandError('Índice de receitas não encontrado.')
+            recipes = recipes.child_of(parent)
+        # Ordem da árvore: a mesma da listagem do admin e estável entre exportações
+        return (
+            recipes.order_by('path')
+            .select_related('image')
+            .prefetch_related(
+                'tags',
+                Prefetch(
+                    'ingredients',
+                    queryset=RecipeIngredient.objects.select_related('ingredient', 'metric')
+                    .prefetch_related(
+                        Prefetch(
+                            'ingredient_qualifiers',
+                            queryset=RecipeIngredientQualifier.objects.select_related('qualifier').order_by('pk'),
+                        )
+                    )
+                    .order_by('pk'),
+                ),
+            )
+        )
+
+    def serialize(self, recipe):
+        return {
+            'slug': recipe.slug,
+            'title': recipe.title,
+            'description': recipe.description,
+            'directions': recipe.directions,
+            'font': recipe.font,
+            # Nome do arquivo no storage; o import reaproveita a imagem que tiver o mesmo arquivo
+            'image': recipe.image.file.name,
+            'tags': sorted(tag.name for tag in recipe.tags.all()),
+            'published_at': recipe.first_published_at,
+            'ingredients': [
+                {
+                    'ingredient': ingredient.ingredient.name,
+                    'quantity': ingredient.quantity,
+                    'metric': ingredient.metric.abbr,
+                    'qualifiers': [item.qualifier.name for item in ingredient.ingredient_qualifiers.all()],
+                }
+                for ingredient in recipe.ingredients.all()
+            ],
+        }
@@ -0,0 +1,184 @@
+import sys
+from contextlib import nullcontext
+from itertools import batched
+from pathlib import Path
+
+from django.core.files.images import ImageFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from taggit.models import Tag
+from wagtail.images import get_image_model
+
+from cdc.base.cache import invalidate_all_pages
+from cdc.recipes.bulk import LookupCache, index_recipes, insert_recipe_pages
+from cdc.recipes.formats import FORMATS, RecipeFormatError, guess_format, read_recipes
+from cdc.recipes.models import (
+    Ingredient,
+    Metric,
+    Qualifier,
+    RecipeIndexPage,
+    RecipeIngredient,
+    RecipeIngredientQualifier,
+    RecipePage,
+    RecipePageTag,
+    RecipeSummary,
+    RecipeTagCount,
+)
+from cdc.recipes.pantry import pantry
+from cdc.recipes.tasks import generate_recipe_renditions
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa receitas publicadas de um arquivo JSON lines ou CSV (formatos em cdc/recipes/formats.py). '
+        'O arquivo é lido em lotes, cada lote numa transação; receitas com slug já existente no índice são '
+        'puladas, então rodar de novo depois de uma falha continua de onde parou.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Arquivo de receitas; '-' lê da entrada padrão.")
+        parser.add_argument('--format', choices=FORMATS, help='Padrão: csv para arquivos .csv, senão jsonl.')
+        parser.add_argument(
+            '--images-dir',
+            help='Diretório dos caminhos de imagem do arquivo. Padrão: o diretório do próprio arquivo.',
+        )
+        parser.add_argument('--parent', type=int, help='ID do índice de receitas. Padrão: o primeiro do site.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        parent = self.get_parent(options['parent'])
+        self.images_dir = Path(options['images_dir'] or (Path(path).parent if path != '-' else '.'))
+        self.ingredients = LookupCache(Ingredient)
+        # Métricas são identificadas pela abreviação, que é o que aparece na receita
+        self.metrics = LookupCache(Metric, 'abbr', build=lambda abbr: Metric(name=abbr, abbr=abbr))
+        self.qualifiers = LookupCache(Qualifier)
+        self.tags = LookupCache(Tag, build=lambda name: Tag(name=name, slug=Tag().slugify(name)))
+        self.images = {}
+        self.skipped = 0
+        self.tag_ids = set()
+
+        imported = 0
+        source = nullcontext(sys.stdin) if path == '-' else open(path, newline='', encoding='utf-8')
+        with source as file:
+            for batch in batched(read_recipes(file, options['format'] or guess_format(path)), options['batch_size']):
+                new_images = set()
+                with transaction.atomic():
+                    recipes = self.import_batch(parent, batch, new_images)
+                recipe_ids = [recipe.pk for recipe in recipes]
+                index_recipes(recipe_ids, options['batch_size'])
+                for image_id in new_images:
+                    generate_recipe_renditions.enqueue(image_id)
+                imported += len(recipes)
+                self.stdout.write(f'{imported} receitas...')
+
+        RecipeTagCount.objects.refresh(self.tag_ids)
+        invalidate_all_pages()
+        pantry.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'{imported} receitas importadas, {self.skipped} ignoradas.'))
+
+    def get_parent(self, parent_id):
+        queryset = RecipeIndexPage.objects.all()
+        parent = queryset.filter(pk=parent_id).first() if parent_id else queryset.first()
+        if parent is None:
+            raise CommandError('Índice de receitas não encontrado.')
+        return parent
+
+    def skip(self, error):
+        self.skipped += 1
+        self.stderr.write(str(error))
+
+    def import_batch(self, parent, batch, new_images):
+        records = []
+        for line, recipe in batch:
+            if isinstance(recipe, RecipeFormatError):
+                self.skip(recipe)
+            else:
+                records.append((line, recipe))
+
+        # Slugs já usados no índice são receitas de uma importação anterior
+        slugs = {recipe['slug'] for _, recipe in records if recipe['slug']}
+        taken = set(parent.get_children().filter(slug__in=slugs).values_list('slug', flat=True))
+        unique = []
+        for line, recipe in records:
+            if recipe['slug'] in taken:
+                self.skipped += 1
+                continue
+            if recipe['slug']:
+                taken.add(recipe['slug'])
+            unique.append((line, recipe))
+
+        self.resolve_images({recipe['image'] for _, recipe in unique}, new_images)
+        records = []
+        for line, recipe in unique:
+            if recipe['image'] in self.images:
+                records.append(recipe)
+            else:
+                self.skip(RecipeFormatError(line, f'imagem não encontrada: {recipe["image"]}'))
+        if not records:
+            return []
+
+        ingredients = [ingredient for recipe in records for ingredient in recipe['ingredients']]
+        self.ingredients.resolve(ingredient['ingredient'] for ingredient in ingredients)
+        self.metrics.resolve(ingredient['metric'] for ingredient in ingredients)
+        self.qualifiers.resolve(qualifier for ingredient in ingredients for qualifier in ingredient['qualifiers'])
+        self.tags.resolve(tag for recipe in records for tag in recipe['tags'])
+
+        recipes = insert_recipe_pages(
+            parent,
+            [
+                RecipePage(
+                    title=recipe['title'],
+                    slug=recipe['slug'],
+                    description=recipe['description'],
+                    directions=recipe['directions'],
+                    font=recipe['font'],
+                    image_id=self.images[recipe['image']],
+                    first_published_at=recipe['published_at'],
+                )
+                for recipe in records
+            ],
+        )
+        recipe_ingredients = RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    page_id=page.pk,
+                    ingredient_id=self.ingredients[ingredient['ingredient']],
+                    metric_id=self.metrics[ingredient['metric']],
+                    quantity=ingredient['quantity'],
+                )
+                for page, recipe in zip(recipes, records)
+                for ingredient in recipe['ingredients']
+            ]
+        )
+        RecipeIngredientQualifier.objects.bulk_create(
+            [
+                RecipeIngredientQualifier(ingredient=recipe_ingredient, qualifier_id=self.qualifiers[qualifier])
+                for recipe_ingredient, ingredient in zip(recipe_ingredients, ingredients)
+                for qualifier in ingredient['qualifiers']
+            ]
+        )
+        page_tags = RecipePageTag.objects.bulk_create(
+            [
+                RecipePageTag(content_object_id=page.pk, tag_id=self.tags[tag])
+                for page, recipe in zip(recipes, records)
+                for tag in set(recipe['tags'])
+            ]
+        )
+        self.tag_ids.update(page_tag.tag_id for page_tag in page_tags)
+        RecipeSummary.objects.refresh(recipe.pk for recipe in recipes)
+        return recipes
+
+    def resolve_images(self, paths, new_images):
+        """Imagens do lote: reaproveita as já importadas ou com o mesmo arquivo no storage, cria as demais."""
+        Image = get_image_model()
+        paths -= self.images.keys()
+        self.images.update(Image.objects.filter(file__in=paths).values_list('file', 'pk'))
+        for path in paths - self.images.keys():
+            local_path = self.images_dir / path
+            if not local_path.is_file():
+                continue
+            with local_path.open('rb') as image_file:
+                image = Image.objects.create(title=local_path.stem, file=ImageFile(image_file, name=local_path.name))
+            self.images[path] = image.pk
+            new_images.add(image.pk)
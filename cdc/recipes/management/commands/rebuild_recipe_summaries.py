@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cdc.base.cache import invalidate_all_pages
+from cdc.recipes.models import RecipeSummary
+from cdc.recipes.pantry import pantry
+
+
+class Command(BaseCommand):
+    help = 'Recria do zero os resumos (RecipeSummary) das receitas publicadas usados pelas listagens.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Só cria os resumos das receitas publicadas que ainda não têm um. Barato quando não falta nenhum.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            RecipeSummary.objects.rebuild(missing_only=options['missing'])
+        invalidate_all_pages()
+        pantry.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'{RecipeSummary.objects.count()} resumos de receitas.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from cdc.recipes.models import RecipeTagCount
+
+
+class Command(BaseCommand):
+    help = 'Recria do zero a contagem de receitas publicadas por tag usada na nuvem de tags.'
+
+    def handle(self, *args, **options):
+        RecipeTagCount.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'{RecipeTagCount.objects.count()} tags recontadas.'))
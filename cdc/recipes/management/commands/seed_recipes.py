@@ -0,0 +1,167 @@
+import io
+import random
+from datetime import timedelta
+from decimal import Decimal
+from itertools import batched
+
+from django.core.files.images import ImageFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from PIL import Image as PILImage
+from taggit.models import Tag
+from wagtail.images import get_image_model
+from wagtail.models import Site
+
+from cdc.base.cache import invalidate_all_pages
+from cdc.recipes.bulk import index_recipes, insert_recipe_pages
+from cdc.recipes.models import (
+    Ingredient,
+    Metric,
+    Qualifier,
+    RecipeIndexPage,
+    RecipeIngredient,
+    RecipeIngredientQualifier,
+    RecipePage,
+    RecipePageTag,
+    RecipeSummary,
+    RecipeTagCount,
+    RecipeTagIndexPage,
+)
+from cdc.recipes.pantry import pantry
+from cdc.recipes.tasks import generate_recipe_renditions
+
+DISHES = ['Bolo', 'Torta', 'Pão', 'Sopa', 'Creme', 'Farofa', 'Salada', 'Pudim', 'Risoto', 'Cozido', 'Suflê', 'Mousse']
+INGREDIENTS = [
+    'farinha', 'açúcar', 'ovo', 'leite', 'manteiga', 'cenoura', 'milho', 'mandioca', 'banana', 'laranja',
+    'tomate', 'cebola', 'alho', 'frango', 'carne', 'queijo', 'arroz', 'feijão', 'abóbora', 'chocolate',
+]  # fmt: skip
+METRICS = [('grama', 'g'), ('mililitro', 'ml'), ('xícara', 'xíc.'), ('colher de sopa', 'c.s.'), ('unidade', 'un.')]
+TAGS = ['doce', 'salgado', 'vegano', 'rápido', 'festa', 'almoço', 'jantar', 'lanche', 'forno', 'panela']
+QUALIFIERS = ['picado', 'ralado', 'em cubos', 'opcional', 'peneirado', 'derretido', 'a gosto', 'fatiado']
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera receitas publicadas, ingredientes e tags de mentira em massa (bulk insert), para medir '
+        'as páginas com volume de produção. Não use em produção.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000, help='Receitas criadas.')
+        parser.add_argument('--ingredients', type=int, default=200, help='Ingredientes no catálogo.')
+        parser.add_argument('--tags', type=int, default=50, help='Tags distintas.')
+        parser.add_argument('--images', type=int, default=8, help='Imagens, repetidas entre as receitas.')
+        parser.add_argument('--per-recipe', type=int, default=8, help='Ingredientes por receita.')
+        parser.add_argument('--seed', type=int, default=0, help='Semente do gerador, para repetir os mesmos dados.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.index_page, _ = self.get_listing_pages()
+
+        ingredients = self.create_catalog(options['ingredients'])
+        metrics = list(Metric.objects.all()) or Metric.objects.bulk_create(
+            [Metric(name=name, abbr=abbr) for name, abbr in METRICS]
+        )
+        qualifiers = list(Qualifier.objects.all()) or Qualifier.objects.bulk_create(
+            [Qualifier(name=name) for name in QUALIFIERS]
+        )
+        tags = self.create_tags(options['tags'])
+        images = [self.create_image(i) for i in range(options['images'])]
+
+        recipe_ids = []
+        for numbers in batched(range(options['recipes']), options['batch_size']):
+            with transaction.atomic():
+                recipes = self.create_recipes(numbers, images)
+                self.create_ingredients(recipes, ingredients, metrics, qualifiers, options['per_recipe'])
+                RecipePageTag.objects.bulk_create(
+                    [
+                        RecipePageTag(content_object_id=recipe.pk, tag=tag)
+                        for recipe in recipes
+                        for tag in self.random.sample(tags, min(3, len(tags)))
+                    ]
+                )
+                RecipeSummary.objects.refresh(recipe.pk for recipe in recipes)
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+            self.stdout.write(f'{len(recipe_ids)} receitas...')
+
+        RecipeTagCount.objects.refresh(tag.pk for tag in tags)
+        index_recipes(recipe_ids, options['batch_size'])
+        for image in images:
+            generate_recipe_renditions.call(image.pk)
+        invalidate_all_pages()
+        pantry.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'{len(recipe_ids)} receitas criadas em {self.index_page.url_path}.'))
+
+    def get_listing_pages(self):
+        """Índice de receitas e de tags do site padrão, criados se ainda não existirem."""
+        root = Site.objects.get(is_default_site=True).root_page
+        index_page = RecipeIndexPage.objects.child_of(root).first()
+        if index_page is None:
+            index_page = root.add_child(instance=RecipeIndexPage(title='Receitas', slug='receitas'))
+        tag_page = RecipeTagIndexPage.objects.child_of(root).first()
+        if tag_page is None:
+            tag_page = root.add_child(instance=RecipeTagIndexPage(title='Tags', slug='tags'))
+        return index_page, tag_page
+
+    def create_catalog(self, count):
+        existing = set(Ingredient.objects.values_list('name', flat=True))
+        names = [f'{INGREDIENTS[i % len(INGREDIENTS)]} {i // len(INGREDIENTS) + 1}' for i in range(count)]
+        Ingredient.objects.bulk_create([Ingredient(name=name) for name in names if name not in existing])
+        return list(Ingredient.objects.filter(name__in=names))
+
+    def create_tags(self, count):
+        names = [TAGS[i % len(TAGS)] + (f'-{i // len(TAGS)}' if i >= len(TAGS) else '') for i in range(count)]
+        Tag.objects.bulk_create([Tag(name=name, slug=slugify(name)) for name in names], ignore_conflicts=True)
+        return list(Tag.objects.filter(name__in=names))
+
+    def create_image(self, number):
+        # Degradê em vez de cor sólida, para os formatos comprimirem como uma foto
+        image = PILImage.linear_gradient('L').resize((1200, 900)).convert('RGB')
+        image.paste(self.random_color(), (0, 0, 1200, 300))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG')
+        return get_image_model().objects.create(
+            title=f'Receita {number}', file=ImageFile(buffer, name=f'seed-{number}.jpg')
+        )
+
+    def random_color(self):
+        return tuple(self.random.randrange(256) for _ in range(3))
+
+    def create_recipes(self, numbers, images):
+        now = timezone.now()
+        recipes = [
+            RecipePage(
+                title=f'{self.random.choice(DISHES)} de {self.random.choice(INGREDIENTS)}',
+                description=f'Receita de teste número {number}.',
+                directions='<p>Misture tudo e leve ao forno.</p>',
+                font='seed_recipes',
+                image=images[number % len(images)],
+                first_published_at=now - timedelta(minutes=number),
+            )
+            for number in numbers
+        ]
+        return insert_recipe_pages(self.index_page, recipes)
+
+    def create_ingredients(self, recipes, ingredients, metrics, qualifiers, per_recipe):
+        recipe_ingredients = RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    page_id=recipe.pk,
+                    ingredient=ingredient,
+                    metric=self.random.choice(metrics),
+                    quantity=Decimal(self.random.randint(1, 500)),
+                )
+                for recipe in recipes
+                for ingredient in self.random.sample(ingredients, min(per_recipe, len(ingredients)))
+            ]
+        )
+        RecipeIngredientQualifier.objects.bulk_create(
+            [
+                RecipeIngredientQualifier(ingredient=recipe_ingredient, qualifier=self.random.choice(qualifiers))
+                for recipe_ingredient in recipe_ingredients
+                if self.random.random() < 0.3
+            ]
+        )
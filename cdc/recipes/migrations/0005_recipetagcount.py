@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-18 17:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_tag_counts(apps, schema_editor):
+    RecipePageTag = apps.get_model('recipes', 'RecipePageTag')
+    RecipeTagCount = apps.get_model('recipes', 'RecipeTagCount')
+    counts = (
+        RecipePageTag.objects.filter(content_object__live=True)
+        .values('tag_id', 'tag__name')
+        .annotate(num_recipes=Count('content_object', distinct=True))
+    )
+    RecipeTagCount.objects.bulk_create(
+        RecipeTagCount(tag_id=count['tag_id'], name=count['tag__name'], num_recipes=count['num_recipes'])
+        for count in counts
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0004_remove_recipeingredient_qualifiers_and_more'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeTagCount',
+            fields=[
+                (
+                    'tag',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='+',
+                        serialize=False,
+                        to='taggit.tag',
+                    ),
+                ),
+                ('name', models.CharField(max_length=100, verbose_name='Nome')),
+                ('num_recipes', models.PositiveIntegerField(default=0, verbose_name='Receitas')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-num_recipes', 'name'], name='recipes_tagcount_cloud_idx')],
+            },
+        ),
+        migrations.RunPython(populate_tag_counts, migrations.RunPython.noop),
+    ]
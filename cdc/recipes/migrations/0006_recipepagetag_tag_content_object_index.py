@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0005_recipetagcount'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipepagetag',
+            index=models.Index(fields=['tag', 'content_object'], name='recipes_pagetag_tag_obj_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 17:23
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0006_recipepagetag_tag_content_object_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Lower('name'), name='text_pattern_ops'
+                ),
+                name='recipes_ingredient_prefix_idx',
+            ),
+        ),
+    ]
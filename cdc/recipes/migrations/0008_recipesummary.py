@@ -0,0 +1,70 @@
+# Generated by Django 6.0 on 2026-10-18 18:50
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0007_ingredient_prefix_index'),
+        ('wagtailcore', '0096_referenceindex_referenceindex_source_object_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSummary',
+            fields=[
+                (
+                    'recipe',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='summary',
+                        serialize=False,
+                        to='recipes.recipepage',
+                    ),
+                ),
+                ('title', models.CharField(max_length=255)),
+                ('url', models.TextField()),
+                ('excerpt', models.TextField()),
+                (
+                    'tags',
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=100), default=list
+                    ),
+                ),
+                ('image_alt', models.CharField(max_length=255)),
+                ('renditions', models.JSONField(default=dict)),
+                ('num_ingredients', models.PositiveIntegerField(default=0)),
+                ('first_published_at', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                (
+                    'index',
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to='wagtailcore.page',
+                    ),
+                ),
+            ],
+            options={
+                'indexes': [
+                    models.Index(
+                        models.F('index'),
+                        models.OrderBy(models.F('first_published_at'), descending=True, nulls_last=True),
+                        models.OrderBy(models.F('recipe'), descending=True),
+                        name='recipes_summary_index_idx',
+                    ),
+                    models.Index(
+                        models.OrderBy(models.F('first_published_at'), descending=True, nulls_last=True),
+                        models.OrderBy(models.F('recipe'), descending=True),
+                        name='recipes_summary_recent_idx',
+                    ),
+                    django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='recipes_summary_tags_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 19:15
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+# Preenche os resumos existentes direto dos ingredientes, sem renderizar os cards de novo
+POPULATE_INGREDIENT_IDS = """
+UPDATE recipes_recipesummary AS summary
+SET ingredient_ids = COALESCE(
+    (
+        SELECT array_agg(DISTINCT item.ingredient_id ORDER BY item.ingredient_id)
+        FROM recipes_recipeingredient AS item
+        WHERE item.page_id = summary.recipe_id
+    ),
+    '{}'
+)
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0008_recipesummary'),
+        ('wagtailcore', '0096_referenceindex_referenceindex_source_object_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipesummary',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list),
+        ),
+        migrations.AddIndex(
+            model_name='recipesummary',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['ingredient_ids'], name='recipes_summary_ingr_idx'),
+        ),
+        migrations.RunSQL(POPULATE_INGREDIENT_IDS, migrations.RunSQL.noop),
+    ]
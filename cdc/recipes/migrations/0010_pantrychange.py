@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 19:58
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('recipes', '0009_recipesummary_ingredient_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PantryChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                (
+                    'recipe_ids',
+                    django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), null=True),
+                ),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
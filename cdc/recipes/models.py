@@ -1,70 +1,290 @@
-from django.db import models
+import re
+from itertools import batched
+from urllib.parse import quote, urlencode
+
+import sentry_sdk
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Max, Prefetch, Q, Value
+from django.db.models.functions import Lower
+from django.http import Http404
+from django.utils.cache import patch_vary_headers
+from django.utils.text import Truncator
 from modelcluster.contrib.taggit import ClusterTaggableManager
 from modelcluster.fields import ParentalKey
 from modelcluster.models import ClusterableModel
-from taggit.models import TaggedItemBase
+from modelcluster.queryset import FakeQuerySet
+from taggit.models import Tag, TaggedItemBase
 from wagtail.admin.panels import FieldPanel, InlinePanel, MultiFieldPanel
 from wagtail.fields import RichTextField
-from wagtail.models import Orderable, Page
+from wagtail.images import get_image_model
+from wagtail.images.models import Filter, Picture
+from wagtail.models import Orderable, Page, PageManager
+from wagtail.query import PageQuerySet
 from wagtail.search import index
 from wagtail.snippets.models import register_snippet
 from wagtail.snippets.views.snippets import SnippetViewSet
+from wagtail.url_routing import RouteResult
 
+from cdc.base.cache import CachedPageMixin, invalidate_pages, new_version, surrogate_key, version_cache, version_time
+from cdc.recipes.choosers import CatalogChooserViewSet
+from cdc.recipes.pagination import paginate_keyset
 
-class RecipeIndexPage(Page):
+# Nomes de tag aceitos pelo padrão de URL das páginas do Wagtail, que têm um endereço próprio (/tags/<tag>/)
+TAG_SEGMENT_RE = re.compile(r'[\w-]+')
+
+
+class RecipeIndexPage(CachedPageMixin, Page):
     intro = RichTextField(blank=True)
     subpage_types = [
         'recipes.RecipePage',
     ]
     content_panels = Page.content_panels + ['intro']
 
+    # Template parcial devolvido para as requisições do htmx (scroll infinito)
+    items_template = 'recipes/includes/recipe_index_items.html'
+    recipes_per_page = 12
+    # Queries para renderizar a página sem cache, qualquer que seja o número de receitas
+    # (cdc/base/sqlprofile.py; conferido em cdc/recipes/tests/test_query_budgets.py)
+    query_budget = 9
+    # Muda a cada receita publicada; a CDN ainda é purgada na publicação (cdc/base/purge.py)
+    cache_control = {'max_age': 60, 'stale_while_revalidate': 600}
+
+    @sentry_sdk.trace(op='page.context')
     def get_context(self, request):
         # Update context to include only published posts, ordered by reverse-chron
         context = super().get_context(request)
-        recipepages = self.get_children().live().order_by('-first_published_at')
+        cursor = request.GET.get('after') if request else None
+        recipepages, next_cursor = paginate_keyset(
+            RecipeSummary.objects.filter(index=self), cursor, self.recipes_per_page
+        )
         context['recipepages'] = recipepages
+        context['next_cursor'] = next_cursor
         return context
 
+    def get_template(self, request, *args, **kwargs):
+        if getattr(request, 'htmx', False):
+            return self.items_template
+        return super().get_template(request, *args, **kwargs)
 
-class RecipeTagIndexPage(Page):
-    template = 'recipes/recipe_tag_index_page.html'
+    def get_validators(self, request):
+        return listing_validators(self, request)
 
-    def get_context(self, request):
+    def _update_descendant_url_paths(self, old_url_path, new_url_path):
+        super()._update_descendant_url_paths(old_url_path, new_url_path)
+        # Troca de slug: o Wagtail reescreve o url_path das receitas com um UPDATE, e o sinal
+        # page_slug_changed só sai depois do commit; os resumos mudam aqui, na mesma transação
+        RecipeSummary.objects.refresh_descendants(self)
+
+    def serve(self, request, *args, **kwargs):
+        response = super().serve(request, *args, **kwargs)
+        # A mesma URL responde a página inteira ou só os cards, conforme o HX-Request
+        patch_vary_headers(response, ['HX-Request'])
+        return response
+
+
+class RecipeTagIndexPage(CachedPageMixin, Page):
+    template = 'recipes/recipe_tag_index_page.html'
+    query_budget = 10
+    cache_control = {'max_age': 60, 'stale_while_revalidate': 600}
+
+    def route(self, request, path_components):
+        try:
+            return super().route(request, path_components)
+        except Http404:
+            # /tags/<tag>/: a listagem de uma tag num endereço sem query string, que pode ser
+            # exportado como HTML estático (cdc/base/static_export.py)
+            if not self.live or len(path_components) != 1:
+                raise
+            return RouteResult(self, kwargs={'tag': path_components[0]})
+
+    @staticmethod
+    def get_tag_url(page_url, name):
+        """
+        Endereço da listagem da tag `name` na página `page_url`: /tags/<tag>/ se o nome só tem letras,
+        números, _ e -, como os segmentos de URL do Wagtail; se não (ex.: com espaço), /tags/?tag=<tag>.
+        """
+        if TAG_SEGMENT_RE.fullmatch(name):
+            return f'{page_url}{quote(name, safe="")}/'
+        return f'{page_url}?{urlencode({"tag": name})}'
+
+    def get_tag_names(self, request, tag=None):
+        if tag:
+            return [tag]
+        return list(dict.fromkeys(name.strip() for name in request.GET.getlist('tag') if name.strip()))
+
+    @sentry_sdk.trace(op='page.context')
+    def get_context(self, request, tag=None):
         context = super().get_context(request)
-        tag_name = request.GET.get('tag')
+        # ?tag=a&tag=b filtra pelas receitas com todas as tags; &match=any, com qualquer uma delas
+        tag_names = self.get_tag_names(request, tag)
+        match_any = request.GET.get('match') == 'any'
 
-        if tag_name:
-            # Filtrar receitas por tag específica
-            recipepages = RecipePage.objects.live().filter(tags__name=tag_name)
-            context['current_tag'] = tag_name
-        else:
-            # Mostrar todas as tags disponíveis com contagem
-            from django.db.models import Count
-            from taggit.models import Tag
-
-            all_tags = (
-                Tag.objects.annotate(num_items=Count('taggit_taggeditem_items') + 1)
-                .filter(num_items__gt=0)
-                .order_by('-num_items', 'name')
+        if tag_names:
+            recipepages = RecipeSummary.objects.with_tags(tag_names, match_all=not match_any).order_by(
+                F('first_published_at').desc(nulls_last=True), '-pk'
             )
-            context['all_tags'] = all_tags
-            recipepages = RecipePage.objects.none()
+            if tag and not recipepages:
+                # Tag sem receita publicada: o endereço deixa de existir (e sai da exportação estática)
+                raise Http404
+            context['current_tags'] = tag_names
+            context['current_tag'] = ', '.join(tag_names)
+            context['match_any'] = match_any
+        else:
+            # Mostrar todas as tags disponíveis com contagem (tabela mantida pelos sinais)
+            context['all_tags'] = RecipeTagCount.objects.filter(num_recipes__gt=0).order_by('-num_recipes', 'name')
+            recipepages = RecipeSummary.objects.none()
 
         context['recipepages'] = recipepages
         return context
 
+    def get_validators(self, request):
+        # A nuvem de tags vem da RecipeTagCount, que tem a sua própria versão
+        return listing_validators(self, request, RecipeTagCount.objects.version())
+
+    def get_surrogate_keys(self, request, tag=None):
+        # Filtrada por tags, a página também sai da CDN quando uma delas é renomeada
+        tag_names = self.get_tag_names(request, tag)
+        tag_ids = Tag.objects.filter(name__in=tag_names).values_list('pk', flat=True) if tag_names else []
+        return [*super().get_surrogate_keys(request), *(surrogate_key('tag', pk) for pk in tag_ids)]
+
+    def get_static_paths(self):
+        # A nuvem e a listagem de cada tag com receitas publicadas
+        paths = super().get_static_paths()
+        if not paths:
+            return paths
+        names = RecipeTagCount.objects.filter(num_recipes__gt=0).values_list('name', flat=True)
+        return [*paths, *(self.get_tag_url(paths[0], name) for name in names if TAG_SEGMENT_RE.fullmatch(name))]
+
+
+def listing_validators(page, request, *versions):
+    """
+    Validadores de uma listagem: os da página mais a versão dos resumos (RecipeSummary) e as outras
+    `versions` informadas. Só leituras do cache, sem consultar as tabelas a cada requisição.
+    """
+    parts, last_modified = CachedPageMixin.get_validators(page, request)
+    versions = [RecipeSummary.objects.version(), *versions]
+    return [*parts, *versions], max(filter(None, [last_modified, *map(version_time, versions)]), default=None)
+
 
 class RecipePageTag(TaggedItemBase):
     content_object = ParentalKey('RecipePage', related_name='tagged_items', on_delete=models.CASCADE)
 
+    class Meta:
+        # Atende as consultas por tag (contagem da nuvem, receitas de uma tag renomeada) só com o índice
+        indexes = [models.Index(fields=['tag', 'content_object'], name='recipes_pagetag_tag_obj_idx')]
+
+
+class RecipeTagCountManager(models.Manager):
+    VERSION_KEY = 'recipes:tagcounts:version'
+
+    def version(self):
+        """Muda sempre que a tabela muda; entra no ETag da página de tags."""
+        return version_cache.get_or_set(self.VERSION_KEY, new_version, None)
+
+    def touch(self):
+        transaction.on_commit(self._bump_version)
+
+    def _bump_version(self):
+        version_cache.set(self.VERSION_KEY, new_version(), None)
+        # A contagem é atualizada por uma task depois da publicação, quando as páginas de tags já
+        # foram invalidadas; sem isto o cache local e a CDN ficariam com a nuvem antiga
+        invalidate_pages(RecipeTagIndexPage.objects.only('pk'))
+
+    def refresh(self, tag_ids):
+        """Recalcula a contagem das tags informadas a partir das receitas publicadas."""
+        tag_ids = set(tag_ids)
+        if not tag_ids:
+            return
+        counts = (
+            RecipePageTag.objects.filter(tag_id__in=tag_ids, content_object__live=True)
+            .values('tag_id', 'tag__name')
+            .annotate(num_recipes=Count('content_object', distinct=True))
+        )
+        rows = [
+            self.model(tag_id=count['tag_id'], name=count['tag__name'], num_recipes=count['num_recipes'])
+            for count in counts
+        ]
+        # Tags que ficaram sem receita publicada saem da nuvem
+        self.filter(tag_id__in=tag_ids - {row.tag_id for row in rows}).delete()
+        self.bulk_create(rows, update_conflicts=True, unique_fields=['tag'], update_fields=['name', 'num_recipes'])
+        self.touch()
+
+    def rebuild(self):
+        """Recria a tabela inteira do zero."""
+        with transaction.atomic():
+            self.all().delete()
+            self.refresh(RecipePageTag.objects.values_list('tag_id', flat=True).distinct())
+
+
+class RecipeTagCount(models.Model):
+    """
+    Quantidade de receitas publicadas por tag, usada na nuvem de tags do RecipeTagIndexPage.
+
+    É atualizada pelos sinais de publicação e de edição de tags (cdc/recipes/signals.py);
+    `manage.py rebuild_tag_counts` recria a tabela do zero.
+    """
+
+    tag = models.OneToOneField('taggit.Tag', on_delete=models.CASCADE, primary_key=True, related_name='+')
+    name = models.CharField('Nome', max_length=100)
+    num_recipes = models.PositiveIntegerField('Receitas', default=0)
+
+    objects = RecipeTagCountManager()
+
+    def __str__(self):
+        return f'{self.name} ({self.num_recipes})'
+
+    class Meta:
+        indexes = [models.Index(fields=['-num_recipes', 'name'], name='recipes_tagcount_cloud_idx')]
+
+
+class RecipePageQuerySet(PageQuerySet):
+    def listing(self):
+        """
+        Receitas publicadas prontas para os cards das listagens: imagem, tags e ingredientes já
+        carregados, para que renderizar a lista custe um número fixo de queries. As renditions não
+        são pré-carregadas: vêm do cache `renditions`, preenchido quando a receita é publicada.
+        """
+        return (
+            self.live()
+            .select_related('image')
+            .prefetch_related(
+                'tags',
+                'ingredients',
+            )
+        )
+
+
+RecipePageManager = PageManager.from_queryset(RecipePageQuerySet)
+
 
-class RecipePage(Page):
+class RecipePage(CachedPageMixin, Page):
     description = models.TextField('descrição', help_text='Breve descrição da receita.')
     directions = RichTextField(verbose_name='preparo', help_text='Passos para o preparo.', blank=True)
     tags = ClusterTaggableManager(through=RecipePageTag, blank=True)
     font = models.CharField('fonte', max_length=200, help_text='Livro de receita, link do youtube e etc.')
     image = models.ForeignKey('wagtailimages.Image', on_delete=models.PROTECT, related_name='+')
 
+    objects = RecipePageManager()
+
+    query_budget = 17
+    # Só muda quando a receita é publicada de novo, e a publicação purga a CDN
+    cache_control = {'max_age': 600, 'stale_while_revalidate': 86400}
+
+    # Renditions da imagem usadas pelos templates, por nome ({% recipe_image page 'card' %}).
+    # Cada nome vira um <picture> com AVIF e WebP em várias larguras e JPEG de fallback; a primeira
+    # largura é a do src do <img>. Todas são geradas em segundo plano quando a receita é publicada
+    # (cdc/recipes/tasks.py), nunca na requisição.
+    RENDITION_SPECS = {
+        'card': 'fill-{400x300,200x150,800x600}|format-{avif,webp,jpeg}',
+        'detail': 'fill-{320x240,640x480}|format-{avif,webp,jpeg}',
+    }
+    # Segundos em que uma imagem sem todas as renditions não é enfileirada de novo a cada requisição
+    RENDITION_ENQUEUE_INTERVAL = 60
+
     content_panels = Page.content_panels + [
         FieldPanel('tags'),
         FieldPanel('description'),
@@ -78,10 +298,285 @@ class RecipePage(Page):
         index.SearchField('title'),
         index.SearchField('description'),
         index.SearchField('directions'),
+        index.RelatedFields(
+            'ingredients',
+            [index.RelatedFields('ingredient', [index.SearchField('name')])],
+        ),
     ]
     parent_page_types = ['recipes.RecipeIndexPage']
     subpage_types = []
 
+    @classmethod
+    def get_rendition_filter_specs(cls, name=None):
+        """Filter specs, já expandidos, da rendition `name` ou de todas as do registro."""
+        names = [name] if name else cls.RENDITION_SPECS
+        return [spec for key in names for spec in Filter.expand_spec(cls.RENDITION_SPECS[key])]
+
+    def get_surrogate_keys(self, request, *args, **kwargs):
+        # A página mostra os nomes das tags; renomear uma purga as receitas com ela (cdc/recipes/signals.py)
+        tag_ids = self.tagged_items.values_list('tag_id', flat=True)
+        return [*super().get_surrogate_keys(request), *(surrogate_key('tag', pk) for pk in tag_ids)]
+
+    @sentry_sdk.trace(op='image.picture')
+    def get_picture(self, name, attrs=None):
+        """
+        `<picture>` responsivo da imagem da receita para a rendition `name`.
+
+        Usa só renditions que já existem (cache `renditions` ou banco). Se falta alguma, a receita sai
+        sem a imagem e a geração vai para a fila; a tarefa invalida a página quando termina.
+        """
+        if not self.image:
+            return ''
+        filters = [self.image.clean_filter_for_svg(Filter(spec)) for spec in self.get_rendition_filter_specs(name)]
+        renditions = self.image.find_existing_renditions(*filters)
+        if len(renditions) < len(filters):
+            # tasks importa este módulo
+            from cdc.recipes.tasks import generate_recipe_renditions
+
+            if cache.add(f'recipe-renditions-enqueued:{self.image_id}', True, self.RENDITION_ENQUEUE_INTERVAL):
+                generate_recipe_renditions.enqueue(self.image_id)
+            return ''
+        return Picture({filter.spec: rendition for filter, rendition in renditions.items()}, attrs)
+
+    def get_ingredients(self):
+        """
+        Ingredientes da receita com unidade, nome e qualificadores já carregados.
+
+        São duas queries, qualquer que seja o número de ingredientes: uma para os ingredientes
+        com metric e ingredient, outra para os qualificadores com os nomes.
+        """
+        ingredients = self.ingredients.all()
+        if isinstance(ingredients, FakeQuerySet):
+            # No preview os ingredientes da revisão estão em memória e não há o que buscar no banco
+            return ingredients
+        return ingredients.select_related('ingredient', 'metric').prefetch_related(
+            Prefetch(
+                'ingredient_qualifiers',
+                queryset=RecipeIngredientQualifier.objects.select_related('qualifier'),
+            )
+        )
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Depois do super(): o ClusterableModel só grava tags e ingredientes no fim do save
+        RecipeSummary.objects.refresh([self.pk])
+
+    def get_cache_dependents(self):
+        # Os cards da receita também aparecem nas listagens por tag
+        return [*super().get_cache_dependents(), *RecipeTagIndexPage.objects.all()]
+
+
+class RecipeSummaryQuerySet(models.QuerySet):
+    def with_tags(self, tag_names, match_all=True):
+        """Resumos com todas (`match_all`) ou com qualquer uma das tags; atendido pelo índice GIN de `tags`."""
+        tag_names = list(set(tag_names))
+        return self.filter(tags__contains=tag_names) if match_all else self.filter(tags__overlap=tag_names)
+
+
+class RecipeSummaryManager(models.Manager.from_queryset(RecipeSummaryQuerySet)):
+    # Renditions guardadas no resumo: só as usadas pelos cards das listagens
+    RENDITIONS = ['card']
+    VERSION_KEY = 'recipes:summaries:version'
+
+    def version(self):
+        """Muda sempre que algum resumo muda (`refresh`); entra no ETag das listagens."""
+        return version_cache.get_or_set(self.VERSION_KEY, new_version, None)
+
+    def touch(self):
+        transaction.on_commit(self._bump_version)
+
+    def _bump_version(self):
+        version_cache.set(self.VERSION_KEY, new_version(), None)
+
+    def refresh(self, recipe_ids, batch_size=500):
+        """
+        Recria, a partir do banco, os resumos das receitas informadas. As que não estão publicadas
+        (ou não existem mais) saem da tabela.
+
+        Lê sempre o estado gravado, nunca a instância em memória: chamado no meio de um save_revision
+        de rascunho, o resumo continua com a versão publicada.
+        """
+        for ids in batched(set(recipe_ids), batch_size):
+            recipes = list(
+                RecipePage.objects.live()
+                .filter(pk__in=ids)
+                .select_related('image')
+                .prefetch_related('tags')
+                .annotate(
+                    num_ingredients=Count('ingredients'),
+                    ingredient_ids=ArrayAgg(
+                        'ingredients__ingredient_id',
+                        distinct=True,
+                        filter=Q(ingredients__isnull=False),
+                        order_by='ingredients__ingredient_id',
+                        default=Value([]),
+                    ),
+                )
+            )
+            self.filter(recipe_id__in=set(ids) - {recipe.pk for recipe in recipes}).delete()
+            self.bulk_create(
+                self.build(recipes),
+                update_conflicts=True,
+                unique_fields=['recipe'],
+                update_fields=[field.name for field in self.model._meta.concrete_fields if not field.primary_key],
+            )
+            self.touch()
+
+    def build(self, recipes):
+        parent_paths = {recipe.path[: -Page.steplen] for recipe in recipes}
+        parents = dict(Page.objects.filter(path__in=parent_paths).values_list('path', 'pk'))
+        specs = {spec: name for name in self.RENDITIONS for spec in RecipePage.get_rendition_filter_specs(name)}
+        renditions = {}
+        for rendition in (
+            get_image_model()
+            .get_rendition_model()
+            .objects.filter(image__in={recipe.image_id for recipe in recipes}, filter_spec__in=specs)
+            .values('image_id', 'filter_spec', 'file', 'width', 'height')
+        ):
+            renditions[rendition['image_id'], rendition['filter_spec']] = rendition
+        for recipe in recipes:
+            pictures = {}
+            for spec, name in specs.items():
+                rendition = renditions.get((recipe.image_id, spec))
+                if rendition:
+                    pictures.setdefault(name, []).append(
+                        {
+                            'spec': spec,
+                            'file': rendition['file'],
+                            'width': rendition['width'],
+                            'height': rendition['height'],
+                        }
+                    )
+            yield self.model(
+                recipe_id=recipe.pk,
+                index_id=parents[recipe.path[: -Page.steplen]],
+                title=recipe.title,
+                url=recipe.get_url(),
+                excerpt=Truncator(recipe.description).chars(RecipeSummary.EXCERPT_LENGTH),
+                tags=sorted(tag.name for tag in recipe.tags.all()),
+                image_alt=recipe.image.default_alt_text,
+                renditions=pictures,
+                num_ingredients=recipe.num_ingredients,
+                ingredient_ids=recipe.ingredient_ids,
+                first_published_at=recipe.first_published_at,
+            )
+
+    def refresh_descendants(self, page):
+        """Resumos das receitas abaixo de `page`, ex.: depois que ela mudou de slug ou de lugar."""
+        self.refresh(RecipePage.objects.descendant_of(page, inclusive=True).values_list('pk', flat=True))
+
+    def rebuild(self, missing_only=False):
+        """Recria a tabela inteira; com `missing_only`, só cria os resumos que faltam."""
+        recipes = RecipePage.objects.live()
+        if missing_only:
+            recipes = recipes.filter(summary__isnull=True)
+        else:
+            self.all().delete()
+            self.touch()
+        self.refresh(list(recipes.values_list('pk', flat=True)))
+
+
+class RecipeSummary(models.Model):
+    """
+    Uma linha por receita publicada, com tudo o que um card das listagens mostra.
+
+    As listagens leem só esta tabela, sem juntar páginas, tags, ingredientes e imagens. Ela é
+    atualizada na mesma transação do que a muda: o save da RecipePage (publicação, criação, despublicação),
+    os sinais de movimentação, de slug e de tags (cdc/recipes/signals.py) e a geração das
+    renditions (cdc/recipes/tasks.py). `manage.py rebuild_recipe_summaries` recria do zero.
+
+    As renditions são guardadas pelo nome do arquivo, não pela URL: as URLs do S3 são assinadas e
+    expiram, então são montadas pelo storage na hora de renderizar.
+    """
+
+    EXCERPT_LENGTH = 240
+
+    recipe = models.OneToOneField('RecipePage', on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    # Sem índice próprio: o recipes_summary_index_idx começa por ele
+    index = models.ForeignKey('wagtailcore.Page', on_delete=models.CASCADE, related_name='+', db_index=False)
+    title = models.CharField(max_length=255)
+    url = models.TextField()
+    excerpt = models.TextField()
+    tags = ArrayField(models.CharField(max_length=100), default=list)
+    image_alt = models.CharField(max_length=255)
+    # {'card': [{'spec': ..., 'file': ..., 'width': ..., 'height': ...}, ...]}, na ordem de RENDITION_SPECS
+    renditions = models.JSONField(default=dict)
+    num_ingredients = models.PositiveIntegerField(default=0)
+    # Ingredientes distintos, em ordem; base do "o que dá para cozinhar" (cdc/recipes/pantry.py)
+    ingredient_ids = ArrayField(models.BigIntegerField(), default=list)
+    first_published_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeSummaryManager()
+
+    class Meta:
+        indexes = [
+            # Índice de receitas: WHERE index_id = ... na ordem da paginação por cursor
+            models.Index(
+                F('index'),
+                F('first_published_at').desc(nulls_last=True),
+                F('recipe').desc(),
+                name='recipes_summary_index_idx',
+            ),
+            models.Index(
+                F('first_published_at').desc(nulls_last=True), F('recipe').desc(), name='recipes_summary_recent_idx'
+            ),
+            GinIndex(fields=['tags'], name='recipes_summary_tags_idx'),
+            # Receitas com algum dos ingredientes (&&), na consulta SQL do pantry
+            GinIndex(fields=['ingredient_ids'], name='recipes_summary_ingr_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    @sentry_sdk.trace(op='image.picture')
+    def get_picture(self, name, attrs=None):
+        """`<picture>` da rendition `name`, montado sem consultar a imagem nem as renditions."""
+        Image = get_image_model()
+        # Só para o alt das renditions; com collection_id explícito o default não vai buscar a coleção raiz
+        image = Image(title=self.image_alt, collection_id=None)
+        renditions = {
+            item['spec']: Image.get_rendition_model()(
+                image=image, filter_spec=item['spec'], file=item['file'], width=item['width'], height=item['height']
+            )
+            for item in self.renditions.get(name, [])
+        }
+        return Picture(renditions, attrs) if renditions else ''
+
+
+class PantryChangeManager(models.Manager):
+    # Mudanças mais antigas que as últimas MAX_PENDING são apagadas; um processo tão atrasado recarrega tudo
+    MAX_PENDING = 500
+
+    def record(self, recipe_ids=None):
+        """
+        Registra a mudança das receitas informadas (todas, com None). A tabela fica travada para
+        escrita até o commit: os ids ficam visíveis na ordem em que foram gerados, e quem lê o id N
+        já enxerga todos os anteriores.
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {self.model._meta.db_table} IN EXCLUSIVE MODE')
+            change = self.create(recipe_ids=None if recipe_ids is None else sorted(set(recipe_ids)))
+            self.filter(pk__lte=change.pk - self.MAX_PENDING).delete()
+        return change
+
+    def last_id(self):
+        return self.aggregate(last=Max('pk'))['last'] or 0
+
+
+class PantryChange(models.Model):
+    """
+    Log das mudanças no índice de ingredientes em memória de cada processo (cdc/recipes/pantry.py):
+    cada processo lê as mudanças com id maior que o da última que aplicou.
+    """
+
+    # None: recarregar o índice inteiro (importação, rebuild dos resumos)
+    recipe_ids = ArrayField(models.BigIntegerField(), null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = PantryChangeManager()
+
 
 class RecipeIngredient(ClusterableModel):
     page = ParentalKey('RecipePage', on_delete=models.CASCADE, related_name='ingredients')
@@ -107,8 +602,8 @@ class RecipeIngredient(ClusterableModel):
 
     @property
     def qualifier_list(self):
-        """Usado no template se precisar mostrar os qualifiers"""
-        return [iq.qualifier.name for iq in self.detailed_qualifiers.all()]
+        """Nomes dos qualificadores; usa o prefetch de `RecipePage.get_ingredients` quando houver"""
+        return [iq.qualifier.name for iq in self.ingredient_qualifiers.all()]
 
 
 class Ingredient(models.Model):
@@ -123,6 +618,10 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Busca por prefixo no autocomplete: LOWER(name) LIKE 'pre%'
+            models.Index(OpClass(Lower('name'), name='text_pattern_ops'), name='recipes_ingredient_prefix_idx'),
+        ]
 
 
 class Metric(models.Model):
@@ -170,6 +669,7 @@ class RecipeIngredientQualifier(ClusterableModel):
 class IngredientViewSet(SnippetViewSet):
     model = Ingredient
     icon = 'snippet'
+    chooser_viewset_class = CatalogChooserViewSet
     list_display = ['name']
     search_fields = ['name']
 
@@ -177,6 +677,7 @@ class IngredientViewSet(SnippetViewSet):
 class MetricViewSet(SnippetViewSet):
     model = Metric
     icon = 'snippet'
+    chooser_viewset_class = CatalogChooserViewSet
     list_display = ['abbr', 'name']
     search_fields = ['name', 'abbr']
 
@@ -184,6 +685,7 @@ class MetricViewSet(SnippetViewSet):
 class QualifierViewSet(SnippetViewSet):
     model = Qualifier
     icon = 'snippet'
+    chooser_viewset_class = CatalogChooserViewSet
     list_display = ['name']
     search_fields = ['name']
 
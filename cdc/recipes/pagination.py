@@ -0,0 +1,59 @@
+"""
+Paginação por cursor (keyset) das listagens de receitas.
+
+Em vez de OFFSET, cada página continua a partir do último card da página anterior,
+comparando (first_published_at, id). O custo de buscar a página N é o mesmo da primeira,
+não importa quantas receitas existam. Páginas criadas fora do fluxo de publicação podem não
+ter first_published_at; elas ficam no fim da listagem.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import F, Q
+
+
+def encode_cursor(page):
+    """Cursor opaco apontando para logo depois de `page` na ordenação da listagem."""
+    published_at = page.first_published_at.isoformat() if page.first_published_at else ''
+    raw = f'{published_at}|{page.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Retorna (first_published_at, id) do cursor, ou None se ele estiver ausente ou inválido."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        published_at, pk = raw.split('|')
+        return (datetime.fromisoformat(published_at) if published_at else None), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def paginate_keyset(queryset, cursor=None, per_page=12):
+    """
+    Retorna (itens, próximo_cursor) da página que começa depois de `cursor`.
+
+    O próximo cursor é None quando não há mais itens.
+    """
+    queryset = queryset.order_by(F('first_published_at').desc(nulls_last=True), '-pk')
+    position = decode_cursor(cursor)
+    if position:
+        published_at, pk = position
+        if published_at is None:
+            queryset = queryset.filter(first_published_at__isnull=True, pk__lt=pk)
+        else:
+            queryset = queryset.filter(
+                Q(first_published_at__lt=published_at)
+                | Q(first_published_at=published_at, pk__lt=pk)
+                | Q(first_published_at__isnull=True)
+            )
+
+    # Um item a mais só para saber se existe próxima página, sem COUNT(*)
+    items = list(queryset[: per_page + 1])
+    if len(items) > per_page:
+        return items[:per_page], encode_cursor(items[per_page - 1])
+    return items, None
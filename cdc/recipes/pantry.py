@@ -0,0 +1,323 @@
+"""
+"O que dá para cozinhar": receitas ordenadas pela fração dos ingredientes delas que o usuário tem.
+
+Cada processo mantém em memória um índice invertido, ingrediente → receitas que o usam
+(`IngredientIndex`), montado a partir do `ingredient_ids` dos RecipeSummary. As receitas ocupam
+posições ("slots") em ordem de publicação e a lista de cada ingrediente é um conjunto de slots:
+um array ordenado para os ingredientes raros e, para os comuns (sal, ovo, farinha), um bitset num
+int do Python, em que união e interseção de dezenas de milhares de receitas custam microssegundos.
+
+A consulta soma os bitsets dos ingredientes informados num contador bit a bit (um bitset por bit
+da contagem), separa as receitas por (ingredientes em comum, total de ingredientes) e percorre
+esses grupos da maior fração para a menor, até juntar `limit` receitas. Nada é feito por receita,
+a não ser extrair as devolvidas.
+
+O índice é carregado numa thread na primeira consulta do processo (ou no post_worker_init do
+Gunicorn, cdc/gunicorn_conf.py); até lá as consultas vão para o banco (`match_sql`), pelo índice
+GIN de `ingredient_ids`. Publicar, despublicar ou apagar uma receita registra o id dela num log de
+mudanças no banco (PantryChange, pelos sinais em cdc/recipes/signals.py), e cada processo aplica só
+as mudanças com id maior que o da última que viu; quando o log tem buracos, recarrega tudo numa
+thread, respondendo com o índice antigo enquanto isso.
+"""
+
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+
+from django.db import connection
+from django.db.models import F, FloatField, Func, IntegerField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from cdc.recipes.models import PantryChange, RecipeSummary
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre as conferências do log de mudanças; dentro dele o índice é usado como está
+SYNC_INTERVAL = 2
+# Ingredientes da receita que estão entre os informados
+MATCHED_SQL = 'cardinality(ARRAY(SELECT unnest(ingredient_ids) INTERSECT SELECT unnest(%s::bigint[])))'
+# Um array de slots ocupa 32 bits por receita; acima de 1/32 das receitas o bitset é menor
+DENSE_FRACTION = 32
+
+
+@dataclass(frozen=True)
+class Match:
+    recipe_id: int
+    matched: int
+    total: int
+
+
+def to_bitset(slots, size):
+    bits = bytearray((size + 7) // 8)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class IngredientIndex:
+    """Índice invertido ingrediente → receitas, com ranking pela cobertura dos ingredientes da receita."""
+
+    def __init__(self):
+        self._slots = {}  # recipe_id → slot
+        self._recipe_ids = array('q')  # slot → recipe_id (0: livre)
+        self._ingredients = {}  # recipe_id → ids dos ingredientes
+        self._postings = {}  # ingredient_id → array('I') ordenado de slots, ou bitset
+        self._sizes = {}  # total de ingredientes → bitset das receitas com esse total
+
+    @classmethod
+    def build(cls, rows):
+        """Índice de (recipe_id, ingredient_ids), na ordem de publicação."""
+        index = cls()
+        for recipe_id, ingredient_ids in rows:
+            index.add(recipe_id, ingredient_ids)
+        index.compact()
+        return index
+
+    def __len__(self):
+        return len(self._ingredients)
+
+    def __contains__(self, recipe_id):
+        return recipe_id in self._ingredients
+
+    def add(self, recipe_id, ingredient_ids):
+        """Inclui ou atualiza a receita; uma receita que já esteve no índice mantém a posição."""
+        self.remove(recipe_id)
+        ingredient_ids = tuple(sorted(set(ingredient_ids)))
+        if not ingredient_ids:
+            return
+        slot = self._slots.get(recipe_id)
+        if slot is None:
+            slot = self._slots[recipe_id] = len(self._recipe_ids)
+            self._recipe_ids.append(recipe_id)
+        self._recipe_ids[slot] = recipe_id
+        self._ingredients[recipe_id] = ingredient_ids
+        bit = 1 << slot
+        for ingredient_id in ingredient_ids:
+            postings = self._postings.get(ingredient_id)
+            if postings is None:
+                self._postings[ingredient_id] = array('I', [slot])
+            elif isinstance(postings, int):
+                self._postings[ingredient_id] = postings | bit
+            else:
+                insort(postings, slot)
+                if len(postings) * DENSE_FRACTION > len(self._recipe_ids):
+                    self._postings[ingredient_id] = to_bitset(postings, len(self._recipe_ids))
+        total = len(ingredient_ids)
+        self._sizes[total] = self._sizes.get(total, 0) | bit
+
+    def remove(self, recipe_id):
+        ingredient_ids = self._ingredients.pop(recipe_id, None)
+        if ingredient_ids is None:
+            return
+        slot = self._slots[recipe_id]
+        self._recipe_ids[slot] = 0
+        mask = ~(1 << slot)
+        for ingredient_id in ingredient_ids:
+            postings = self._postings[ingredient_id]
+            if isinstance(postings, int):
+                postings &= mask
+            else:
+                del postings[bisect_left(postings, slot)]
+            if postings:
+                self._postings[ingredient_id] = postings
+            else:
+                del self._postings[ingredient_id]
+        total = len(ingredient_ids)
+        self._sizes[total] &= mask
+        if not self._sizes[total]:
+            del self._sizes[total]
+
+    def compact(self):
+        """Troca para bitset as listas densas; depois de uma carga completa, quando o total já é conhecido."""
+        size = len(self._recipe_ids)
+        for ingredient_id, postings in self._postings.items():
+            if not isinstance(postings, int) and len(postings) * DENSE_FRACTION > size:
+                self._postings[ingredient_id] = to_bitset(postings, size)
+
+    def bitset(self, ingredient_id):
+        postings = self._postings.get(ingredient_id, 0)
+        if isinstance(postings, int):
+            return postings
+        return to_bitset(postings, len(self._recipe_ids))
+
+    def match(self, ingredient_ids, limit):
+        """
+        As `limit` receitas com a maior fração dos seus ingredientes entre `ingredient_ids`; no empate,
+        as que usam mais deles e depois as publicadas mais recentemente.
+        """
+        ingredient_ids = set(ingredient_ids)
+        # Contador bit a bit: planes[j] tem o bit j da quantidade de ingredientes em comum de cada receita
+        planes = []
+        for ingredient_id in ingredient_ids:
+            carry = self.bitset(ingredient_id)
+            for j, plane in enumerate(planes):
+                if not carry:
+                    break
+                planes[j], carry = plane ^ carry, plane & carry
+            if carry:
+                planes.append(carry)
+        if not planes:
+            return []
+        matched = 0
+        for plane in planes:
+            matched |= plane
+        counts = {}
+        # Contagens que cabem nos bits dos planos; acima disso nenhuma receita chegou
+        for count in range(1, min(len(ingredient_ids), 2 ** len(planes) - 1) + 1):
+            mask = matched
+            for j, plane in enumerate(planes):
+                mask &= plane if count >> j & 1 else ~plane
+                if not mask:
+                    break
+            if mask:
+                counts[count] = mask
+        groups = sorted(
+            ((count, total) for count in counts for total in self._sizes if count <= total),
+            key=lambda group: (-group[0] / group[1], -group[0]),
+        )
+        matches = []
+        for count, total in groups:
+            bits = counts[count] & self._sizes[total]
+            # Do slot mais alto para o mais baixo: as publicadas mais recentemente primeiro
+            while bits and len(matches) < limit:
+                slot = bits.bit_length() - 1
+                bits ^= 1 << slot
+                matches.append(Match(self._recipe_ids[slot], count, total))
+            if len(matches) >= limit:
+                break
+        return matches
+
+
+def summary_rows(recipe_ids=None):
+    summaries = RecipeSummary.objects.order_by(F('first_published_at').asc(nulls_first=True), 'recipe_id')
+    if recipe_ids is not None:
+        summaries = summaries.filter(recipe_id__in=recipe_ids)
+    return summaries.values_list('recipe_id', 'ingredient_ids').iterator(chunk_size=5000)
+
+
+def match_sql(ingredient_ids, limit):
+    """O mesmo ranking de `IngredientIndex.match`, calculado no banco; usado enquanto o índice carrega."""
+    ingredient_ids = sorted(set(ingredient_ids))
+    if not ingredient_ids:
+        return []
+    summaries = (
+        RecipeSummary.objects.filter(ingredient_ids__overlap=ingredient_ids)
+        .annotate(
+            matched=RawSQL(MATCHED_SQL, (ingredient_ids,), output_field=IntegerField()),
+            total=Func('ingredient_ids', function='cardinality', output_field=IntegerField()),
+        )
+        .annotate(ratio=Cast('matched', FloatField()) / F('total'))
+        .order_by(
+            F('ratio').desc(),
+            F('matched').desc(),
+            F('first_published_at').desc(nulls_last=True),
+            F('recipe_id').desc(),
+        )
+    )
+    return [Match(*row) for row in summaries.values_list('recipe_id', 'matched', 'total')[:limit]]
+
+
+class PantryIndex:
+    """O IngredientIndex do processo, carregado em segundo plano e sincronizado pelo log de mudanças."""
+
+    def __init__(self, load_in_background=True):
+        self.load_in_background = load_in_background
+        self._index = None
+        self._sequence = None
+        self._checked_at = 0
+        self._loading = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self._index is not None
+
+    def load(self):
+        """Monta o índice do zero, a partir dos resumos."""
+        # A última mudança é lida antes dos resumos: uma mudança no meio da carga é aplicada de novo depois
+        sequence = PantryChange.objects.last_id()
+        index = IngredientIndex.build(summary_rows())
+        with self._lock:
+            self._index = index
+            self._sequence = sequence
+            self._checked_at = time.monotonic()
+
+    def warm(self):
+        """Começa a carregar o índice numa thread, se ainda não foi carregado."""
+        with self._lock:
+            if self._index is None:
+                self._start_loading()
+
+    def _start_loading(self):
+        # Chamado com o lock; até a thread terminar, as consultas seguem com o que já existe
+        if self._loading:
+            return
+        self._loading = True
+        threading.Thread(target=self._load_in_thread, name='pantry-index', daemon=True).start()
+
+    def _load_in_thread(self):
+        try:
+            self.load()
+        except Exception:
+            logger.exception('Falha ao carregar o índice de ingredientes')
+        finally:
+            self._loading = False
+            connection.close()
+
+    def _sync(self):
+        now = time.monotonic()
+        # Uma recarga em andamento já traz as mudanças anteriores a ela; as seguintes ficam para depois
+        if self._loading or now - self._checked_at < SYNC_INTERVAL:
+            return
+        self._checked_at = now
+        changes = list(
+            PantryChange.objects.filter(pk__gt=self._sequence)
+            .order_by('pk')
+            .values_list('pk', 'recipe_ids')[: PantryChange.objects.MAX_PENDING]
+        )
+        if not changes:
+            return
+        first, last = changes[0][0], changes[-1][0]
+        gap = first != self._sequence + 1 or last - first != len(changes) - 1
+        if gap or any(recipe_ids is None for _, recipe_ids in changes):
+            # Mudanças já apagadas (processo atrasado demais), um id perdido num rollback ou uma recarga
+            # pedida. A carga não acontece na consulta: em segundo plano o índice atual responde até o
+            # novo ficar pronto; sem a thread, as consultas voltam para o banco até o próximo `load`
+            if self.load_in_background:
+                self._start_loading()
+            else:
+                self._index = None
+            return
+        recipe_ids = {recipe_id for _, change in changes for recipe_id in change}
+        rows = dict(summary_rows(recipe_ids))
+        for recipe_id in recipe_ids:
+            if recipe_id in rows:
+                self._index.add(recipe_id, rows[recipe_id])
+            else:
+                self._index.remove(recipe_id)
+        self._sequence = last
+
+    def match(self, ingredient_ids, limit):
+        """Lista de Match, do índice em memória ou, enquanto ele não carrega, do banco."""
+        with self._lock:
+            if self._index is not None:
+                self._sync()
+            if self._index is not None:
+                return self._index.match(ingredient_ids, limit)
+        if self.load_in_background:
+            self.warm()
+        return match_sql(ingredient_ids, limit)
+
+    def invalidate(self, recipe_ids=None):
+        """Registra a mudança das receitas informadas (todas, sem `recipe_ids`) para todos os processos."""
+        PantryChange.objects.record(recipe_ids)
+        # Este processo aplica a mudança já na próxima consulta
+        with self._lock:
+            self._checked_at = 0
+
+
+pantry = PantryIndex()
@@ -0,0 +1,146 @@
+from functools import partial
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from taggit.models import Tag
+from wagtail.images import get_image_model
+from wagtail.signals import page_published, page_unpublished, post_page_move
+
+from cdc.base.cache import invalidate_pages, surrogate_key
+from cdc.recipes.choosers import catalog_labels
+from cdc.recipes.models import (
+    Ingredient,
+    Metric,
+    Qualifier,
+    RecipePage,
+    RecipePageTag,
+    RecipeSummary,
+    RecipeTagCount,
+)
+from cdc.recipes.pantry import pantry
+from cdc.recipes.tasks import generate_recipe_renditions, refresh_tag_counts, reindex_recipes_with_ingredient
+
+
+@receiver(page_published, sender=RecipePage)
+@receiver(page_unpublished, sender=RecipePage)
+def refresh_recipe_tag_counts(sender, instance, **kwargs):
+    refresh_tag_counts.enqueue(list(instance.tagged_items.values_list('tag_id', flat=True)))
+
+
+@receiver(page_published, sender=RecipePage)
+def generate_published_recipe_renditions(sender, instance, **kwargs):
+    generate_recipe_renditions.enqueue(instance.image_id)
+
+
+@receiver(post_save, sender=get_image_model())
+def regenerate_changed_image_renditions(sender, instance, created, **kwargs):
+    # Trocar o arquivo ou o ponto focal invalida as renditions; o admin apaga as antigas na mesma
+    # transação, e a task só roda depois do commit
+    if not created and RecipePage.objects.live().filter(image=instance).exists():
+        generate_recipe_renditions.enqueue(instance.pk)
+
+
+@receiver(post_save, sender=RecipePageTag)
+def refresh_added_tag_count(sender, instance, created, **kwargs):
+    # Tags que continuam na receita são salvas de novo a cada publicação; o page_published cuida delas
+    if created:
+        refresh_tag_counts.enqueue([instance.tag_id])
+
+
+@receiver(post_delete, sender=RecipePageTag)
+def refresh_removed_tag_count(sender, instance, **kwargs):
+    # Também cobre a exclusão da receita, que apaga as tags em cascata
+    refresh_tag_counts.enqueue([instance.tag_id])
+
+
+@receiver(post_save, sender=Tag)
+def rename_tag_count(sender, instance, created, **kwargs):
+    if not created:
+        RecipeTagCount.objects.filter(tag=instance).update(name=instance.name)
+        RecipeTagCount.objects.touch()
+        # As receitas mostram o nome da tag; na CDN uma chave só cobre todas elas
+        recipes = RecipePage.objects.filter(tagged_items__tag=instance).only('pk')
+        RecipeSummary.objects.refresh(recipe.pk for recipe in recipes)
+        transaction.on_commit(partial(invalidate_pages, recipes, [surrogate_key('tag', instance.pk)]))
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tagged_recipes(sender, instance, **kwargs):
+    # No post_delete as RecipePageTag da tag já foram apagadas em cascata
+    instance.tagged_recipe_ids = list(
+        RecipePage.objects.filter(tagged_items__tag=instance).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+def refresh_untagged_summaries(sender, instance, **kwargs):
+    RecipeSummary.objects.refresh(getattr(instance, 'tagged_recipe_ids', []))
+
+
+@receiver(page_unpublished, sender=RecipePage)
+def remove_unpublished_summary(sender, instance, **kwargs):
+    # PageQuerySet.unpublish despublica instâncias de Page, sem passar pelo RecipePage.save
+    RecipeSummary.objects.refresh([instance.pk])
+
+
+@receiver(post_page_move)
+def refresh_moved_summaries(sender, instance, **kwargs):
+    # O Wagtail atualiza o url_path das descendentes com um UPDATE, sem save
+    RecipeSummary.objects.refresh_descendants(instance)
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_renamed_ingredient(sender, instance, created, **kwargs):
+    # O nome do ingrediente faz parte do índice de busca das receitas que o usam
+    if not created:
+        reindex_recipes_with_ingredient.enqueue(instance.pk)
+
+
+INGREDIENT_LIST_LOOKUPS = {
+    Ingredient: 'ingredients__ingredient',
+    Metric: 'ingredients__metric',
+    Qualifier: 'ingredients__ingredient_qualifiers__qualifier',
+}
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Metric)
+@receiver(post_save, sender=Qualifier)
+def invalidate_ingredient_list_fragments(sender, instance, created, **kwargs):
+    # A lista de ingredientes em cache (recipe_page.html) mostra nomes, unidades e qualificadores,
+    # mas a chave só muda quando outra revisão da receita é publicada
+    if created:
+        return
+    lookup = INGREDIENT_LIST_LOOKUPS[sender]
+    recipes = list(RecipePage.objects.filter(**{lookup: instance}).distinct().only('pk', 'live_revision_id'))
+    # O último componente da chave é o `request.is_preview` das páginas publicadas
+    cache.delete_many(
+        [
+            make_template_fragment_key('recipe_ingredients', [recipe.pk, recipe.live_revision_id, False])
+            for recipe in recipes
+        ]
+    )
+    # A página inteira também sai do cache, da CDN e da exportação estática, junto com o ETag
+    transaction.on_commit(partial(invalidate_pages, recipes))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Metric)
+@receiver(post_save, sender=Qualifier)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Metric)
+@receiver(post_delete, sender=Qualifier)
+def invalidate_catalog_labels(sender, **kwargs):
+    # Os choosers do admin mostram os nomes de um mapa em memória em cada processo (cdc/recipes/choosers.py)
+    transaction.on_commit(catalog_labels(sender).invalidate)
+
+
+@receiver(page_published, sender=RecipePage)
+@receiver(page_unpublished, sender=RecipePage)
+@receiver(post_delete, sender=RecipePage)
+def update_pantry_index(sender, instance, **kwargs):
+    # O índice de ingredientes em memória de cada processo aplica a mudança (cdc/recipes/pantry.py)
+    transaction.on_commit(partial(pantry.invalidate, [instance.pk]))
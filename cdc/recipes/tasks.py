@@ -0,0 +1,53 @@
+from itertools import batched
+
+import sentry_sdk
+from django_tasks import task
+from wagtail.images import get_image_model
+from wagtail.search.backends import get_search_backends
+
+from cdc.base.cache import invalidate_pages
+from cdc.recipes.models import RecipeIndexPage, RecipePage, RecipeSummary, RecipeTagCount, RecipeTagIndexPage
+
+
+@task()
+@sentry_sdk.trace(op='image.renditions')
+def generate_recipe_renditions(image_id):
+    """
+    Gera as renditions de RecipePage.RENDITION_SPECS que ainda não existem para a imagem.
+
+    O get_renditions do Wagtail também grava todas no cache `renditions`, e os resumos das
+    receitas com a imagem (RecipeSummary) passam a ter os arquivos para os cards das listagens.
+    As páginas dessas receitas e as listagens ganham uma nova versão no cache de páginas, que muda
+    o ETag: o `<picture>` delas mudou.
+    """
+    image = get_image_model().objects.filter(pk=image_id).first()
+    if image is None:
+        return
+    image.get_renditions(*RecipePage.get_rendition_filter_specs())
+    recipes = list(RecipePage.objects.live().filter(image=image).only('pk'))
+    if recipes:
+        RecipeSummary.objects.refresh(recipe.pk for recipe in recipes)
+        invalidate_pages([*recipes, *RecipeIndexPage.objects.only('pk'), *RecipeTagIndexPage.objects.only('pk')])
+
+
+@task()
+def refresh_tag_counts(tag_ids):
+    """Recalcula a nuvem de tags para as tags informadas."""
+    RecipeTagCount.objects.refresh(tag_ids)
+
+
+@task()
+def reindex_recipes_with_ingredient(ingredient_id, batch_size=500):
+    """
+    Atualiza no índice de busca as receitas que usam o ingrediente, cujo nome é indexado com elas.
+
+    Uma task por ingrediente, não por receita: renomear um ingrediente comum (sal, ovo) mexe em
+    milhares de receitas, gravadas em lotes com os campos relacionados já carregados.
+    """
+    recipes = (
+        RecipePage.get_indexed_objects().filter(ingredients__ingredient_id=ingredient_id).distinct().order_by('pk')
+    )
+    backends = list(get_search_backends(with_auto_update=True))
+    for batch in batched(recipes.iterator(chunk_size=batch_size), batch_size):
+        for backend in backends:
+            backend.add_bulk(RecipePage, batch)
@@ -0,0 +1,25 @@
+from django import template
+
+from cdc.recipes.models import RecipeTagIndexPage
+
+register = template.Library()
+
+
+@register.simple_tag
+def recipe_image(recipe, name, **attrs):
+    """
+    `<picture>` da rendition `name` de RecipePage.RENDITION_SPECS, para uma RecipePage ou um RecipeSummary.
+
+    Ex.: {% recipe_image page 'card' sizes="(min-width: 768px) 50vw, 100vw" class="..." %}
+    """
+    return recipe.get_picture(name, attrs)
+
+
+@register.filter
+def tag_url(tags_url, name):
+    """
+    Endereço da listagem da tag `name` (um nome ou uma Tag); veja RecipeTagIndexPage.get_tag_url.
+
+    Ex.: {{ tags_url|tag_url:tag }}
+    """
+    return RecipeTagIndexPage.get_tag_url(tags_url, str(name))
@@ -0,0 +1,58 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+from wagtail.models import Page
+
+from cdc.recipes.models import RecipeIngredient, RecipePage, RecipePageTag, RecipeTagCount
+from cdc.recipes.tests.utils import temporary_media
+
+
+@temporary_media
+class TestSeedRecipes(TestCase):
+    def seed(self, **options):
+        call_command('seed_recipes', images=1, stdout=StringIO(), **options)
+
+    def test_creates_published_recipes(self):
+        """Test the bulk-inserted recipes are valid live pages with ingredients and tags"""
+        self.seed(recipes=12, ingredients=30, tags=5, per_recipe=4, batch_size=5)
+        self.assertEqual(RecipePage.objects.live().count(), 12)
+        self.assertEqual(RecipeIngredient.objects.count(), 48)
+        self.assertEqual(RecipePageTag.objects.count(), 36)
+        self.assertEqual(sum(RecipeTagCount.objects.values_list('num_recipes', flat=True)), 36)
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+    def test_recipes_are_served_and_searchable(self):
+        """Test a seeded recipe renders and is found by the search"""
+        self.seed(recipes=3)
+        recipe = RecipePage.objects.live().first()
+        self.assertContains(self.client.get(recipe.url), recipe.title)
+        self.assertIn(recipe, RecipePage.objects.live().search(recipe.title))
+
+    def test_runs_again_on_existing_data(self):
+        """Test a second run appends recipes after the existing ones"""
+        self.seed(recipes=3)
+        self.seed(recipes=3)
+        self.assertEqual(RecipePage.objects.live().count(), 6)
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+
+@temporary_media
+class TestBenchmarkPages(TestCase):
+    def test_report(self):
+        """Test every public page is measured in the JSON report"""
+        call_command('seed_recipes', recipes=3, images=1, stdout=StringIO())
+        output = Path(tempfile.mkdtemp()) / 'report.json'
+        call_command('benchmark_pages', requests=2, warmup=1, output=str(output), stdout=StringIO())
+
+        report = json.loads(output.read_text())
+        self.assertEqual(report['data']['recipes'], 3)
+        self.assertEqual(set(report['pages']), {'home', 'index', 'tag', 'recipe', 'search'})
+        for page in report['pages'].values():
+            self.assertEqual(page['status'], 200)
+            self.assertGreater(page['queries'], 0)
+            self.assertGreater(page['bytes'], 0)
+            self.assertLessEqual(page['p50_ms'], page['p95_ms'])
@@ -0,0 +1,139 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Page
+
+from cdc.recipes.bulk import insert_recipe_pages
+from cdc.recipes.models import (
+    Ingredient,
+    Metric,
+    RecipeIndexPage,
+    RecipeIngredient,
+    RecipeIngredientQualifier,
+    RecipePage,
+    RecipeTagCount,
+)
+from cdc.recipes.tests.utils import temporary_media
+
+
+def recipe_record(number, **fields):
+    return {
+        'slug': f'bolo-{number}',
+        'title': f'Bolo {number}',
+        'description': 'Fofinho',
+        'directions': '<p>Asse.</p>',
+        'font': 'Caderno da vó',
+        'image': 'fotos/bolo.jpg',
+        'tags': ['doce', 'forno'],
+        'published_at': f'2024-05-{number + 1:02d}T12:00:00+00:00',
+        'ingredients': [
+            {'ingredient': 'farinha', 'quantity': '2', 'metric': 'xíc.', 'qualifiers': ['peneirada']},
+            {'ingredient': 'ovo', 'quantity': 3, 'metric': 'un.', 'qualifiers': []},
+        ],
+        **fields,
+    }
+
+
+@temporary_media
+class TestImportExportRecipes(TestCase):
+    def setUp(self):
+        root = Page.objects.get(slug='home')
+        self.index = root.add_child(instance=RecipeIndexPage(title='Receitas', slug='receitas'))
+        self.dir = Path(tempfile.mkdtemp())
+        (self.dir / 'fotos').mkdir()
+        (self.dir / 'fotos' / 'bolo.jpg').write_bytes(get_test_image_file().file.getvalue())
+
+    def write_jsonl(self, records, name='receitas.jsonl'):
+        path = self.dir / name
+        path.write_text(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+        return path
+
+    def run_import(self, path, **options):
+        stderr = StringIO()
+        call_command('import_recipes', str(path), batch_size=2, stdout=StringIO(), stderr=stderr, **options)
+        return stderr.getvalue()
+
+    def export(self, **options):
+        stdout = StringIO()
+        call_command('export_recipes', stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_import_jsonl(self):
+        """Test recipes are created live with their ingredients, qualifiers, tags and a shared image"""
+        Ingredient.objects.create(name='farinha')
+        self.run_import(self.write_jsonl([recipe_record(n) for n in range(5)]))
+
+        recipes = RecipePage.objects.live().child_of(self.index)
+        self.assertEqual(recipes.count(), 5)
+        self.assertEqual(len(set(recipes.values_list('image', flat=True))), 1)
+        self.assertEqual(RecipeIngredient.objects.count(), 10)
+        self.assertEqual(RecipeIngredientQualifier.objects.count(), 5)
+        # Nomes existentes são reaproveitados e os novos criados uma vez só
+        self.assertEqual(Ingredient.objects.count(), 2)
+        self.assertEqual(list(Metric.objects.order_by('abbr').values_list('abbr', flat=True)), ['un.', 'xíc.'])
+        self.assertEqual(dict(RecipeTagCount.objects.values_list('name', 'num_recipes')), {'doce': 5, 'forno': 5})
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+        recipe = recipes.get(slug='bolo-0')
+        self.assertContains(self.client.get(recipe.url), 'xíc. de farinha, peneirada')
+        self.assertIn(recipe, RecipePage.objects.live().search('farinha'))
+
+    def test_invalid_records_are_skipped(self):
+        """Test bad lines are reported with their line number and the rest is imported"""
+        path = self.write_jsonl(
+            [recipe_record(0), recipe_record(1, font=''), recipe_record(2, image='fotos/nada.jpg'), recipe_record(3)]
+        )
+        with path.open('a') as file:
+            file.write('{quebrado\n')
+        errors = self.run_import(path)
+
+        self.assertEqual(RecipePage.objects.count(), 2)
+        self.assertIn('linha 2: faltam os campos font', errors)
+        self.assertIn('linha 3: imagem não encontrada: fotos/nada.jpg', errors)
+        self.assertIn('linha 5: JSON inválido', errors)
+
+    def test_invalid_slugs_are_skipped(self):
+        """Test slugs that would break the page URL are reported instead of imported"""
+        path = self.write_jsonl(
+            [recipe_record(0), recipe_record(1, slug='bolos/fubá'), recipe_record(2, slug='Bolo de Fubá')]
+        )
+        errors = self.run_import(path)
+
+        self.assertEqual(list(RecipePage.objects.values_list('slug', flat=True)), ['bolo-0'])
+        self.assertIn("linha 2: slug inválido: 'bolos/fubá' (use 'bolosfubá')", errors)
+        self.assertIn("linha 3: slug inválido: 'Bolo de Fubá' (use 'bolo-de-fubá')", errors)
+
+    def test_insert_refuses_taken_slugs(self):
+        """Test the bulk insert refuses a slug already used under the same parent"""
+        self.run_import(self.write_jsonl([recipe_record(0)]))
+        recipe = RecipePage(title='Outro bolo', slug='bolo-0', description='Teste', font='Caderno')
+        with self.assertRaisesMessage(ValueError, 'bolo-0'):
+            insert_recipe_pages(self.index, [recipe])
+        self.assertEqual(RecipePage.objects.count(), 1)
+
+    def test_import_again_skips_existing_slugs(self):
+        """Test running the same import twice does not duplicate recipes"""
+        path = self.write_jsonl([recipe_record(n) for n in range(3)])
+        self.run_import(path)
+        self.run_import(path)
+        self.assertEqual(RecipePage.objects.count(), 3)
+
+    def test_csv_round_trip(self):
+        """Test a CSV export imported under another index exports back to the same recipes"""
+        self.run_import(self.write_jsonl([recipe_record(n) for n in range(3)] + [recipe_record(3, ingredients=[])]))
+        csv_path = self.dir / 'receitas.csv'
+        call_command('export_recipes', output=str(csv_path), parent=self.index.pk, stdout=StringIO())
+
+        copy = Page.objects.get(slug='home').add_child(instance=RecipeIndexPage(title='Cópia', slug='copia'))
+        self.run_import(csv_path, parent=copy.pk)
+
+        original = [json.loads(line) for line in self.export(parent=self.index.pk).splitlines()]
+        copied = [json.loads(line) for line in self.export(parent=copy.pk).splitlines()]
+        self.assertEqual(len(original), 4)
+        self.assertEqual(copied, original)
+        self.assertEqual(original[0]['ingredients'][0]['quantity'], '2.00')
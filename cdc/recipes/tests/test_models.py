@@ -1,5 +1,9 @@
+from io import StringIO
+
 import pytest
+from django.core.management import call_command
 from django.test import TestCase
+from taggit.models import Tag
 from wagtail.admin.panels import FieldPanel, InlinePanel
 from wagtail.models import Page
 from wagtail.test.utils import WagtailPageTestCase
@@ -10,9 +14,12 @@ from cdc.recipes.models import (
     Qualifier,
     RecipeIndexPage,
     RecipeIngredient,
+    RecipeIngredientQualifier,
     RecipePage,
+    RecipeTagCount,
     RecipeTagIndexPage,
 )
+from cdc.recipes.tests.utils import RecipeTestCase
 
 
 class TestRecipeIndexPage(WagtailPageTestCase):
@@ -90,6 +97,69 @@ class TestRecipeTagIndexPage(WagtailPageTestCase):
         self.assertIn('recipepages', context)
 
 
+class TestRecipeTagCount(RecipeTestCase):
+    def add_recipe(self, slug, tags, publish=True):
+        # A contagem é atualizada por uma tarefa, enfileirada no commit
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = super().add_recipe(slug, tags, live=False)
+            if publish:
+                recipe.save_revision().publish()
+        return RecipePage.objects.get(pk=recipe.pk)
+
+    def counts(self):
+        return dict(RecipeTagCount.objects.values_list('name', 'num_recipes'))
+
+    def test_draft_recipes_are_not_counted(self):
+        """Test tags of unpublished recipes stay out of the cloud"""
+        self.add_recipe('bolo', ['doce'], publish=False)
+        self.assertEqual(self.counts(), {})
+
+    def test_publish_counts_recipe_tags(self):
+        """Test publishing recipes updates the count of each tag"""
+        self.add_recipe('bolo', ['doce', 'forno'])
+        self.add_recipe('pudim', ['doce'])
+        self.assertEqual(self.counts(), {'doce': 2, 'forno': 1})
+
+    def test_unpublish_removes_recipe_from_counts(self):
+        """Test unpublishing a recipe decrements its tags and drops empty ones"""
+        bolo = self.add_recipe('bolo', ['doce', 'forno'])
+        self.add_recipe('pudim', ['doce'])
+        with self.captureOnCommitCallbacks(execute=True):
+            bolo.unpublish()
+        self.assertEqual(self.counts(), {'doce': 1})
+
+    def test_removing_tag_from_recipe(self):
+        """Test publishing a recipe without one of its tags updates that tag"""
+        bolo = self.add_recipe('bolo', ['doce', 'forno'])
+        bolo.tags.remove('forno')
+        with self.captureOnCommitCallbacks(execute=True):
+            bolo.save_revision().publish()
+        self.assertEqual(self.counts(), {'doce': 1})
+
+    def test_delete_recipe(self):
+        """Test deleting a recipe removes it from the counts"""
+        bolo = self.add_recipe('bolo', ['doce'])
+        with self.captureOnCommitCallbacks(execute=True):
+            bolo.delete()
+        self.assertEqual(self.counts(), {})
+
+    def test_rename_tag(self):
+        """Test renaming a tag renames its count row"""
+        self.add_recipe('bolo', ['doce'])
+        tag = Tag.objects.get(name='doce')
+        tag.name = 'sobremesa'
+        tag.save()
+        self.assertEqual(self.counts(), {'sobremesa': 1})
+
+    def test_rebuild_command(self):
+        """Test rebuild_tag_counts recreates the table from the published recipes"""
+        self.add_recipe('bolo', ['doce', 'forno'])
+        self.add_recipe('pudim', ['doce'], publish=False)
+        RecipeTagCount.objects.all().delete()
+        call_command('rebuild_tag_counts', stdout=StringIO())
+        self.assertEqual(self.counts(), {'doce': 1, 'forno': 1})
+
+
 class TestRecipePage(WagtailPageTestCase):
     def setUp(self):
         self.root_page = Page.objects.get(slug='home')
@@ -214,3 +284,12 @@ class TestRecipeIngredient(TestCase):
         # Should have panels defined
         self.assertIsInstance(panels, list)
         self.assertGreater(len(panels), 0)
+
+    def test_qualifier_list(self):
+        """Test qualifier_list returns the names of the ingredient's qualifiers"""
+        recipe_ingredient = RecipeIngredient(ingredient=self.ingredient, metric=self.metric, quantity=200)
+        recipe_ingredient.ingredient_qualifiers = [
+            RecipeIngredientQualifier(qualifier=Qualifier.objects.create(name='Peneirada')),
+            RecipeIngredientQualifier(qualifier=Qualifier.objects.create(name='Opcional')),
+        ]
+        self.assertEqual(recipe_ingredient.qualifier_list, ['Peneirada', 'Opcional'])
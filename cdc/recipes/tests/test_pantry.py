@@ -0,0 +1,194 @@
+import random
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from cdc.recipes.models import Ingredient, PantryChange, RecipeIngredient
+from cdc.recipes.pantry import IngredientIndex, Match, PantryIndex, match_sql
+from cdc.recipes.tests.utils import RecipeTestCase
+
+
+def brute_force(rows, ingredient_ids, limit):
+    """O ranking esperado, receita por receita; `rows` em ordem de publicação."""
+    ingredient_ids = set(ingredient_ids)
+    matches = []
+    for position, (recipe_id, recipe_ingredients) in enumerate(rows):
+        recipe_ingredients = set(recipe_ingredients)
+        matched = len(recipe_ingredients & ingredient_ids)
+        if matched:
+            matches.append((matched / len(recipe_ingredients), matched, position, recipe_id, len(recipe_ingredients)))
+    matches.sort(reverse=True)
+    return [Match(recipe_id, matched, total) for _, matched, _, recipe_id, total in matches[:limit]]
+
+
+class TestIngredientIndex(SimpleTestCase):
+    def test_ranks_by_covered_fraction(self):
+        """Test recipes come by the fraction of their ingredients given, then by matches and recency"""
+        index = IngredientIndex.build([(1, [10, 11]), (2, [10, 11, 12, 13]), (3, [10]), (4, [10, 12]), (5, [14])])
+        self.assertEqual(
+            index.match([10, 12], limit=10),
+            [Match(4, 2, 2), Match(3, 1, 1), Match(2, 2, 4), Match(1, 1, 2)],
+        )
+        self.assertEqual(index.match([10, 12], limit=2), [Match(4, 2, 2), Match(3, 1, 1)])
+        self.assertEqual(index.match([99], limit=10), [])
+
+    def test_matches_brute_force(self):
+        """Test sparse and dense posting lists give the same ranking as counting recipe by recipe"""
+        rng = random.Random(7)
+        # Poucos ingredientes comuns (bitsets) e muitos raros (arrays)
+        rows = [(pk, rng.sample(range(1, 6), 2) + rng.sample(range(6, 400), rng.randint(1, 8))) for pk in range(1, 501)]
+        index = IngredientIndex.build(rows)
+        for _ in range(50):
+            ingredient_ids = rng.sample(range(1, 400), rng.randint(1, 12)) + [rng.randint(1, 5)]
+            self.assertEqual(index.match(ingredient_ids, 20), brute_force(rows, ingredient_ids, 20))
+
+    def test_incremental_updates(self):
+        """Test adding, changing and removing recipes keeps the index equal to a fresh build"""
+        rows = {pk: [pk % 3 + 1, pk % 7 + 10] for pk in range(1, 200)}
+        index = IngredientIndex.build(rows.items())
+        del rows[5]
+        index.remove(5)
+        rows[8] = [1, 2, 3]
+        index.add(8, rows[8])
+        rows[500] = [1, 10]
+        index.add(500, rows[500])
+        self.assertNotIn(5, index)
+        self.assertEqual(len(index), len(rows))
+        for ingredient_ids in ([1], [1, 10], [2, 3, 12], [16]):
+            self.assertEqual(index.match(ingredient_ids, 30), brute_force(list(rows.items()), ingredient_ids, 30))
+
+
+class TestPantry(RecipeTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        super().setUp()
+        self.ingredients = {name: Ingredient.objects.create(name=name) for name in ['Farinha', 'Ovo', 'Leite', 'Sal']}
+        self.bolo = self.add_recipe('Bolo', ['Farinha', 'Ovo', 'Leite'])
+        self.omelete = self.add_recipe('Omelete', ['Ovo', 'Sal'])
+        self.panqueca = self.add_recipe('Panqueca', ['Farinha', 'Ovo', 'Leite', 'Sal'])
+        # Com o log vazio a carga parte do id 0, e o primeiro id gerado pela sequência seria um buraco
+        PantryChange.objects.record([])
+        self.pantry = PantryIndex(load_in_background=False)
+        self.pantry.load()
+
+    def add_recipe(self, title, ingredient_names):
+        ingredients = [self.ingredients[name] for name in ingredient_names]
+        return super().add_recipe(title.lower(), ingredients=ingredients, title=title)
+
+    def ids(self, *names):
+        return [self.ingredients[name].pk for name in names]
+
+    def match(self, *names):
+        self.pantry._checked_at = 0
+        return [match.recipe_id for match in self.pantry.match(self.ids(*names), 10)]
+
+    def test_sql_fallback_matches_index(self):
+        """Test the database ranking used while the index loads is the same as the in-memory one"""
+        for names in (['Ovo'], ['Ovo', 'Sal'], ['Farinha', 'Leite'], ['Farinha', 'Ovo', 'Leite', 'Sal']):
+            self.assertEqual(match_sql(self.ids(*names), 10), self.pantry.match(self.ids(*names), 10), names)
+        self.assertEqual(self.match('Ovo', 'Sal'), [self.omelete.pk, self.panqueca.pk, self.bolo.pk])
+
+    def test_cold_index_answers_from_database(self):
+        """Test a process without the index answers through SQL until it is loaded"""
+        pantry = PantryIndex(load_in_background=False)
+        self.assertFalse(pantry.is_loaded)
+        self.assertEqual(pantry.match(self.ids('Sal'), 10), match_sql(self.ids('Sal'), 10))
+
+    def test_publish_updates_loaded_index(self):
+        """Test publishing, unpublishing and deleting recipes reach an index loaded before the change"""
+        with mock.patch('cdc.recipes.signals.pantry', self.pantry), self.captureOnCommitCallbacks(execute=True):
+            self.omelete.ingredients.add(
+                RecipeIngredient(ingredient=self.ingredients['Leite'], metric=self.metric, quantity=1)
+            )
+            self.omelete.save_revision().publish()
+            tapioca = self.add_recipe('Tapioca', ['Sal'])
+            tapioca.save_revision().publish()
+            self.bolo.unpublish()
+        self.assertEqual(self.match('Sal'), [tapioca.pk, self.omelete.pk, self.panqueca.pk])
+        self.assertEqual(self.match('Ovo', 'Sal', 'Leite'), [self.omelete.pk, tapioca.pk, self.panqueca.pk])
+        with mock.patch('cdc.recipes.signals.pantry', self.pantry), self.captureOnCommitCallbacks(execute=True):
+            tapioca.delete()
+        self.assertEqual(self.match('Sal'), [self.omelete.pk, self.panqueca.pk])
+
+    def test_missing_changes_reload_everything(self):
+        """Test a gap in the change log drops the index, answering from the database until it is reloaded"""
+        self.add_recipe('Pão', ['Farinha'])
+        self.pantry.invalidate([self.bolo.pk])
+        self.pantry.invalidate([self.omelete.pk])
+        PantryChange.objects.filter(pk__gt=self.pantry._sequence).order_by('pk').first().delete()
+        self.assertEqual(len(self.match('Farinha')), 3)
+        self.assertFalse(self.pantry.is_loaded)
+        self.pantry.load()
+        self.assertEqual(len(self.match('Farinha')), 3)
+
+    def test_full_reload_runs_in_background(self):
+        """Test a full reload is left to a thread while the current index keeps answering"""
+        pantry = PantryIndex()
+        pantry.load()
+        self.add_recipe('Pão', ['Farinha'])
+        pantry.invalidate()
+        with mock.patch('threading.Thread') as thread, mock.patch.object(PantryIndex, 'load') as load:
+            self.assertEqual(len(pantry.match(self.ids('Farinha'), 10)), 2)
+            self.assertEqual(len(pantry.match(self.ids('Farinha'), 10)), 2)
+        thread.assert_called_once_with(target=pantry._load_in_thread, name='pantry-index', daemon=True)
+        thread.return_value.start.assert_called_once()
+        load.assert_not_called()
+
+    def test_changes_are_applied_in_order(self):
+        """Test a process applies the changes after the last one it saw, once each"""
+        with mock.patch('cdc.recipes.signals.pantry', self.pantry), self.captureOnCommitCallbacks(execute=True):
+            self.bolo.unpublish()
+        self.assertEqual(self.match('Farinha'), [self.panqueca.pk])
+        self.assertEqual(self.pantry._sequence, PantryChange.objects.last_id())
+        self.pantry.invalidate([self.omelete.pk])
+        self.assertEqual(self.match('Farinha'), [self.panqueca.pk])
+        self.assertEqual(self.pantry._sequence, PantryChange.objects.last_id())
+        self.assertTrue(self.pantry.is_loaded)
+
+    def test_view(self):
+        """Test the page lists the recipes with the share of their ingredients given, and the unknown names"""
+        with mock.patch('cdc.recipes.views.pantry', self.pantry):
+            response = self.client.get('/cook/', {'ingredients': ' ovo, SAL ,açafrão'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([recipe.pk for recipe, _ in response.context['results']], self.match('Ovo', 'Sal'))
+        self.assertContains(response, '2 de 2 ingredientes')
+        self.assertContains(response, '2 de 4 ingredientes')
+        self.assertContains(response, 'Ingredientes não encontrados: açafrão.')
+
+
+# Cada processo grava o log pela sua conexão; as threads simulam publicações simultâneas em dois workers
+class TestPantryConcurrency(TransactionTestCase):
+    serialized_rollback = True
+
+    def test_concurrent_invalidations_keep_both_changes(self):
+        """Test two invalidations at the same time get consecutive ids and both reach a loaded index"""
+        PantryChange.objects.record([])
+        pantry = PantryIndex(load_in_background=False)
+        pantry.load()
+        sequence = pantry._sequence
+        barrier = threading.Barrier(2)
+
+        def invalidate(recipe_id):
+            try:
+                barrier.wait(timeout=10)
+                PantryIndex(load_in_background=False).invalidate([recipe_id])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=invalidate, args=(recipe_id,)) for recipe_id in (101, 102)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+
+        changes = list(PantryChange.objects.filter(pk__gt=sequence).order_by('pk').values_list('pk', 'recipe_ids'))
+        self.assertEqual([pk for pk, _ in changes], [sequence + 1, sequence + 2])
+        self.assertEqual(sorted(recipe_ids for _, recipe_ids in changes), [[101], [102]])
+        pantry._checked_at = 0
+        pantry.match([1], 10)
+        self.assertTrue(pantry.is_loaded)
+        self.assertEqual(pantry._sequence, sequence + 2)
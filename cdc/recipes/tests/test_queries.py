@@ -0,0 +1,116 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from wagtail.images.models import Image
+from wagtail.images.tests.utils import get_test_image_file
+
+from cdc.recipes.models import (
+    Ingredient,
+    Qualifier,
+    RecipeIngredient,
+    RecipeIngredientQualifier,
+    RecipePage,
+    RecipeTagIndexPage,
+)
+from cdc.recipes.tests.utils import RecipeTestCase
+
+
+# Sem o cache de página inteira nem o dos cards, para medir a renderização de verdade
+@override_settings(PAGE_CACHE_TIMEOUT=0, FRAGMENT_CACHE_TIMEOUT=0)
+class TestRecipeIndexPageQueries(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root_page.add_child(instance=RecipeTagIndexPage(title='Tags', slug='tags'))
+        self.ingredient = Ingredient.objects.create(name='Farinha')
+
+    def add_recipe(self, number):
+        # Uma imagem por receita, como no site
+        image = Image.objects.create(title=f'Imagem {number}', file=get_test_image_file())
+        return super().add_recipe(
+            f'receita-{number}', ['doce', f'tag-{number}'], [self.ingredient], title=f'Receita {number}', image=image
+        )
+
+    def count_queries(self):
+        # The first request creates the renditions, so only the second one is measured
+        self.client.get('/receitas/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/receitas/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_listing_returns_specific_recipes(self):
+        """Test the listing queryset yields RecipePage instances"""
+        self.add_recipe(1)
+        recipes = list(RecipePage.objects.child_of(self.index_page).listing())
+        self.assertEqual(len(recipes), 1)
+        self.assertIsInstance(recipes[0], RecipePage)
+
+    def test_index_query_count_is_constant(self):
+        """Test rendering the index costs the same number of queries for 1 or 5 recipes"""
+        self.add_recipe(1)
+        single = self.count_queries()
+
+        for number in range(2, 6):
+            self.add_recipe(number)
+        many = self.count_queries()
+
+        self.assertEqual(single, many)
+
+    def test_tag_filter_query_count_is_constant(self):
+        """Test filtering by tags costs the same number of queries for 1 or 5 matching recipes"""
+        self.add_recipe(1)
+        self.client.get('/tags/?tag=doce')
+        with CaptureQueriesContext(connection) as single:
+            self.client.get('/tags/?tag=doce&tag=tag-1&match=any')
+
+        for number in range(2, 6):
+            self.add_recipe(number)
+        self.client.get('/tags/?tag=doce')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get('/tags/?tag=doce&tag=tag-1&match=any')
+
+        self.assertEqual(len(response.context['recipepages']), 5)
+        self.assertEqual(len(single), len(many))
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0, FRAGMENT_CACHE_TIMEOUT=0)
+class TestRecipePageQueries(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.qualifier = Qualifier.objects.create(name='Picado')
+
+    def add_recipe(self, slug, num_ingredients):
+        recipe = RecipePage(title=slug, slug=slug, description='Teste', font='Caderno', image=self.image)
+        for number in range(num_ingredients):
+            recipe_ingredient = RecipeIngredient(
+                ingredient=Ingredient.objects.create(name=f'{slug} {number}'), metric=self.metric, quantity=number + 1
+            )
+            recipe_ingredient.ingredient_qualifiers = [RecipeIngredientQualifier(qualifier=self.qualifier)]
+            recipe.ingredients.add(recipe_ingredient)
+        self.index_page.add_child(instance=recipe)
+        return recipe
+
+    def count_queries(self, url):
+        # The first request creates the renditions, so only the second one is measured
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_get_ingredients_query_count(self):
+        """Test loading ingredients, metrics, names and qualifiers takes two queries"""
+        recipe = RecipePage.objects.get(pk=self.add_recipe('bolo', 30).pk)
+        with self.assertNumQueries(2):
+            rows = [(str(row), row.qualifier_list) for row in recipe.get_ingredients()]
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(rows[0][1], ['Picado'])
+
+    def test_recipe_page_query_count_is_constant(self):
+        """Test rendering a recipe with 30 ingredients costs the same as one with a single ingredient"""
+        self.add_recipe('pudim', 1)
+        self.add_recipe('bolo', 30)
+        single, _ = self.count_queries('/receitas/pudim/')
+        many, response = self.count_queries('/receitas/bolo/')
+        self.assertEqual(single, many)
+        self.assertContains(response, '30.00 g de bolo 29, Picado')
@@ -0,0 +1,93 @@
+"""
+Orçamento de queries de cada página pública (`query_budget` nos modelos).
+
+Mede a primeira renderização, sem o cache de página, de fragmentos e do menu; só as renditions já
+estão no cache, como depois da publicação. Um acesso novo no template que faça uma query por card
+estoura o orçamento e o teste mostra os comandos repetidos.
+"""
+
+import tempfile
+
+import pytest
+from wagtail.images.models import Image
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Page
+
+from cdc.base.models import HomePage
+from cdc.recipes.models import (
+    Ingredient,
+    Metric,
+    Qualifier,
+    RecipeIndexPage,
+    RecipeIngredient,
+    RecipeIngredientQualifier,
+    RecipePage,
+    RecipeTagCount,
+    RecipeTagIndexPage,
+)
+from cdc.recipes.tasks import generate_recipe_renditions
+
+
+@pytest.fixture
+def site_pages(db, settings):
+    settings.MEDIA_ROOT = tempfile.mkdtemp()
+    settings.PAGE_CACHE_TIMEOUT = 0
+    settings.FRAGMENT_CACHE_TIMEOUT = 0
+    root = Page.objects.get(slug='home')
+    pages = {
+        'about': root.add_child(instance=HomePage(title='Sobre', slug='sobre', body='<p>Oi</p>', show_in_menus=True)),
+        'index': root.add_child(instance=RecipeIndexPage(title='Receitas', slug='receitas', show_in_menus=True)),
+        'tags': root.add_child(instance=RecipeTagIndexPage(title='Tags', slug='tags', show_in_menus=True)),
+    }
+    metric = Metric.objects.create(name='Gramas', abbr='g')
+    qualifier = Qualifier.objects.create(name='Picado')
+    images = [Image.objects.create(title=f'Imagem {n}', file=get_test_image_file()) for n in range(3)]
+    # Mais receitas que uma página da listagem, cada uma com vários ingredientes e tags
+    for number in range(RecipeIndexPage.recipes_per_page + 3):
+        recipe = RecipePage(
+            title=f'Receita {number}',
+            slug=f'receita-{number}',
+            description='Teste',
+            font='Caderno',
+            image=images[number % len(images)],
+        )
+        recipe.tags.add('doce', f'tag-{number}')
+        for position in range(5):
+            recipe.ingredients.add(
+                RecipeIngredient(
+                    ingredient=Ingredient.objects.get_or_create(name=f'Ingrediente {position}')[0],
+                    metric=metric,
+                    quantity=position + 1,
+                    ingredient_qualifiers=[RecipeIngredientQualifier(qualifier=qualifier)],
+                )
+            )
+        pages['recipe'] = pages['index'].add_child(instance=recipe)
+    RecipeTagCount.objects.rebuild()
+    for image in images:
+        generate_recipe_renditions.call(image.pk)
+    return pages
+
+
+@pytest.mark.parametrize(
+    'page_name, url',
+    [
+        ('about', '/sobre/'),
+        ('index', '/receitas/'),
+        ('tags', '/tags/'),
+        ('tags', '/tags/?tag=doce'),
+        ('tags', '/tags/doce/'),
+        ('recipe', '/receitas/receita-14/'),
+    ],
+)
+def test_page_query_budget(client, site_pages, query_budget, page_name, url):
+    """Test each public page renders within the query budget declared on its model"""
+    with query_budget(site_pages[page_name].query_budget, url):
+        response = client.get(url)
+    assert response.status_code == 200
+
+
+def test_budget_failure_lists_repeated_statements(client, site_pages, query_budget):
+    """Test a blown budget fails with the repeated statements in the message"""
+    with pytest.raises(AssertionError, match=r'/receitas/: \d+ queries, orçamento de 1\n.*\n  \d+x'):
+        with query_budget(1, '/receitas/'):
+            client.get('/receitas/')
@@ -0,0 +1,93 @@
+from io import BytesIO
+
+import PIL.Image
+from django.core.files.images import ImageFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from wagtail.images.models import Image, Rendition
+from wagtail.images.tests.utils import get_test_image_file
+
+from cdc.recipes.models import RecipePage
+from cdc.recipes.tasks import generate_recipe_renditions
+from cdc.recipes.tests.utils import RecipeTestCase
+from cdc.tasks.models import QueuedTask
+from cdc.tasks.tests.test_queue import QUEUE_SETTINGS
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0, FRAGMENT_CACHE_TIMEOUT=0)
+class TestRecipeRenditions(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.image = Image.objects.create(title='Imagem', file=get_test_image_file(size=(1600, 1200)))
+        self.recipe = self.add_recipe('bolo', title='Bolo')
+
+    def publish(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save_revision().publish()
+
+    def rendition_specs(self):
+        return set(Rendition.objects.filter(image=self.image).values_list('filter_spec', flat=True))
+
+    def test_publish_generates_all_renditions(self):
+        """Test publishing a recipe creates every rendition in the registry"""
+        self.publish()
+        self.assertEqual(self.rendition_specs(), set(RecipePage.get_rendition_filter_specs()))
+
+    def test_image_change_regenerates_renditions(self):
+        """Test saving a recipe image generates renditions for the new focal point"""
+        self.publish()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.image.focal_point_x = self.image.focal_point_y = 100
+            self.image.focal_point_width = self.image.focal_point_height = 50
+            self.image.save()
+        focal_point_keys = Rendition.objects.filter(
+            image=self.image, filter_spec='fill-400x300|format-avif'
+        ).values_list('focal_point_key', flat=True)
+        self.assertEqual(len(set(focal_point_keys)), 2)
+
+    def test_unused_image_change_does_nothing(self):
+        """Test saving an image no published recipe uses doesn't generate renditions"""
+        image = Image.objects.create(title='Imagem', file=get_test_image_file())
+        with self.captureOnCommitCallbacks(execute=True):
+            image.title = 'Outra'
+            image.save()
+        self.assertFalse(image.renditions.exists())
+
+    def test_listing_reads_renditions_from_cache(self):
+        """Test the listing doesn't query the renditions table once the recipe is published"""
+        self.publish()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/receitas/')
+        self.assertContains(response, 'type="image/avif"')
+        self.assertFalse([query for query in queries if 'wagtailimages_rendition' in query['sql']])
+
+    def test_picture_has_avif_and_webp_sources(self):
+        """Test the card picture offers AVIF and WebP at every width with a JPEG fallback"""
+        self.publish()
+        html = str(self.recipe.get_picture('card', {'sizes': '100vw'}))
+        self.assertIn('<source srcset="', html)
+        for fmt in ['avif', 'webp']:
+            self.assertIn(f'type="image/{fmt}"', html)
+            for width in [200, 400, 800]:
+                self.assertIn(f'.format-{fmt}.{fmt} {width}w', html)
+        self.assertIn('.fill-400x300.format-jpeg.jpg"', html)
+
+    @override_settings(TASKS=QUEUE_SETTINGS)
+    def test_missing_renditions_are_queued_not_created(self):
+        """Test a page renders without the picture while its renditions are generated in the background"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get('/receitas/bolo/').status_code, 200)
+            self.assertEqual(self.recipe.get_picture('detail'), '')
+        self.assertFalse(self.rendition_specs())
+        queued = QueuedTask.objects.filter(task_path=generate_recipe_renditions.module_path)
+        self.assertEqual(queued.count(), 1)
+
+    def test_avif_is_less_than_half_the_size_of_the_jpeg(self):
+        """Test the AVIF card rendition is at most half the size of the JPEG one"""
+        gradient = BytesIO()
+        PIL.Image.linear_gradient('L').resize((1600, 1200)).convert('RGB').save(gradient, 'JPEG')
+        image = Image.objects.create(title='Foto', file=ImageFile(gradient, name='foto.jpg'))
+        renditions = image.get_renditions('fill-400x300|format-avif', 'fill-400x300|format-jpeg')
+        avif, jpeg = (rendition.file.size for rendition in renditions.values())
+        self.assertLessEqual(avif * 2, jpeg)
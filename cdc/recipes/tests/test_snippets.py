@@ -1,7 +1,18 @@
 from django.test import TestCase
+from django.urls import reverse
+from wagtail.admin.panels import get_edit_handler
 from wagtail.test.utils import WagtailTestUtils
 
-from cdc.recipes.models import Ingredient, Metric, Qualifier
+from cdc.recipes.choosers import CatalogChooser
+from cdc.recipes.models import (
+    Ingredient,
+    Metric,
+    Qualifier,
+    RecipeIngredient,
+    RecipeIngredientQualifier,
+    RecipePage,
+)
+from cdc.recipes.tests.utils import RecipeTestCase
 
 
 class TestIngredientSnippet(WagtailTestUtils, TestCase):
@@ -51,3 +62,87 @@ class TestQualifierSnippet(WagtailTestUtils, TestCase):
         response = self.client.post('/cms/snippets/recipes/qualifier/add/', {'name': 'Test Qualifier'})
         # Should redirect after successful creation
         self.assertEqual(response.status_code, 302)
+
+
+class TestCatalogChoosers(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+        self.farinha = Ingredient.objects.create(name='Farinha de trigo')
+        Ingredient.objects.create(name='Fubá')
+        Ingredient.objects.create(name='Açúcar')
+        self.sifted = Qualifier.objects.create(name='Peneirada')
+
+    def create_recipe(self):
+        recipe = RecipePage(title='Bolo', slug='bolo', description='Teste', font='Caderno', image=self.image)
+        ingredient = RecipeIngredient(ingredient=self.farinha, metric=self.metric, quantity=200)
+        ingredient.ingredient_qualifiers.add(RecipeIngredientQualifier(qualifier=self.sifted))
+        recipe.ingredients.add(ingredient)
+        self.index_page.add_child(instance=recipe)
+        return recipe
+
+    def test_foreign_keys_use_catalog_chooser(self):
+        """Test admin forms pick the catalog chooser for ingredient, metric and qualifier fields"""
+        form_class = get_edit_handler(RecipeIngredient).get_form_class()
+        self.assertIsInstance(form_class.base_fields['ingredient'].widget, CatalogChooser)
+        self.assertIsInstance(form_class.base_fields['metric'].widget, CatalogChooser)
+
+    def test_chooser_field_renders_chosen_name(self):
+        """Test each form gets its own catalog chooser, rendering the chosen name"""
+        form_class = get_edit_handler(RecipeIngredient).get_form_class()
+        widget = form_class().fields['ingredient'].widget
+        self.assertIsNot(widget, form_class().fields['ingredient'].widget)
+        self.assertIs(widget.model, Ingredient)
+        self.assertIn('Farinha de trigo', widget.render('ingredient', self.farinha.pk))
+
+    def test_chooser_block(self):
+        """Test the chooser viewset builds a StreamField block on the catalog chooser"""
+        block = Ingredient.snippet_viewset.chooser_viewset.get_block_class()()
+        block.set_name('ingredient')
+        self.assertIsInstance(block.widget, CatalogChooser)
+        self.assertEqual(block.get_form_state(self.farinha)['string'], 'Farinha de trigo')
+        self.assertIn('Farinha de trigo', block.widget.render('ingredient', self.farinha.pk))
+
+    def test_chosen_labels_come_from_memory(self):
+        """Test the chosen item is displayed without a query once the labels are loaded"""
+        widget = CatalogChooser(model=Ingredient)
+        widget.get_value_data(self.farinha.pk)
+        with self.assertNumQueries(0):
+            value_data = widget.get_value_data(str(self.farinha.pk))
+        self.assertEqual(value_data['string'], 'Farinha de trigo')
+        self.assertEqual(value_data['edit_url'], f'/cms/snippets/recipes/ingredient/edit/{self.farinha.pk}/')
+
+    def test_labels_follow_renames_and_new_items(self):
+        """Test renamed items show their new name and items created elsewhere are still found"""
+        widget = CatalogChooser(model=Ingredient)
+        widget.get_value_data(self.farinha.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.farinha.name = 'Farinha integral'
+            self.farinha.save()
+        [created] = Ingredient.objects.bulk_create([Ingredient(name='Polvilho')])
+        self.assertEqual(widget.get_value_data(self.farinha.pk)['string'], 'Farinha integral')
+        self.assertEqual(widget.get_value_data(created.pk)['string'], 'Polvilho')
+        self.assertIsNone(widget.get_value_data(0))
+
+    def test_recipe_edit_form_shows_chosen_names(self):
+        """Test the recipe edit form shows the chosen ingredient, metric and qualifier"""
+        recipe = self.create_recipe()
+        response = self.client.get(f'/cms/pages/{recipe.pk}/edit/')
+        self.assertContains(response, 'Farinha de trigo')
+        self.assertContains(response, 'Peneirada')
+
+    def test_chooser_searches_by_prefix(self):
+        """Test the chooser modal filters by name prefix, ignoring case"""
+        url = reverse(Ingredient.snippet_viewset.chooser_viewset.get_url_name('choose_results'))
+        response = self.client.get(url, {'q': 'f'})
+        self.assertContains(response, 'Farinha de trigo')
+        self.assertContains(response, 'Fubá')
+        self.assertNotContains(response, 'Açúcar')
+        self.assertNotContains(self.client.get(url, {'q': 'trigo'}), 'Farinha de trigo')
+
+    def test_metric_chooser_searches_abbreviation(self):
+        """Test the metric chooser also matches the abbreviation, like the snippet listing"""
+        spoon = Metric.objects.create(name='Colher de sopa', abbr='c.s.')
+        url = reverse(Metric.snippet_viewset.chooser_viewset.get_url_name('choose_results'))
+        self.assertEqual(list(self.client.get(url, {'q': 'C.S'}).context['results']), [spoon])
+        self.assertEqual(list(self.client.get(url, {'q': 'gram'}).context['results']), [self.metric])
@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from taggit.models import Tag
+
+from cdc.recipes.models import Ingredient, RecipeIndexPage, RecipePage, RecipeSummary
+from cdc.recipes.tests.utils import RecipeTestCase
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0, FRAGMENT_CACHE_TIMEOUT=0)
+class TestRecipeSummary(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.add_recipe(
+            'bolo',
+            ['doce', 'forno'],
+            [Ingredient.objects.create(name='Farinha')],
+            title='Bolo',
+            description='Massa fofa. ' * 50,
+        )
+
+    def summary(self):
+        return RecipeSummary.objects.get(recipe=self.recipe)
+
+    def publish(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save_revision().publish()
+
+    def test_new_recipe_gets_a_summary(self):
+        """Test creating a live recipe writes its summary with the card data"""
+        summary = self.summary()
+        self.assertEqual(summary.index_id, self.index_page.pk)
+        self.assertEqual(summary.title, 'Bolo')
+        self.assertEqual(summary.url, '/receitas/bolo/')
+        self.assertEqual(summary.tags, ['doce', 'forno'])
+        self.assertEqual(summary.num_ingredients, 1)
+        self.assertLessEqual(len(summary.excerpt), RecipeSummary.EXCERPT_LENGTH)
+
+    def test_draft_keeps_published_summary(self):
+        """Test saving a draft revision doesn't leak unpublished changes into the listings"""
+        self.recipe.title = 'Bolo novo'
+        self.recipe.save_revision()
+        self.assertEqual(self.summary().title, 'Bolo')
+        self.recipe.save_revision().publish()
+        self.assertEqual(self.summary().title, 'Bolo novo')
+
+    def test_unpublish_removes_summary(self):
+        """Test an unpublished recipe leaves the listings, also through PageQuerySet.unpublish"""
+        RecipePage.objects.filter(pk=self.recipe.pk).unpublish()
+        self.assertFalse(RecipeSummary.objects.exists())
+        self.publish()
+        self.assertTrue(RecipeSummary.objects.exists())
+
+    def test_index_slug_change_updates_urls(self):
+        """Test changing the index slug rewrites the URL of the recipes below it"""
+        self.index_page.slug = 'pratos'
+        self.index_page.save_revision().publish()
+        self.assertEqual(self.summary().url, '/pratos/bolo/')
+
+    def test_move_updates_index_and_url(self):
+        """Test moving a recipe to another index updates its summary"""
+        other = RecipeIndexPage(title='Doces', slug='doces')
+        self.root_page.add_child(instance=other)
+        self.recipe.move(other, pos='last-child')
+        summary = self.summary()
+        self.assertEqual(summary.index_id, other.pk)
+        self.assertEqual(summary.url, '/doces/bolo/')
+
+    def test_tag_rename_and_delete(self):
+        """Test renaming or deleting a tag updates the summaries that show it"""
+        tag = Tag.objects.get(name='forno')
+        tag.name = 'assado'
+        tag.save()
+        self.assertEqual(self.summary().tags, ['assado', 'doce'])
+        tag.delete()
+        self.assertEqual(self.summary().tags, ['doce'])
+
+    def test_deleting_recipe_deletes_summary(self):
+        """Test the summary goes away with the page"""
+        self.recipe.delete()
+        self.assertFalse(RecipeSummary.objects.exists())
+
+    def test_renditions_are_stored_after_generation(self):
+        """Test the rendition task fills the card renditions, rendered without touching the images"""
+        self.assertEqual(self.summary().renditions, {})
+        self.publish()
+        summary = self.summary()
+        self.assertEqual(
+            [item['spec'] for item in summary.renditions['card']], RecipePage.get_rendition_filter_specs('card')
+        )
+        with CaptureQueriesContext(connection) as queries:
+            picture = str(summary.get_picture('card'))
+        self.assertEqual(len(queries), 0)
+        self.assertIn('type="image/avif"', picture)
+        self.assertIn('alt="Imagem"', picture)
+
+    def test_listing_reads_only_summaries(self):
+        """Test the index cards come from the summary table alone"""
+        self.publish()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/receitas/')
+        self.assertContains(response, 'href="/receitas/bolo/"')
+        self.assertContains(response, '<picture>')
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('recipes_recipesummary', sql)
+        for table in ['recipes_recipepage', 'recipes_recipepagetag', 'recipes_recipeingredient', 'wagtailimages_']:
+            self.assertNotIn(table, sql)
+
+    def test_rebuild_command(self):
+        """Test rebuild_recipe_summaries recreates missing or stale summaries"""
+        RecipeSummary.objects.all().delete()
+        call_command('rebuild_recipe_summaries', '--missing', stdout=StringIO())
+        self.assertEqual(self.summary().title, 'Bolo')
+        RecipeSummary.objects.update(title='velho')
+        call_command('rebuild_recipe_summaries', stdout=StringIO())
+        self.assertEqual(self.summary().title, 'Bolo')
@@ -1,9 +1,22 @@
+import threading
+from unittest import mock
+
 import pytest
 from django.test import Client
 from wagtail.models import Page
 from wagtail.test.utils import WagtailPageTestCase
 
-from cdc.recipes.models import RecipeIndexPage, RecipePage, RecipeTagIndexPage
+from cdc.recipes import autocomplete
+from cdc.recipes.models import (
+    Ingredient,
+    RecipeIndexPage,
+    RecipeIngredient,
+    RecipePage,
+    RecipeSummary,
+    RecipeTagIndexPage,
+)
+from cdc.recipes.tasks import reindex_recipes_with_ingredient
+from cdc.recipes.tests.utils import RecipeTestCase
 
 
 class TestRecipeIndexPageView(WagtailPageTestCase):
@@ -22,6 +35,45 @@ class TestRecipeIndexPageView(WagtailPageTestCase):
         self.assertContains(response, 'Bem-vindo')
 
 
+class TestRecipeIndexPagination(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root_page.add_child(instance=RecipeTagIndexPage(title='Tags', slug='tags'))
+        for number in range(1, 4):
+            self.add_recipe(f'receita-{number}', title=f'Receita {number}')
+        RecipeIndexPage.recipes_per_page = 2
+        self.addCleanup(setattr, RecipeIndexPage, 'recipes_per_page', 12)
+
+    def test_first_page_has_next_cursor(self):
+        """Test the first page shows the newest recipes and a link to the next batch"""
+        response = self.client.get('/receitas/')
+        self.assertEqual([recipe.title for recipe in response.context['recipepages']], ['Receita 3', 'Receita 2'])
+        self.assertIsNotNone(response.context['next_cursor'])
+        self.assertContains(response, 'hx-get="/receitas/?after=')
+
+    def test_next_cursor_continues_listing(self):
+        """Test following the cursor returns the remaining recipes and no further cursor"""
+        first = self.client.get('/receitas/')
+        response = self.client.get('/receitas/', {'after': first.context['next_cursor']})
+        self.assertEqual([recipe.title for recipe in response.context['recipepages']], ['Receita 1'])
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertNotContains(response, 'hx-get=')
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        """Test a malformed cursor is ignored"""
+        response = self.client.get('/receitas/', {'after': 'não-é-um-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['recipepages']), 2)
+
+    def test_htmx_request_returns_only_cards(self):
+        """Test an htmx request gets the cards partial instead of the full page"""
+        response = self.client.get('/receitas/', headers={'HX-Request': 'true'})
+        self.assertTemplateUsed(response, 'recipes/includes/recipe_index_items.html')
+        self.assertTemplateNotUsed(response, 'recipes/recipe_index_page.html')
+        self.assertNotContains(response, '<html')
+        self.assertIn('HX-Request', response['Vary'])
+
+
 class TestRecipeTagIndexPageView(WagtailPageTestCase):
     def setUp(self):
         self.client = Client()
@@ -46,6 +98,154 @@ class TestRecipeTagIndexPageView(WagtailPageTestCase):
         self.assertContains(response, 'Receitas com tag "test"')
 
 
+class TestRecipeTagIndexPageFilters(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root_page.add_child(instance=RecipeTagIndexPage(title='Tags', slug='tags'))
+        for slug, tags in [('bolo', ['doce', 'forno']), ('pudim', ['doce']), ('pao', ['forno', 'salgado'])]:
+            self.add_recipe(slug, tags)
+
+    def titles(self, response):
+        return sorted(recipe.title for recipe in response.context['recipepages'])
+
+    def test_single_tag(self):
+        """Test filtering by one tag"""
+        response = self.client.get('/tags/', {'tag': 'doce'})
+        self.assertEqual(self.titles(response), ['bolo', 'pudim'])
+
+    def test_multiple_tags_match_all(self):
+        """Test repeated tag parameters return only recipes with every tag"""
+        response = self.client.get('/tags/', {'tag': ['doce', 'forno']})
+        self.assertEqual(self.titles(response), ['bolo'])
+        self.assertEqual(response.context['current_tags'], ['doce', 'forno'])
+        self.assertContains(response, 'Receitas com todas as tags')
+
+    def test_multiple_tags_match_any(self):
+        """Test match=any returns recipes with at least one of the tags"""
+        response = self.client.get('/tags/', {'tag': ['doce', 'salgado'], 'match': 'any'})
+        self.assertEqual(self.titles(response), ['bolo', 'pao', 'pudim'])
+
+    def test_unknown_tag_matches_nothing(self):
+        """Test a tag that doesn't exist can't be satisfied in match-all mode"""
+        response = self.client.get('/tags/', {'tag': ['doce', 'inexistente']})
+        self.assertEqual(self.titles(response), [])
+
+    def test_results_are_summaries(self):
+        """Test the filtered results are the recipes' summaries, linking to the recipe pages"""
+        response = self.client.get('/tags/', {'tag': 'forno'})
+        for recipe in response.context['recipepages']:
+            self.assertIsInstance(recipe, RecipeSummary)
+            self.assertContains(response, f'href="{recipe.url}"')
+
+    def test_tag_path(self):
+        """Test /tags/<tag>/ lists the same recipes as ?tag=, and 404s for a tag without recipes"""
+        response = self.client.get('/tags/doce/')
+        self.assertEqual(self.titles(response), ['bolo', 'pudim'])
+        self.assertContains(response, 'Receitas com tag "doce"')
+        self.assertEqual(self.client.get('/tags/inexistente/').status_code, 404)
+        self.assertEqual(self.client.get('/tags/doce/forno/').status_code, 404)
+
+    def test_tag_links_use_paths(self):
+        """Test the cards link each tag to its own address"""
+        self.assertContains(self.client.get('/receitas/'), 'href="/tags/salgado/"')
+
+
+class TestSearchView(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ingredient = Ingredient.objects.create(name='Mandioca')
+
+        # Os índices de busca são atualizados no commit da transação
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_recipe('bolo', ingredients=[self.ingredient], title='Bolo de fubá', description='Bolo simples')
+            self.add_recipe('pudim', title='Pudim', description='Sobremesa gelada')
+
+    def titles(self, response):
+        return [result.title for result in response.context['search_results']]
+
+    def test_search_without_query(self):
+        """Test the search page renders with no results and no query"""
+        response = self.client.get('/search/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(response), [])
+
+    def test_search_by_title(self):
+        """Test searching recipe titles with Portuguese stemming"""
+        response = self.client.get('/search/', {'query': 'bolos'})
+        self.assertEqual(self.titles(response), ['Bolo de fubá'])
+
+    def test_search_by_ingredient_name(self):
+        """Test recipes are found by the names of their ingredients"""
+        response = self.client.get('/search/', {'query': 'mandioca'})
+        self.assertEqual(self.titles(response), ['Bolo de fubá'])
+
+    def test_ingredient_rename_reindexes_recipes(self):
+        """Test renaming an ingredient updates the recipes that use it"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.name = 'Aipim'
+            self.ingredient.save()
+        response = self.client.get('/search/', {'query': 'aipim'})
+        self.assertEqual(self.titles(response), ['Bolo de fubá'])
+
+    def test_ingredient_rename_reindexes_in_one_task(self):
+        """Test renaming an ingredient enqueues one task that reindexes all its recipes in batches"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_recipe('cuscuz', ingredients=[self.ingredient], title='Cuscuz', description='Salgado')
+        with mock.patch('cdc.recipes.signals.reindex_recipes_with_ingredient') as task:
+            self.ingredient.name = 'Aipim'
+            self.ingredient.save()
+        task.enqueue.assert_called_once_with(self.ingredient.pk)
+        reindex_recipes_with_ingredient.call(self.ingredient.pk, batch_size=1)
+        response = self.client.get('/search/', {'query': 'aipim'})
+        self.assertEqual(sorted(self.titles(response)), ['Bolo de fubá', 'Cuscuz'])
+
+    def test_search_results_are_paginated(self):
+        """Test out of range pages fall back to the last page"""
+        response = self.client.get('/search/', {'query': 'bolo', 'page': 99})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['search_results'].number, 1)
+
+
+class TestAutocompleteView(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_recipe('manjar', title='Manjar branco', description='Doce')
+        Ingredient.objects.create(name='Mandioca')
+        Ingredient.objects.create(name='Manteiga')
+        Ingredient.objects.create(name='Farinha')
+        autocomplete.cache.clear()
+        self.addCleanup(autocomplete.cache.clear)
+
+    def test_autocomplete_json(self):
+        """Test recipes and ingredients starting with the prefix are suggested"""
+        response = self.client.get('/search/autocomplete/', {'query': '  MAN '})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([recipe['title'] for recipe in data['recipes']], ['Manjar branco'])
+        self.assertEqual(data['recipes'][0]['url'], '/receitas/manjar/')
+        self.assertEqual([ingredient['name'] for ingredient in data['ingredients']], ['Mandioca', 'Manteiga'])
+
+    def test_short_prefix_returns_nothing(self):
+        """Test a single character doesn't hit the database"""
+        with self.assertNumQueries(0):
+            response = self.client.get('/search/autocomplete/', {'query': 'm'})
+        self.assertEqual(response.json(), {'recipes': [], 'ingredients': []})
+
+    def test_repeated_prefix_is_cached(self):
+        """Test the same normalized prefix is answered from the in-process cache"""
+        self.client.get('/search/autocomplete/', {'query': 'Man'})
+        with self.assertNumQueries(0):
+            response = self.client.get('/search/autocomplete/', {'query': 'man'})
+        self.assertEqual(len(response.json()['ingredients']), 2)
+
+    def test_htmx_request_returns_html(self):
+        """Test htmx requests get the suggestions rendered as HTML"""
+        response = self.client.get('/search/autocomplete/', {'query': 'farin'}, headers={'HX-Request': 'true'})
+        self.assertTemplateUsed(response, 'recipes/includes/autocomplete_results.html')
+        self.assertContains(response, 'Farinha')
+
+
 class TestRecipePageView(WagtailPageTestCase):
     def setUp(self):
         self.client = Client()
@@ -57,3 +257,119 @@ class TestRecipePageView(WagtailPageTestCase):
         # For now, just test that the model exists and basic functionality
         recipe_page = RecipePage(title='Test Recipe', slug='test-recipe')
         self.assertEqual(recipe_page.title, 'Test Recipe')
+
+
+class TestRecipeFragmentCache(RecipeTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root_page.add_child(instance=RecipeTagIndexPage(title='Tags', slug='tags'))
+        self.ingredient = Ingredient.objects.create(name='Mandioca')
+        recipe = self.add_recipe('bolo', ['doce'], [self.ingredient], title='Bolo')
+        recipe.save_revision().publish()
+        self.recipe = RecipePage.objects.get(pk=recipe.pk)
+
+    def change_title_without_revision(self):
+        RecipePage.objects.filter(pk=self.recipe.pk).update(title='Pudim')
+
+    def test_card_is_cached(self):
+        """Test a listing reuses the rendered card while the recipe has no new revision"""
+        self.client.get('/receitas/')
+        self.change_title_without_revision()
+        self.assertContains(self.client.get('/receitas/'), 'Bolo')
+
+    def test_card_is_shared_between_listings(self):
+        """Test the tag page reuses the card rendered by the recipe index"""
+        self.client.get('/receitas/')
+        self.change_title_without_revision()
+        self.assertContains(self.client.get('/tags/?tag=doce'), 'Bolo')
+
+    def test_new_revision_renders_new_card(self):
+        """Test publishing a new revision changes the card key"""
+        self.client.get('/receitas/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.title = 'Pudim'
+            self.recipe.save_revision().publish()
+        response = self.client.get('/receitas/')
+        self.assertContains(response, 'Pudim')
+        self.assertNotContains(response, 'Bolo')
+
+    def test_ingredient_list_is_cached(self):
+        """Test the ingredient list is served from the fragment cache"""
+        self.client.get('/receitas/bolo/')
+        Ingredient.objects.filter(pk=self.ingredient.pk).update(name='Aipim')
+        self.assertContains(self.client.get('/receitas/bolo/'), 'Mandioca')
+
+    def test_ingredient_rename_invalidates_ingredient_list(self):
+        """Test renaming an ingredient discards the lists that show it"""
+        self.client.get('/receitas/bolo/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.name = 'Aipim'
+            self.ingredient.save()
+        response = self.client.get('/receitas/bolo/')
+        self.assertContains(response, 'Aipim')
+        self.assertNotContains(response, 'Mandioca')
+
+    def test_publishing_saved_revision_renders_its_ingredients(self):
+        """Test publishing a revision saved earlier (approval, scheduled go-live) changes the list key"""
+        self.recipe.ingredients = [
+            RecipeIngredient(ingredient=Ingredient.objects.create(name='Aipim'), metric=self.metric, quantity=300)
+        ]
+        revision = self.recipe.save_revision()
+        self.assertContains(self.client.get('/receitas/bolo/'), 'Mandioca')
+        with self.captureOnCommitCallbacks(execute=True):
+            revision.publish()
+        response = self.client.get('/receitas/bolo/')
+        self.assertContains(response, 'Aipim')
+        self.assertNotContains(response, 'Mandioca')
+
+    def test_preview_ignores_cached_ingredient_list(self):
+        """Test a preview renders the ingredients of the revision being edited"""
+        self.client.get('/receitas/bolo/')
+        self.recipe.ingredients = [
+            RecipeIngredient(ingredient=Ingredient.objects.create(name='Aipim'), metric=self.metric, quantity=300)
+        ]
+        response = self.recipe.make_preview_request()
+        self.assertContains(response, 'Aipim')
+        self.assertNotContains(response, 'Mandioca')
+
+
+class TestAsgiReadPaths(RecipeTestCase):
+    """The read-only views served through Django's ASGI handler, as under the uvicorn workers."""
+
+    def setUp(self):
+        super().setUp()
+        self.root_page.add_child(instance=RecipeTagIndexPage(title='Tags', slug='tags'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_recipe('manjar', ['doce'], title='Manjar branco', description='Doce')
+        Ingredient.objects.create(name='Mandioca')
+        autocomplete.cache.clear()
+        self.addCleanup(autocomplete.cache.clear)
+
+    async def test_listing(self):
+        """Test the recipe listing renders under ASGI"""
+        response = await self.async_client.get('/receitas/')
+        self.assertContains(response, 'Manjar Branco')
+
+    async def test_tag_listing(self):
+        """Test the tag filter and the tag cloud render under ASGI"""
+        self.assertContains(await self.async_client.get('/tags/', {'tag': 'doce'}), 'Manjar Branco')
+        self.assertContains(await self.async_client.get('/tags/'), 'doce')
+
+    async def test_autocomplete_runs_on_event_loop(self):
+        """Test no sync-only middleware pushes the async autocomplete view into another thread"""
+        threads = []
+
+        async def suggest(prefix):
+            threads.append(threading.get_ident())
+            return {'recipes': [], 'ingredients': []}
+
+        with mock.patch('cdc.recipes.views.asuggest', suggest):
+            await self.async_client.get('/search/autocomplete/', {'query': 'man'})
+        self.assertEqual(threads, [threading.get_ident()])
+
+    async def test_autocomplete(self):
+        """Test the async autocomplete view answers under ASGI"""
+        response = await self.async_client.get('/search/autocomplete/', {'query': 'man'})
+        data = response.json()
+        self.assertEqual([recipe['title'] for recipe in data['recipes']], ['Manjar branco'])
+        self.assertEqual([ingredient['name'] for ingredient in data['ingredients']], ['Mandioca'])
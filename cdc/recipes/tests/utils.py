@@ -0,0 +1,43 @@
+"""
+Base dos testes que montam o site de receitas.
+
+As imagens de teste vão para um MEDIA_ROOT temporário, fora do diretório `media` do projeto.
+"""
+
+import tempfile
+
+from django.test import override_settings
+from wagtail.images.models import Image
+from wagtail.images.tests.utils import get_test_image_file
+from wagtail.models import Page
+from wagtail.test.utils import WagtailPageTestCase
+
+from cdc.recipes.models import Metric, RecipeIndexPage, RecipeIngredient, RecipePage
+
+# Para as classes que gravam imagens sem usar RecipeTestCase
+temporary_media = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+
+
+@temporary_media
+class RecipeTestCase(WagtailPageTestCase):
+    """
+    Cria a home (`root_page`), o índice `/receitas/` (`index_page`), uma imagem (`image`) e a
+    unidade `metric`; `add_recipe` cria as receitas no índice.
+    """
+
+    def setUp(self):
+        self.root_page = Page.objects.get(slug='home')
+        self.index_page = RecipeIndexPage(title='Receitas', slug='receitas')
+        self.root_page.add_child(instance=self.index_page)
+        self.image = Image.objects.create(title='Imagem', file=get_test_image_file())
+        self.metric = Metric.objects.create(name='Gramas', abbr='g')
+
+    def add_recipe(self, slug, tags=(), ingredients=(), **fields):
+        """Receita publicada no índice, com as tags e uma unidade de cada ingrediente."""
+        fields = {'title': slug, 'description': 'Teste', 'font': 'Caderno', 'image': self.image, **fields}
+        recipe = RecipePage(slug=slug, **fields)
+        recipe.tags.add(*tags)
+        for ingredient in ingredients:
+            recipe.ingredients.add(RecipeIngredient(ingredient=ingredient, metric=self.metric, quantity=1))
+        self.index_page.add_child(instance=recipe)
+        return recipe
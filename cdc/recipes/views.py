@@ -1,3 +1,80 @@
-from django.shortcuts import render
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models.functions import Lower
+from django.http import JsonResponse
+from django.template.response import TemplateResponse
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from cdc.recipes.autocomplete import asuggest
+from cdc.recipes.models import Ingredient, RecipePage, RecipeSummary
+from cdc.recipes.pantry import pantry
+
+RESULTS_PER_PAGE = 10
+COOK_RESULTS = 24
+MAX_COOK_INGREDIENTS = 30
+
+
+def search(request):
+    """Busca full-text nas receitas publicadas, ordenada por relevância."""
+    search_query = request.GET.get('query', '').strip()
+    page = request.GET.get('page', 1)
+
+    if search_query:
+        search_results = RecipePage.objects.listing().search(search_query)
+    else:
+        search_results = RecipePage.objects.none()
+
+    paginator = Paginator(search_results, RESULTS_PER_PAGE)
+    try:
+        search_results = paginator.page(page)
+    except PageNotAnInteger:
+        search_results = paginator.page(1)
+    except EmptyPage:
+        search_results = paginator.page(paginator.num_pages)
+
+    return TemplateResponse(
+        request,
+        'recipes/search.html',
+        {
+            'search_query': search_query,
+            'search_results': search_results,
+        },
+    )
+
+
+def parse_ingredient_names(value):
+    """Nomes separados por vírgula, normalizados e sem repetição."""
+    names = (' '.join(name.casefold().split()) for name in value.split(','))
+    return list(dict.fromkeys(name for name in names if name))[:MAX_COOK_INGREDIENTS]
+
+
+def cook(request):
+    """Receitas para os ingredientes que o usuário tem, pela fração dos ingredientes de cada uma que ele tem."""
+    ingredients_query = request.GET.get('ingredients', '').strip()
+    names = parse_ingredient_names(ingredients_query)
+    ingredients = list(Ingredient.objects.annotate(name_lower=Lower('name')).filter(name_lower__in=names))
+    found = {ingredient.name_lower for ingredient in ingredients}
+
+    matches = pantry.match([ingredient.pk for ingredient in ingredients], COOK_RESULTS) if ingredients else []
+    summaries = RecipeSummary.objects.in_bulk([match.recipe_id for match in matches])
+    # Uma receita despublicada há pouco pode ainda estar no índice de outro processo
+    results = [(summaries[match.recipe_id], match) for match in matches if match.recipe_id in summaries]
+
+    return TemplateResponse(
+        request,
+        'recipes/cook.html',
+        {
+            'ingredients_query': ingredients_query,
+            'ingredients': ingredients,
+            'unknown_ingredients': [name for name in names if name not in found],
+            'results': results,
+        },
+    )
+
+
+@require_GET
+async def autocomplete(request):
+    """Sugestões de receitas e ingredientes para o prefixo digitado: JSON, ou HTML para o htmx."""
+    suggestions = await asuggest(request.GET.get('query', ''))
+    if request.htmx:
+        return TemplateResponse(request, 'recipes/includes/autocomplete_results.html', suggestions)
+    return JsonResponse(suggestions)
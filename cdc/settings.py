@@ -15,6 +15,7 @@ from pathlib import Path
 
 import environ
 import sentry_sdk
+from django.core.exceptions import ImproperlyConfigured
 from sentry_sdk.integrations.django import DjangoIntegration
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -36,6 +37,9 @@ sentry_sdk.init(
     # Add data like request headers and IP for users,
     # see https://docs.sentry.io/platforms/python/data-management/data-collected/ for more info
     send_default_pii=True,
+    # Performance: fração dos requests e tarefas com trace e, entre eles, com profile. O padrão 0 desliga.
+    traces_sample_rate=env.float('SENTRY_TRACES_SAMPLE_RATE', 0.0),
+    profiles_sample_rate=env.float('SENTRY_PROFILES_SAMPLE_RATE', 0.0),
 )
 
 # Application definition
@@ -68,12 +72,16 @@ INSTALLED_APPS = [
     'django_htmx',
     'cdc.base',
     'cdc.recipes',
+    'cdc.tasks',
 ]
 
 MIDDLEWARE = [
+    # Só entra na pilha com SQL_PROFILE=True; fica primeiro para medir as queries dos outros middlewares
+    'cdc.base.middleware.SQLProfileMiddleware',
+    'cdc.base.middleware.CacheControlMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'cdc.base.middleware.WhiteNoiseMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -83,10 +91,37 @@ MIDDLEWARE = [
     'django_htmx.middleware.HtmxMiddleware',
     'django_browser_reload.middleware.BrowserReloadMiddleware',
     'wagtail.contrib.redirects.middleware.RedirectMiddleware',
+    # Só entra na pilha com STATIC_EXPORT_DIR; fica depois dos middlewares de segurança para os
+    # arquivos saírem com os mesmos cabeçalhos das páginas renderizadas
+    'cdc.base.middleware.StaticPagesMiddleware',
 ]
 
 ROOT_URLCONF = 'cdc.urls'
 
+# Perfil de SQL por request (cdc/base/middleware.py), para desenvolvimento e staging. Requests mais lentos
+# que SQL_PROFILE_SLOW_MS ou acima do query_budget da página vão para o log rotativo SQL_PROFILE_LOG.
+SQL_PROFILE = env.bool('SQL_PROFILE', False)
+SQL_PROFILE_SLOW_MS = env.int('SQL_PROFILE_SLOW_MS', 300)
+SQL_PROFILE_LOG = env.str('SQL_PROFILE_LOG', str(BASE_DIR / 'logs' / 'sql-profile.log'))
+
+if SQL_PROFILE:
+    os.makedirs(os.path.dirname(SQL_PROFILE_LOG), exist_ok=True)
+    LOGGING = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'handlers': {
+            'sql_profile': {
+                'class': 'logging.handlers.RotatingFileHandler',
+                'filename': SQL_PROFILE_LOG,
+                'maxBytes': 5 * 1024 * 1024,
+                'backupCount': 5,
+            },
+        },
+        'loggers': {
+            'cdc.sqlprofile': {'handlers': ['sql_profile'], 'level': 'WARNING', 'propagate': False},
+        },
+    }
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -99,6 +134,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'wagtail.contrib.settings.context_processors.settings',
+                'cdc.base.context_processors.fragment_cache',
             ],
         },
     },
@@ -109,6 +145,33 @@ WSGI_APPLICATION = 'cdc.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+
+def connection_config():
+    """
+    Reaproveitamento das conexões: CONN_MAX_AGE e o pool do psycopg (OPTIONS['pool']).
+
+    Por padrão cada processo mantém a sua conexão aberta entre requests por DB_CONN_MAX_AGE segundos.
+    Com DB_POOL=True as conexões vêm de um pool por processo, útil quando os requests ou tarefas rodam
+    em threads que mudam o tempo todo (SERVER_MODE=asgi, run_task_worker com TASK_WORKER_THREADS > 1).
+    O Django não aceita as duas coisas juntas, então DB_CONN_MAX_AGE precisa ficar vazio ou 0 com o pool.
+    """
+    conn_max_age = env.str('DB_CONN_MAX_AGE', '')
+    if not env.bool('DB_POOL', False):
+        return int(conn_max_age or 60), False
+    if int(conn_max_age or 0):
+        raise ImproperlyConfigured(
+            'DB_POOL e DB_CONN_MAX_AGE não podem ser usados juntos; deixe DB_CONN_MAX_AGE vazio.'
+        )
+    # min/max conexões por processo e espera máxima por uma livre (s)
+    return 0, {
+        'min_size': env.int('DB_POOL_MIN_SIZE', 2),
+        'max_size': env.int('DB_POOL_MAX_SIZE', 10),
+        'timeout': env.int('DB_POOL_TIMEOUT', 10),
+    }
+
+
+CONN_MAX_AGE, DB_POOL = connection_config()
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -117,9 +180,114 @@ DATABASES = {
         'PASSWORD': env('DB_PASSWORD'),
         'HOST': env('DB_HOST'),
         'PORT': env('DB_PORT'),
+        # Conexão persistente ou pool (connection_config), testada antes de ser reaproveitada
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Timeout no servidor para cada comando SQL, em ms (0 desliga)
+            'options': f'-c statement_timeout={env.int("DB_STATEMENT_TIMEOUT", 30000)}',
+            'pool': DB_POOL,
+        },
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Os caches são compartilhados por todos os processos: os workers do gunicorn e o run_task_worker
+# invalidam o cache de páginas e as versões dos choosers uns dos outros. Sem as URLs eles ficam em
+# arquivos em CACHE_DIR, que serve para os processos de um mesmo host (ou containers com o mesmo
+# volume); com vários hosts use rediscache://redis:6379/1 (precisa do pacote redis). O LocMem
+# (locmemcache://) é de um processo só e não é aceito com a fila de tarefas.
+CACHE_DIR = Path(env.str('CACHE_DIR', str(BASE_DIR / '.cache')))
+
+
+def cache_config(var, name, max_entries):
+    config = env.cache_url(var, default=f'filecache://{CACHE_DIR / name}')
+    if config['BACKEND'].endswith(('.FileBasedCache', '.LocMemCache')):
+        # Acima de MAX_ENTRIES (300 no Django) esses backends apagam entradas ao acaso a cada escrita
+        config.setdefault('OPTIONS', {}).setdefault('MAX_ENTRIES', max_entries)
+    return config
+
+
+CACHES = {
+    # Páginas inteiras, menu e fragmentos: tudo pode sair a qualquer momento e ser gerado de novo
+    'default': cache_config('CACHE_URL', 'default', env.int('CACHE_MAX_ENTRIES', 50_000)),
+    # Renditions das imagens (usado pelo wagtail). A chave inclui o hash do arquivo e o ponto focal,
+    # então as entradas não ficam desatualizadas e podem durar bastante.
+    'renditions': {
+        **cache_config('RENDITIONS_CACHE_URL', 'renditions', env.int('RENDITIONS_CACHE_MAX_ENTRIES', 50_000)),
+        'TIMEOUT': env.int('RENDITIONS_CACHE_TIMEOUT', 60 * 60 * 24),
+    },
+    # Versões das páginas, das listagens e dos choosers (cdc/base/cache.py). Uma versão apagada volta
+    # com outro valor e o processo que guardou a antiga segue servindo conteúdo velho: este cache não
+    # pode descartar entradas, e elas são poucas (uma por página). No Redis, use um servidor com
+    # maxmemory-policy que não seja allkeys-*.
+    'versions': cache_config('VERSIONS_CACHE_URL', 'versions', 10_000_000),
+}
+# Validade, em segundos, das páginas inteiras guardadas para visitantes anônimos (cdc/base/cache.py)
+PAGE_CACHE_TIMEOUT = env.int('PAGE_CACHE_TIMEOUT', 300)
+# Caminhos que nunca são guardados pelo navegador nem pela CDN (cdc/base/middleware.py)
+NEVER_CACHE_PATHS = ['/cms/', '/admin/', '/accounts/']
+# Purge da CDN por Surrogate-Key quando as páginas mudam (cdc/base/purge.py). Sem CDN_PURGE_BACKEND
+# nada é purgado. Para a Fastly: CDN_PURGE_BACKEND=cdc.base.purge.HTTPPurgeBackend,
+# CDN_PURGE_URL=https://api.fastly.com/service/<id>/purge e CDN_PURGE_HEADERS=Fastly-Key=<token>.
+CDN_PURGE = {
+    'BACKEND': env.str('CDN_PURGE_BACKEND', ''),
+    'OPTIONS': {
+        'url': env.str('CDN_PURGE_URL', ''),
+        'method': env.str('CDN_PURGE_METHOD', 'POST'),
+        'header': env.str('CDN_PURGE_HEADER', 'Surrogate-Key'),
+        'headers': env.dict('CDN_PURGE_HEADERS', default={}),
+    },
+}
+# Domínio público da mídia no S3 (o bucket com leitura pública ou uma CDN na frente dele). Com ele as
+# URLs das imagens não são assinadas e não expiram; sem ele cada URL assinada vale MEDIA_URL_EXPIRE segundos.
+MEDIA_PUBLIC_DOMAIN = env.str('MEDIA_PUBLIC_DOMAIN', '')
+MEDIA_URL_EXPIRE = 900
+SIGNED_MEDIA_URLS = not DEBUG and not MEDIA_PUBLIC_DOMAIN
+# Exportação das páginas públicas para HTML estático (cdc/base/static_export.py). Com o diretório definido,
+# os GETs anônimos recebem os arquivos de `manage.py export_static` (StaticPagesMiddleware) e cada
+# publicação renderiza de novo as páginas afetadas. O navegador guarda os arquivos por
+# STATIC_EXPORT_MAX_AGE segundos; mais velhos que STATIC_EXPORT_FILE_MAX_AGE (0: sem limite) eles
+# deixam de ser servidos. Com URLs assinadas o limite é obrigatório e menor que MEDIA_URL_EXPIRE, e
+# `export_static` precisa rodar periodicamente num intervalo menor que ele.
+STATIC_EXPORT_DIR = env.str('STATIC_EXPORT_DIR', '')
+STATIC_EXPORT_MAX_AGE = env.int('STATIC_EXPORT_MAX_AGE', 60)
+STATIC_EXPORT_FILE_MAX_AGE = env.int('STATIC_EXPORT_FILE_MAX_AGE', 600 if SIGNED_MEDIA_URLS else 0)
+if STATIC_EXPORT_DIR and SIGNED_MEDIA_URLS and not 0 < STATIC_EXPORT_FILE_MAX_AGE < MEDIA_URL_EXPIRE:
+    raise ImproperlyConfigured(
+        f'Com URLs assinadas da mídia, STATIC_EXPORT_FILE_MAX_AGE precisa ficar entre 1 e {MEDIA_URL_EXPIRE - 1}; '
+        'defina MEDIA_PUBLIC_DOMAIN para exportar URLs públicas.'
+    )
+# Validade do menu em cache (cdc/base/navigation.py). Os sinais apagam a cópia do cache a cada publicação;
+# o limite cobre um cache que não é compartilhado entre os processos.
+NAVIGATION_CACHE_TIMEOUT = env.int('NAVIGATION_CACHE_TIMEOUT', 300)
+# Validade dos blocos {% cache %} (cards e lista de ingredientes). As chaves já mudam a cada nova revisão;
+# o limite existe porque as URLs assinadas das imagens no S3 expiram em MEDIA_URL_EXPIRE segundos.
+FRAGMENT_CACHE_TIMEOUT = env.int('FRAGMENT_CACHE_TIMEOUT', 600)
+
+# Tarefas em segundo plano (indexação da busca, renditions, contagem de tags...).
+# Sem TASKS_BACKEND elas rodam logo depois do commit, dentro da própria requisição. Com
+# cdc.tasks.backends.QueueBackend vão para uma fila no Postgres, executada por `manage.py run_task_worker`.
+TASKS = {
+    'default': {
+        'BACKEND': env.str('TASKS_BACKEND', 'django_tasks.backends.immediate.ImmediateBackend'),
+        'OPTIONS': {
+            'MAX_ATTEMPTS': env.int('TASKS_MAX_ATTEMPTS', 5),
+            'RETRY_BACKOFF': env.int('TASKS_RETRY_BACKOFF', 10),
+        },
+    },
+}
+# Tarefas executadas ao mesmo tempo por processo do worker
+TASK_WORKER_THREADS = env.int('TASK_WORKER_THREADS', 2)
+if TASKS['default']['BACKEND'] == 'cdc.tasks.backends.QueueBackend' and any(
+    'LocMemCache' in CACHES[alias]['BACKEND'] for alias in ('default', 'versions')
+):
+    # As invalidações feitas pelas tarefas no worker nunca chegariam aos processos do gunicorn
+    raise ImproperlyConfigured(
+        'A fila de tarefas (QueueBackend) precisa de CACHE_URL e VERSIONS_CACHE_URL compartilhados, não LocMem.'
+    )
+
 AUTHENTICATION_BACKENDS = [
     # Needed to login by username in Django admin, regardless of `allauth`
     'django.contrib.auth.backends.ModelBackend',
@@ -187,17 +355,19 @@ if DEBUG:
 else:
     STORAGES = {
         'default': {
-            'BACKEND': 'storages.backends.s3.S3Storage',
+            # S3Storage com spans do Sentry em cada operação
+            'BACKEND': 'cdc.base.storage.TracedS3Storage',
             'OPTIONS': {
                 'bucket_name': env.str('AWS_STORAGE_BUCKET_NAME'),
                 'endpoint_url': env.str('AWS_S3_ENDPOINT_URL'),  # Interno Docker
-                'querystring_auth': True,
-                'querystring_expire': 900,
+                'custom_domain': MEDIA_PUBLIC_DOMAIN or None,
+                'querystring_auth': SIGNED_MEDIA_URLS,
+                'querystring_expire': MEDIA_URL_EXPIRE,
                 'default_acl': None,
                 'region_name': 'us-east-1',
                 'signature_version': 's3v4',
                 'addressing_style': 'path',
-                'url_protocol': 'https',
+                'url_protocol': 'https:',  # Só usado com o custom_domain
             },
         },
         'staticfiles': {
@@ -213,5 +383,13 @@ DATA_UPLOAD_MAX_NUMBER_FIELDS = 10_000
 WAGTAIL_SITE_NAME = 'Cozinha de Campos'
 WAGTAILADMIN_BASE_URL = 'https://www.cozinhadecampos.com.br'
 WAGTAILDOCS_EXTENSIONS = ['csv', 'docx', 'key', 'odt', 'pdf', 'pptx', 'rtf', 'txt', 'xlsx', 'zip']
+# Busca full-text no próprio Postgres (tsvector com índice GIN), com stemming em português.
+# O índice é atualizado a cada publicação; `manage.py update_index` reconstrói tudo.
+WAGTAILSEARCH_BACKENDS = {
+    'default': {
+        'BACKEND': 'wagtail.search.backends.database',
+        'SEARCH_CONFIG': 'portuguese',
+    },
+}
 # todo arrumar para deploy
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -0,0 +1,72 @@
+"""
+Backend do django_tasks que guarda as tarefas numa tabela do próprio Postgres.
+
+As tarefas continuam sendo declaradas com `@task()` e disparadas com `.enqueue()`, inclusive as
+do Wagtail (índice de busca, índice de referências); com este backend em TASKS elas vão para a
+tabela QueuedTask e são executadas por `manage.py run_task_worker` (cdc/tasks/worker.py).
+"""
+
+import random
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django_tasks.backends.base import BaseTaskBackend
+from django_tasks.exceptions import TaskResultDoesNotExist
+from django_tasks.signals import task_enqueued
+from django_tasks.utils import normalize_json
+
+
+class QueueBackend(BaseTaskBackend):
+    supports_defer = True
+    supports_get_result = True
+    supports_priority = True
+
+    def __init__(self, alias, params):
+        super().__init__(alias, params)
+        # Total de tentativas antes de a tarefa ficar como FAILED
+        self.max_attempts = self.options.get('MAX_ATTEMPTS', 5)
+        # Espera, em segundos, antes da 2ª tentativa; dobra a cada falha até RETRY_BACKOFF_MAX
+        self.retry_backoff = self.options.get('RETRY_BACKOFF', 10)
+        self.retry_backoff_max = self.options.get('RETRY_BACKOFF_MAX', 60 * 60)
+        # Depois disso uma tarefa em RUNNING é considerada abandonada e volta para a fila
+        self.lease_timeout = self.options.get('LEASE_TIMEOUT', 30 * 60)
+        # Tarefas terminadas há mais dias que isso são apagadas pelo worker
+        self.keep_finished_days = self.options.get('KEEP_FINISHED_DAYS', 7)
+
+    def enqueue(self, task, args, kwargs):
+        from cdc.tasks.models import QueuedTask
+
+        self.validate_task(task)
+        queued = QueuedTask(
+            backend_name=self.alias,
+            task_path=task.module_path,
+            queue_name=task.queue_name,
+            priority=task.priority,
+            args_kwargs=normalize_json({'args': args, 'kwargs': kwargs}),
+            run_after=task.run_after or timezone.now(),
+        )
+
+        def save():
+            queued.save()
+            task_enqueued.send(type(self), task_result=queued.task_result)
+
+        if self._get_enqueue_on_commit_for_task(task):
+            transaction.on_commit(save)
+        else:
+            save()
+        return queued.task_result
+
+    def get_result(self, result_id):
+        from cdc.tasks.models import QueuedTask
+
+        try:
+            return QueuedTask.objects.get(pk=result_id).task_result
+        except (QueuedTask.DoesNotExist, ValidationError) as e:
+            raise TaskResultDoesNotExist(result_id) from e
+
+    def get_retry_delay(self, attempts):
+        """Espera antes da próxima tentativa: exponencial, com até 10% a mais para espalhar as repetições."""
+        delay = min(self.retry_backoff * 2 ** (attempts - 1), self.retry_backoff_max)
+        return timedelta(seconds=delay * random.uniform(1, 1.1))
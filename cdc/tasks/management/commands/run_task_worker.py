@@ -0,0 +1,69 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django_tasks import DEFAULT_TASK_BACKEND_ALIAS
+
+from cdc.tasks.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Executa as tarefas da fila do banco (cdc.tasks.backends.QueueBackend).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', default=DEFAULT_TASK_BACKEND_ALIAS, help='Alias do backend em TASKS.')
+        parser.add_argument(
+            '--queue', action='append', dest='queues', help='Fila a atender; pode repetir. Padrão: todas do backend.'
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.TASK_WORKER_THREADS,
+            help='Tarefas executadas ao mesmo tempo por processo.',
+        )
+        parser.add_argument('--processes', type=int, default=1, help='Processos de worker, cada um com suas threads.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Segundos entre consultas à fila vazia.')
+        parser.add_argument('--burst', action='store_true', help='Sai quando não houver mais tarefas prontas.')
+
+    def handle(self, *args, **options):
+        worker_options = {
+            'backend_name': options['backend'],
+            'queues': options['queues'],
+            'threads': options['threads'],
+            'poll_interval': options['poll_interval'],
+        }
+        if options['processes'] <= 1:
+            run_worker(worker_options, options['burst'])
+            return
+
+        # Os processos filhos não podem herdar as conexões abertas do pai
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=run_worker, args=(worker_options, options['burst']))
+            for _ in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+
+        def terminate(signum, frame):
+            for process in processes:
+                process.terminate()
+
+        signal.signal(signal.SIGTERM, terminate)
+        signal.signal(signal.SIGINT, terminate)
+        for process in processes:
+            process.join()
+
+
+def run_worker(worker_options, burst):
+    worker = Worker(**worker_options)
+
+    def stop(signum, frame):
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    worker.run(burst=burst)
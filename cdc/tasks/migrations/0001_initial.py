@@ -0,0 +1,63 @@
+# Generated by Django 6.0 on 2026-10-18 17:44
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedTask',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('backend_name', models.CharField(max_length=32, verbose_name='backend')),
+                ('task_path', models.TextField(verbose_name='tarefa')),
+                ('queue_name', models.CharField(default='default', max_length=32, verbose_name='fila')),
+                ('priority', models.IntegerField(default=0, verbose_name='prioridade')),
+                ('args_kwargs', models.JSONField(verbose_name='argumentos')),
+                (
+                    'status',
+                    models.CharField(
+                        choices=[
+                            ('READY', 'Ready'),
+                            ('RUNNING', 'Running'),
+                            ('FAILED', 'Failed'),
+                            ('SUCCEEDED', 'Succeeded'),
+                        ],
+                        default='READY',
+                        max_length=10,
+                        verbose_name='situação',
+                    ),
+                ),
+                (
+                    'run_after',
+                    models.DateTimeField(default=django.utils.timezone.now, verbose_name='executar a partir de'),
+                ),
+                ('enqueued_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='enfileirada em')),
+                ('started_at', models.DateTimeField(null=True, verbose_name='iniciada em')),
+                ('last_attempted_at', models.DateTimeField(null=True, verbose_name='última tentativa em')),
+                ('finished_at', models.DateTimeField(null=True, verbose_name='terminada em')),
+                ('worker_ids', models.JSONField(default=list, verbose_name='workers')),
+                ('errors', models.JSONField(default=list, verbose_name='erros')),
+                ('return_value', models.JSONField(null=True, verbose_name='retorno')),
+            ],
+            options={
+                'verbose_name': 'tarefa',
+                'indexes': [
+                    models.Index(
+                        models.F('queue_name'),
+                        models.OrderBy(models.F('priority'), descending=True),
+                        models.F('run_after'),
+                        condition=models.Q(('status', 'READY')),
+                        name='tasks_queuedtask_ready_idx',
+                    ),
+                    models.Index(fields=['finished_at'], name='tasks_queuedtask_finished_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 6.0 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='queuedtask',
+            index=models.Index(fields=['status', 'last_attempted_at'], name='tasks_queuedtask_lease_idx'),
+        ),
+    ]
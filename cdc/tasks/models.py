@@ -0,0 +1,105 @@
+import uuid
+from datetime import timedelta
+
+from django.core.exceptions import SuspiciousOperation
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_tasks.base import (
+    DEFAULT_TASK_QUEUE_NAME,
+    TASK_DEFAULT_PRIORITY,
+    Task,
+    TaskError,
+    TaskResult,
+    TaskResultStatus,
+)
+
+
+class QueuedTaskQuerySet(models.QuerySet):
+    def claimable(self, backend_name, queues, lease_timeout, now=None):
+        """
+        Tarefas que um worker pode pegar: prontas e já no horário, ou presas em RUNNING há mais
+        que `lease_timeout` segundos (o worker que as pegou morreu no meio).
+        """
+        now = now or timezone.now()
+        return self.filter(backend_name=backend_name, queue_name__in=queues).filter(
+            Q(status=TaskResultStatus.READY, run_after__lte=now)
+            | Q(status=TaskResultStatus.RUNNING, last_attempted_at__lt=now - timedelta(seconds=lease_timeout))
+        )
+
+    def finished(self):
+        return self.filter(status__in=[TaskResultStatus.SUCCEEDED, TaskResultStatus.FAILED])
+
+
+class QueuedTask(models.Model):
+    """Uma chamada de tarefa na fila do QueueBackend, com o estado e o histórico de tentativas."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    backend_name = models.CharField('backend', max_length=32)
+    task_path = models.TextField('tarefa')
+    queue_name = models.CharField('fila', max_length=32, default=DEFAULT_TASK_QUEUE_NAME)
+    priority = models.IntegerField('prioridade', default=TASK_DEFAULT_PRIORITY)
+    args_kwargs = models.JSONField('argumentos')
+    status = models.CharField(
+        'situação', max_length=10, choices=TaskResultStatus.choices, default=TaskResultStatus.READY
+    )
+    run_after = models.DateTimeField('executar a partir de', default=timezone.now)
+    enqueued_at = models.DateTimeField('enfileirada em', default=timezone.now)
+    started_at = models.DateTimeField('iniciada em', null=True)
+    last_attempted_at = models.DateTimeField('última tentativa em', null=True)
+    finished_at = models.DateTimeField('terminada em', null=True)
+    worker_ids = models.JSONField('workers', default=list)
+    errors = models.JSONField('erros', default=list)
+    return_value = models.JSONField('retorno', null=True)
+
+    objects = QueuedTaskQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'tarefa'
+        indexes = [
+            # Ordem em que os workers pegam as tarefas prontas
+            models.Index(
+                'queue_name',
+                models.F('priority').desc(),
+                'run_after',
+                name='tasks_queuedtask_ready_idx',
+                condition=Q(status=TaskResultStatus.READY),
+            ),
+            models.Index(fields=['finished_at'], name='tasks_queuedtask_finished_idx'),
+            # Tarefas em RUNNING com o lease vencido, o outro ramo do `claimable`
+            models.Index(fields=['status', 'last_attempted_at'], name='tasks_queuedtask_lease_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task_path} ({self.status})'
+
+    @property
+    def attempts(self):
+        return len(self.worker_ids)
+
+    @property
+    def task(self) -> Task:
+        task = import_string(self.task_path)
+        if not isinstance(task, Task):
+            raise SuspiciousOperation(f'{self.task_path} não é uma tarefa')
+        return task.using(priority=self.priority, queue_name=self.queue_name, backend=self.backend_name)
+
+    @property
+    def task_result(self) -> TaskResult:
+        task_result = TaskResult(
+            task=self.task,
+            id=str(self.id),
+            status=TaskResultStatus(self.status),
+            enqueued_at=self.enqueued_at,
+            started_at=self.started_at,
+            last_attempted_at=self.last_attempted_at,
+            finished_at=self.finished_at,
+            args=self.args_kwargs['args'],
+            kwargs=self.args_kwargs['kwargs'],
+            backend=self.backend_name,
+            errors=[TaskError(**error) for error in self.errors],
+            worker_ids=self.worker_ids,
+        )
+        object.__setattr__(task_result, '_return_value', self.return_value)
+        return task_result
@@ -0,0 +1,231 @@
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django_tasks import task
+from django_tasks.base import TaskResultStatus
+
+from cdc.recipes.models import RecipeTagCount
+from cdc.recipes.tests.utils import RecipeTestCase
+from cdc.tasks.models import QueuedTask
+from cdc.tasks.worker import Worker
+
+QUEUE_SETTINGS = {
+    'default': {
+        'BACKEND': 'cdc.tasks.backends.QueueBackend',
+        'OPTIONS': {'MAX_ATTEMPTS': 3, 'RETRY_BACKOFF': 10},
+    },
+}
+
+calls = []
+
+
+@task()
+def add(a, b):
+    calls.append((a, b))
+    return a + b
+
+
+@task()
+def explode():
+    raise ValueError('boom')
+
+
+@override_settings(TASKS=QUEUE_SETTINGS)
+class TestQueueBackend(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def enqueue(self, task, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            return task.enqueue(*args)
+
+    def test_enqueue_waits_for_commit(self):
+        """Test tasks are stored only when the transaction commits"""
+        with self.captureOnCommitCallbacks(execute=False):
+            add.enqueue(1, 2)
+            self.assertFalse(QueuedTask.objects.exists())
+
+    def test_enqueue_stores_ready_task(self):
+        """Test an enqueued task is stored ready, with its arguments"""
+        result = self.enqueue(add, 1, 2)
+        queued = QueuedTask.objects.get()
+        self.assertEqual(queued.status, TaskResultStatus.READY)
+        self.assertEqual(queued.task_path, add.module_path)
+        self.assertEqual(add.get_result(result.id).args, [1, 2])
+
+    def test_worker_runs_task(self):
+        """Test the worker runs a task and stores its return value"""
+        result = self.enqueue(add, 1, 2)
+        Worker().run(burst=True)
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.SUCCEEDED)
+        self.assertEqual(result.return_value, 3)
+        self.assertEqual(result.attempts, 1)
+
+    def test_database_error_does_not_stop_worker(self):
+        """Test a failed claim is logged and retried instead of ending the worker"""
+        self.enqueue(add, 1, 2)
+        worker = Worker(poll_interval=0)
+        claim = worker.claim
+        errors = [OperationalError('server closed the connection unexpectedly')]
+
+        def flaky_claim(limit):
+            if errors:
+                raise errors.pop()
+            return claim(limit)
+
+        with mock.patch.object(worker, 'claim', side_effect=flaky_claim), self.assertLogs('cdc.tasks.worker', 'ERROR'):
+            worker.run(burst=True)
+        self.assertEqual(calls, [(1, 2)])
+        self.assertEqual(worker._failures, 0)
+
+    def test_database_error_saving_result_does_not_stop_worker(self):
+        """Test a task whose result can't be saved stays running and the worker moves on"""
+        self.enqueue(add, 1, 2)
+        self.enqueue(add, 3, 4)
+        save = QueuedTask.save
+        errors = [OperationalError('server closed the connection unexpectedly')]
+
+        def flaky_save(queued, *args, **kwargs):
+            if errors:
+                raise errors.pop()
+            return save(queued, *args, **kwargs)
+
+        worker = Worker(poll_interval=0)
+        with (
+            mock.patch.object(QueuedTask, 'save', autospec=True, side_effect=flaky_save),
+            self.assertLogs('cdc.tasks.worker', 'ERROR'),
+        ):
+            worker.run(burst=True)
+        self.assertEqual(sorted(calls), [(1, 2), (3, 4)])
+        self.assertEqual(QueuedTask.objects.filter(status=TaskResultStatus.RUNNING).count(), 1)
+        self.assertEqual(QueuedTask.objects.filter(status=TaskResultStatus.SUCCEEDED).count(), 1)
+
+    def test_failed_task_is_retried_later(self):
+        """Test a failing task goes back to the queue with a backoff"""
+        self.enqueue(explode)
+        Worker().run(burst=True)
+        queued = QueuedTask.objects.get()
+        self.assertEqual(queued.status, TaskResultStatus.READY)
+        self.assertEqual(queued.attempts, 1)
+        self.assertGreaterEqual(queued.run_after, timezone.now() + timedelta(seconds=9))
+        self.assertIn('ValueError', queued.errors[0]['exception_class_path'])
+
+    def test_backoff_doubles_each_attempt(self):
+        """Test the retry delay grows exponentially up to the limit"""
+        backend = add.get_backend()
+        self.assertGreaterEqual(backend.get_retry_delay(3), timedelta(seconds=40))
+        self.assertLessEqual(backend.get_retry_delay(3), timedelta(seconds=44))
+        self.assertLessEqual(backend.get_retry_delay(50), timedelta(seconds=backend.retry_backoff_max * 1.1))
+
+    def test_task_fails_after_max_attempts(self):
+        """Test a task that keeps failing ends as FAILED"""
+        result = self.enqueue(explode)
+        worker = Worker()
+        for _ in range(3):
+            QueuedTask.objects.update(run_after=timezone.now())
+            worker.run(burst=True)
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.FAILED)
+        self.assertEqual(len(result.errors), 3)
+
+    def test_higher_priority_runs_first(self):
+        """Test the worker takes tasks by priority"""
+        self.enqueue(add, 1, 1)
+        self.enqueue(add.using(priority=10), 2, 2)
+        Worker().run(burst=True)
+        self.assertEqual(calls, [(2, 2), (1, 1)])
+
+    def test_abandoned_task_is_reclaimed(self):
+        """Test a task left RUNNING by a dead worker runs again after the lease expires"""
+        self.enqueue(add, 1, 2)
+        QueuedTask.objects.update(
+            status=TaskResultStatus.RUNNING, last_attempted_at=timezone.now() - timedelta(hours=1), worker_ids=['x']
+        )
+        Worker().run(burst=True)
+        queued = QueuedTask.objects.get()
+        self.assertEqual(queued.status, TaskResultStatus.SUCCEEDED)
+        self.assertEqual(queued.attempts, 2)
+
+    def test_old_finished_tasks_are_pruned(self):
+        """Test the worker deletes tasks finished more than a week ago"""
+        self.enqueue(add, 1, 2)
+        QueuedTask.objects.update(status=TaskResultStatus.SUCCEEDED, finished_at=timezone.now() - timedelta(days=8))
+        Worker().run(burst=True)
+        self.assertFalse(QueuedTask.objects.exists())
+
+    def test_long_running_worker_prunes_periodically(self):
+        """Test a worker that stays up keeps deleting old tasks, not only when it starts"""
+        worker = Worker(prune_interval=0)
+        worker.run(burst=True)
+        self.enqueue(add, 1, 2)
+        QueuedTask.objects.update(status=TaskResultStatus.SUCCEEDED, finished_at=timezone.now() - timedelta(days=8))
+        worker.run(burst=True)
+        self.assertFalse(QueuedTask.objects.exists())
+
+    def test_command_runs_queue(self):
+        """Test run_task_worker --burst empties the queue"""
+        self.enqueue(add, 1, 2)
+        call_command('run_task_worker', '--burst', '--threads', '1')
+        self.assertEqual(calls, [(1, 2)])
+
+
+# Os workers com várias threads usam outras conexões, que só enxergam dados já commitados
+@override_settings(TASKS=QUEUE_SETTINGS)
+class TestQueueConcurrency(TransactionTestCase):
+    serialized_rollback = True
+
+    def setUp(self):
+        calls.clear()
+        # Restaurar os dados iniciais enfileira tarefas do próprio Wagtail
+        QueuedTask.objects.all().delete()
+
+    def test_locked_tasks_are_skipped(self):
+        """Test a worker skips tasks locked by another worker instead of waiting"""
+        first = add.enqueue(1, 1)
+        second = add.enqueue(2, 2)
+        claimed = []
+
+        def claim():
+            claimed.extend(queued.pk for queued in Worker().claim(10))
+            connection.close()
+
+        with transaction.atomic():
+            QueuedTask.objects.select_for_update().get(pk=first.id)
+            thread = threading.Thread(target=claim)
+            thread.start()
+            thread.join(timeout=10)
+
+        self.assertEqual([str(pk) for pk in claimed], [second.id])
+
+    def test_thread_pool_runs_all_tasks(self):
+        """Test a worker with several threads runs every task once"""
+        for number in range(10):
+            add.enqueue(number, number)
+        Worker(threads=4).run(burst=True)
+        self.assertEqual(sorted(calls), [(number, number) for number in range(10)])
+        self.assertEqual(QueuedTask.objects.filter(status=TaskResultStatus.SUCCEEDED).count(), 10)
+
+
+@override_settings(TASKS=QUEUE_SETTINGS)
+class TestPublishHooks(RecipeTestCase):
+    def test_publish_side_effects_run_in_worker(self):
+        """Test publishing a recipe queues its side effects for the worker"""
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.add_recipe('bolo', ['doce'], title='Bolo', live=False)
+            recipe.save_revision().publish()
+
+        task_paths = set(QueuedTask.objects.values_list('task_path', flat=True))
+        self.assertIn('cdc.recipes.tasks.refresh_tag_counts', task_paths)
+        self.assertIn('cdc.recipes.tasks.generate_recipe_renditions', task_paths)
+        self.assertFalse(RecipeTagCount.objects.exists())
+
+        Worker().run(burst=True)
+        self.assertFalse(QueuedTask.objects.exclude(status=TaskResultStatus.SUCCEEDED).exists())
+        self.assertEqual(RecipeTagCount.objects.get().num_recipes, 1)
+        self.assertTrue(self.image.renditions.exists())
@@ -0,0 +1,220 @@
+"""
+Worker da fila do QueueBackend.
+
+Cada worker reserva tarefas com SELECT ... FOR UPDATE SKIP LOCKED, então vários workers (ou
+processos do mesmo worker) dividem a fila sem esperar uns pelos outros nem pegar a mesma tarefa.
+O número de tarefas em execução ao mesmo tempo é limitado ao tamanho do pool de threads: o
+worker só reserva tarefas novas quando há thread livre.
+
+Uma queda do banco (failover, conexão derrubada) não encerra o worker, seja ao ler a fila ou ao
+gravar o resultado de uma tarefa: o erro é registrado e ele tenta de novo depois de uma espera que
+dobra a cada falha seguida, até MAX_BACKOFF segundos. A tarefa cujo resultado não foi gravado fica
+em RUNNING e volta para a fila quando o `lease_timeout` do backend vence.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import sentry_sdk
+from django.db import DatabaseError, close_old_connections, connections, transaction
+from django.utils import timezone
+from django_tasks import DEFAULT_TASK_BACKEND_ALIAS, task_backends
+from django_tasks.base import TaskContext, TaskResultStatus
+from django_tasks.signals import task_finished, task_started
+from django_tasks.utils import get_exception_traceback, get_module_path, get_random_id, normalize_json
+
+from cdc.tasks.models import QueuedTask
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre as limpezas das tarefas terminadas; o admin enfileira tarefas a cada save
+PRUNE_INTERVAL = 60 * 60
+# Espera máxima, em segundos, entre as tentativas com o banco fora do ar
+MAX_BACKOFF = 60
+
+
+class Worker:
+    def __init__(
+        self,
+        backend_name=DEFAULT_TASK_BACKEND_ALIAS,
+        queues=None,
+        threads=1,
+        poll_interval=1.0,
+        prune_interval=PRUNE_INTERVAL,
+    ):
+        self.backend = task_backends[backend_name]
+        self.queues = list(queues or self.backend.queues)
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.prune_interval = prune_interval
+        self._pruned_at = None
+        self._failures = 0
+        self.worker_id = get_random_id()
+        self._stopping = threading.Event()
+
+    def stop(self):
+        """Para de reservar tarefas; as que já estão rodando terminam normalmente."""
+        self._stopping.set()
+
+    def run(self, burst=False):
+        """Processa a fila até `stop()`; com `burst`, só até não haver mais tarefas prontas."""
+        if self.threads == 1:
+            self.run_inline(burst)
+        else:
+            self.run_pool(burst)
+
+    def run_inline(self, burst):
+        # Com uma thread só não há por que ter um pool: a tarefa roda na thread do worker
+        while not self._stopping.is_set():
+            claimed = self.poll(1)
+            if claimed is None:
+                continue
+            if claimed:
+                self.execute_safely(claimed[0])
+            elif burst:
+                break
+            else:
+                self._stopping.wait(self.poll_interval)
+
+    def run_pool(self, burst):
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='cdc-task') as pool:
+            while not self._stopping.is_set():
+                free = self.threads - len(running)
+                claimed = self.poll(free)
+                if claimed is None:
+                    continue
+                for queued in claimed:
+                    future = pool.submit(self.execute_in_thread, queued)
+                    future.add_done_callback(self.log_future_error)
+                    running.add(future)
+                if not running:
+                    if burst:
+                        break
+                    self._stopping.wait(self.poll_interval)
+                elif len(claimed) < free or not free:
+                    # Fila vazia ou todas as threads ocupadas: espera alguma tarefa terminar
+                    _, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+
+    def poll(self, limit):
+        """
+        Limpa a fila se for a hora e reserva até `limit` tarefas.
+
+        Devolve None se o banco falhou; nesse caso já esperou o backoff antes de voltar.
+        """
+        self.close_stale_connections()
+        try:
+            self.prune_periodically()
+            claimed = self.claim(limit) if limit else []
+        except DatabaseError:
+            self.backoff('Erro no banco ao ler a fila')
+            return None
+        self._failures = 0
+        return claimed
+
+    def backoff(self, message, *args):
+        """Registra o erro do banco em andamento e espera, o dobro a cada falha seguida."""
+        self._failures += 1
+        delay = min(self.poll_interval * 2**self._failures, MAX_BACKOFF)
+        logger.exception(f'{message} (falha %s seguida), nova tentativa em %ss', *args, self._failures, delay)
+        self._stopping.wait(delay)
+
+    def close_stale_connections(self):
+        # Como o Django faz a cada request: descarta a conexão que caiu ou passou do CONN_MAX_AGE.
+        # Uma conexão dentro de transaction.atomic (quem chamou o worker abriu) não é fechada, senão a
+        # transação seria perdida.
+        for connection in connections.all(initialized_only=True):
+            if not connection.in_atomic_block:
+                connection.close_if_unusable_or_obsolete()
+
+    def claim(self, limit):
+        """Reserva até `limit` tarefas, na ordem de prioridade e horário."""
+        now = timezone.now()
+        with transaction.atomic():
+            claimed = list(
+                QueuedTask.objects.claimable(self.backend.alias, self.queues, self.backend.lease_timeout, now)
+                .select_for_update(skip_locked=True)
+                .order_by('-priority', 'run_after')[:limit]
+            )
+            for queued in claimed:
+                queued.status = TaskResultStatus.RUNNING
+                queued.started_at = queued.started_at or now
+                queued.last_attempted_at = now
+                queued.worker_ids = [*queued.worker_ids, self.worker_id]
+            QueuedTask.objects.bulk_update(claimed, ['status', 'started_at', 'last_attempted_at', 'worker_ids'])
+        return claimed
+
+    def execute_safely(self, queued):
+        try:
+            self.execute(queued)
+        except DatabaseError:
+            # O resultado (ou a falha) não foi gravado; a tarefa é pega de novo quando o lease vencer
+            self.backoff('Erro no banco ao gravar a tarefa %s', queued.pk)
+
+    def log_future_error(self, future):
+        # Um erro que escapou da thread ficaria guardado no future, que ninguém mais lê
+        if not future.cancelled() and future.exception() is not None:
+            logger.error('Erro inesperado numa thread do worker', exc_info=future.exception())
+
+    def execute(self, queued):
+        # Cada tarefa é uma transação no Sentry, amostrada pelo SENTRY_TRACES_SAMPLE_RATE como os requests
+        with sentry_sdk.start_transaction(op='queue.task', name=queued.task_path):
+            self.run_task(queued)
+
+    def run_task(self, queued):
+        try:
+            task_result = queued.task_result
+            task_started.send(type(self.backend), task_result=task_result)
+            task, args, kwargs = task_result.task, task_result.args, task_result.kwargs
+            if task.takes_context:
+                return_value = task.call(TaskContext(task_result=task_result), *args, **kwargs)
+            else:
+                return_value = task.call(*args, **kwargs)
+        except Exception as exc:
+            self.failed(queued, exc)
+        else:
+            queued.status = TaskResultStatus.SUCCEEDED
+            queued.finished_at = timezone.now()
+            queued.return_value = normalize_json(return_value)
+            queued.save(update_fields=['status', 'finished_at', 'return_value'])
+            task_finished.send(type(self.backend), task_result=queued.task_result)
+
+    def execute_in_thread(self, queued):
+        try:
+            self.execute_safely(queued)
+        finally:
+            # Cada thread do pool tem a própria conexão; fecha se passou do CONN_MAX_AGE ou ficou inutilizável
+            close_old_connections()
+
+    def failed(self, queued, exc):
+        queued.errors = [
+            *queued.errors,
+            {'exception_class_path': get_module_path(type(exc)), 'traceback': get_exception_traceback(exc)},
+        ]
+        if queued.attempts < self.backend.max_attempts:
+            queued.status = TaskResultStatus.READY
+            queued.run_after = timezone.now() + self.backend.get_retry_delay(queued.attempts)
+            logger.warning(
+                'Tarefa %s falhou (tentativa %s), nova tentativa às %s', queued, queued.attempts, queued.run_after
+            )
+        else:
+            queued.status = TaskResultStatus.FAILED
+            queued.finished_at = timezone.now()
+        queued.save(update_fields=['status', 'run_after', 'finished_at', 'errors'])
+        if queued.status == TaskResultStatus.FAILED:
+            # O handler do django_tasks registra a falha com logger.exception (e vai para o Sentry)
+            task_finished.send(type(self.backend), task_result=queued.task_result)
+
+    def prune_periodically(self):
+        """Apaga as tarefas terminadas antigas ao começar e depois a cada `prune_interval` segundos."""
+        now = time.monotonic()
+        if self._pruned_at is None or now - self._pruned_at >= self.prune_interval:
+            self.prune()
+            self._pruned_at = now
+
+    def prune(self):
+        cutoff = timezone.now() - timedelta(days=self.backend.keep_finished_days)
+        QueuedTask.objects.finished().filter(finished_at__lt=cutoff).delete()
@@ -6,11 +6,16 @@ from wagtail import urls as wagtail_urls
 from wagtail.admin import urls as wagtailadmin_urls
 from wagtail.documents import urls as wagtaildocs_urls
 
+from cdc.recipes import views as recipe_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('allauth.urls')),
     path('__reload__/', include('django_browser_reload.urls')),
     path('cms/', include(wagtailadmin_urls)),
+    path('search/', recipe_views.search, name='search'),
+    path('search/autocomplete/', recipe_views.autocomplete, name='autocomplete'),
+    path('cook/', recipe_views.cook, name='cook'),
     path('', include(wagtail_urls)),
     path('documents/', include(wagtaildocs_urls)),
 ]
@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+
+import pytest
+import sentry_sdk
+from django.core.cache import caches
+from sentry_sdk.integrations.django import DjangoIntegration
+from sentry_sdk.transport import Transport
+
+from cdc.base.sqlprofile import check_query_budget, profile_queries
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Os caches duram mais que um teste (e, em arquivo, que a execução); cada teste começa com eles vazios."""
+    for cache in caches.all():
+        cache.clear()
+    yield
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Falha o teste se o bloco fizer mais queries que o orçamento, mostrando os comandos executados.
+
+        with query_budget(RecipeIndexPage.query_budget):
+            client.get('/receitas/')
+    """
+
+    @contextmanager
+    def check(budget, label='bloco'):
+        with profile_queries() as profile:
+            yield profile
+        check_query_budget(profile, budget, label)
+
+    return check
+
+
+class CapturingTransport(Transport):
+    """Transport do Sentry que guarda os envelopes em memória em vez de enviar."""
+
+    def __init__(self, options=None):
+        super().__init__(options)
+        self.envelopes = []
+
+    def capture_envelope(self, envelope):
+        self.envelopes.append(envelope)
+
+    def transactions(self):
+        return [
+            item.payload.json for envelope in self.envelopes for item in envelope.items if item.type == 'transaction'
+        ]
+
+
+@pytest.fixture
+def sentry_transport():
+    """
+    Sentry com todos os traces amostrados e enviados para um CapturingTransport, sem DSN real.
+    O cliente original (sem DSN nos testes) volta no fim do teste.
+    """
+    previous = sentry_sdk.get_client()
+    transport = CapturingTransport()
+    sentry_sdk.init(
+        dsn='http://public@localhost/1',
+        transport=transport,
+        integrations=[DjangoIntegration()],
+        traces_sample_rate=1.0,
+    )
+    yield transport
+    sentry_sdk.get_client().close()
+    sentry_sdk.get_global_scope().set_client(previous)